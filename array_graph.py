@@ -0,0 +1,676 @@
+""" Module for storing an encoding graph as flat NumPy arrays instead of Node and Edge objects. """
+from initialize import get_gates, get_endpoints
+from functools import lru_cache
+import json
+import os
+import random
+from graph import Node
+from polar import get_best_gate_mask
+import numpy as np
+
+
+# The edge states are stored as booleans telling whether the edge's value is known.
+UNKNOWN = False
+KNOWN = True
+STATE_BY_VALUE = {'?': UNKNOWN, '*': KNOWN}
+VALUE_BY_STATE = {UNKNOWN: '?', KNOWN: '*'}
+NODE_TYPES = tuple(Node.NodeType)  # Indexed by the NodeType value, in the order EDGE, LOWER, UPPER.
+WORD_SIZE = 64  # The amount of trials packed into the bits of a single edge state word of a PackedGraph.
+DEFAULT_CHUNK_SIZE = 2 ** 20  # The amount of outer edge states a MappedGraph writes at once.
+
+
+def to_states(values):
+    """ Converts a list of '?' and '*' edge values to an array of UNKNOWN and KNOWN edge states. """
+    return np.array([STATE_BY_VALUE[value] for value in values], dtype=bool)
+
+
+def iterate_endpoint_states(k, p, rng=random, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Randomly generates the edge states of an output as get_endpoints does, chunk by chunk.
+
+    The amount of passed bits of every chunk is drawn from the hypergeometric distribution of the bits left, and then
+    that many of the chunk's bits are drawn uniformly, so every set of n(1 - p) passed bits is as likely as with
+    get_endpoints, but only a chunk is ever held in memory. The draws are made by a NumPy generator seeded from rng, so
+    the states differ from the ones get_endpoints generates with the same rng.
+
+    :param rng: the random number generator to seed the draws with, a random.Random or the random module itself.
+    :return: a generator of (start, states) pairs, with states the array of the edge states of the gates from start on.
+    """
+    generator = np.random.default_rng(rng.getrandbits(64))
+    n = 2 ** k
+    passed_amount = int(n * (1 - p))
+    for start in range(0, n, chunk_size):
+        size = min(chunk_size, n - start)
+        chunk_passed_amount = generator.hypergeometric(passed_amount, n - start - passed_amount, size)
+        states = np.full(size, UNKNOWN, dtype=bool)
+        states[generator.choice(size, chunk_passed_amount, replace=False)] = KNOWN
+        passed_amount -= chunk_passed_amount
+        yield start, states
+
+
+def pack_trials(values):
+    """ Packs a matrix of edge states with a row per trial into a matrix with a row of uint64 words per WORD_SIZE
+    trials.
+
+    Bit i of a word holds the edge state of trial i of the word, and the missing trials of the last word are UNKNOWN.
+    """
+    trials, edges = values.shape
+    words = -(-trials // WORD_SIZE)
+    padded = np.zeros((words * WORD_SIZE, edges), dtype=bool)
+    padded[:trials] = values
+    lanes = np.packbits(padded.reshape(words, WORD_SIZE, edges), axis=1, bitorder='little')
+    return np.ascontiguousarray(lanes.transpose(0, 2, 1)).view('<u8').reshape(words, edges).astype(np.uint64)
+
+
+def unpack_trials(words, trials):
+    """ Unpacks a matrix of packed edge states into a matrix with a row of edge states for each of the first trials. """
+    lanes = np.ascontiguousarray(words.astype('<u8')).view(np.uint8).reshape(words.shape + (WORD_SIZE // 8,))
+    values = np.unpackbits(lanes, axis=2, bitorder='little').astype(bool)
+    return values.transpose(0, 2, 1).reshape(-1, words.shape[1])[:trials]
+
+
+@lru_cache(maxsize=None)
+def get_structure(k):
+    """ Computes the arrays describing the structure of an encoding graph.
+
+    The structure is computed once for every k and shared by all of the graphs with it, so the arrays are read-only.
+
+    :param k: the power of the amount of gates being encoded.
+    :return: the node types, the [left, vertical, right] edges of every inner node, the [first, second] nodes of
+    every edge and the gate number of every inner node of every layer.
+    """
+    n = 2 ** k
+    layer_size = 3 * 2 ** (k - 1)
+    inner_offset = n
+    end_offset = n + k * n
+    node_types = np.full(2 * n + k * n, Node.NodeType.EDGE.value, dtype=np.int8)
+    node_edges = np.zeros((k * n, 3), dtype=np.int64)
+    edge_nodes = np.zeros((k * layer_size + n, 2), dtype=np.int64)
+    gates_by_layer = np.zeros((k, n), dtype=np.int64)
+
+    # The node currently at the end of the row of every gate number, as in Graph.init_structure.
+    current_layer = np.arange(n)
+    pairs = np.arange(n // 2)
+    for layer in range(k):
+        top_gates = (pairs >> layer << (layer + 1)) + (pairs & (2 ** layer - 1))
+        bottom_gates = top_gates + 2 ** layer
+        gates = gates_by_layer[layer]
+        gates[0::2], gates[1::2] = top_gates, bottom_gates
+        nodes = inner_offset + layer * n + np.arange(n)
+        node_types[nodes[0::2]] = Node.NodeType.UPPER.value
+        node_types[nodes[1::2]] = Node.NodeType.LOWER.value
+
+        left_edges = layer * layer_size + gates
+        vertical_edges = layer * layer_size + n + pairs
+        node_edges[nodes - inner_offset, 0] = left_edges
+        node_edges[nodes - inner_offset, 1] = np.repeat(vertical_edges, 2)
+        node_edges[nodes - inner_offset, 2] = left_edges + layer_size
+        edge_nodes[left_edges, 0] = current_layer[gates]
+        edge_nodes[left_edges, 1] = nodes
+        edge_nodes[vertical_edges, 0] = nodes[0::2]
+        edge_nodes[vertical_edges, 1] = nodes[1::2]
+        current_layer[gates] = nodes
+
+    # Connect the endpoints.
+    end_edges = k * layer_size + np.arange(n)
+    edge_nodes[end_edges, 0] = current_layer
+    edge_nodes[end_edges, 1] = end_offset + np.arange(n)
+    for array in (node_types, node_edges, edge_nodes, gates_by_layer):
+        array.setflags(write=False)
+    return node_types, node_edges, edge_nodes, gates_by_layer
+
+
+class ArrayNode:
+    """ A lightweight view of a node of an ArrayGraph with the same interface as graph.Node. """
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = int(index)
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayNode) and self.index == other.index and self.graph is other.graph
+
+    def __hash__(self):
+        return self.index
+
+    def __repr__(self):
+        return 'ArrayNode({})'.format(self.label)
+
+    @property
+    def type(self):
+        return self.graph.node_type(self.index)
+
+    @property
+    def label(self):
+        """ The node's debugging label, the same one a graph.Node in the same position has. """
+        return self.graph.node_label(self.index)
+
+    @property
+    def layer(self):
+        """ The node's inner layer, -1 for start nodes and k for end nodes. """
+        return self.graph.node_layer(self.index)
+
+    @property
+    def edges(self):
+        """ The node's edges, in order [left, vertical, right] for the inner nodes. """
+        return [ArrayEdge(self.graph, edge) for edge in self.graph.incident_edges(self.index)]
+
+    def degree(self):
+        """ Returns the node's degree. Should be 1 for outer vertices and 2 for inner ones. """
+        return len(self.graph.incident_edges(self.index))
+
+    def get_neighbor_types(self):
+        """ Returns a sorted list of the node's edges' values. """
+        return sorted([VALUE_BY_STATE[self.graph.values[edge]] for edge in self.graph.incident_edges(self.index)])
+
+    def get_state_code(self):
+        """ Returns the node's edges' values packed into a 3-bit code, with bit i set if the i-th edge's value is
+        '*'. """
+        left, vertical, right = self.graph.values[self.graph.incident_edges(self.index)]
+        return int(left) | int(vertical) << 1 | int(right) << 2
+
+    def propagate(self):
+        """ Sets all of the node's neighboring edges to '*'. """
+        self.graph.values[self.graph.incident_edges(self.index)] = KNOWN
+
+    def left(self):
+        """ Returns the node's left edge. """
+        return ArrayEdge(self.graph, self.graph.incident_edges(self.index)[0])
+
+    def vertical(self):
+        """ Returns the node's vertical edge. """
+        return ArrayEdge(self.graph, self.graph.incident_edges(self.index)[1])
+
+    def right(self):
+        """ Returns the node's right edge. """
+        return ArrayEdge(self.graph, self.graph.incident_edges(self.index)[2])
+
+
+class ArrayEdge:
+    """ A lightweight view of an edge of an ArrayGraph with the same interface as graph.Edge. """
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = int(index)
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayEdge) and self.index == other.index and self.graph is other.graph
+
+    def __hash__(self):
+        return self.index
+
+    @property
+    def value(self):
+        return VALUE_BY_STATE[self.graph.values[self.index]]
+
+    @value.setter
+    def value(self, value):
+        self.graph.values[self.index] = STATE_BY_VALUE[value]
+
+    @property
+    def state(self):
+        return int(self.graph.values[self.index])
+
+    def set_value(self, value):
+        """ Sets the edge's value. Array graphs have no watchers to notify. """
+        self.value = value
+
+    def set_state(self, state):
+        """ Sets the edge's state. Array graphs have no watchers to notify. """
+        self.graph.values[self.index] = state
+
+    @property
+    def nodes(self):
+        return [ArrayNode(self.graph, node) for node in self.graph.edge_endpoints(self.index)]
+
+    def other(self, node):
+        """ Returns the endpoint of the edge different from the given one. """
+        first_node, second_node = self.graph.edge_endpoints(self.index)
+        return ArrayNode(self.graph, second_node if node.index == first_node else first_node)
+
+
+class GraphStructure:
+    """ The structure of an encoding graph stored as arrays, without any of the edge states.
+
+    The edges are laid out column by column: the 2 ** k horizontal edges entering inner layer l (ordered by gate number)
+    are followed by the 2 ** (k - 1) vertical edges of layer l, and the edges of the end nodes come last. This way all
+    of the edges of a single layer lie in one contiguous range. The nodes are numbered with the start nodes first, then
+    the inner nodes layer by layer in the same order as Graph.nodes_by_layer, and the end nodes last.
+
+    The structure arrays are shared by all graphs with the same k, and the subclasses only own their edge states, stored
+    in values with the edges along the last axis.
+    """
+    def __init__(self, k):
+        """
+        Gets the structure of an encoding graph.
+
+        :param k: the power of the amount of gates being encoded.
+        """
+        self.init_structure(k)
+
+    def init_structure(self, k):
+        """ Sets k and shares the structure arrays of the graphs with it. """
+        self.k = k
+        self.node_types, self.node_edges, self.edge_nodes, self.gates_by_layer = get_structure(k)
+
+    @property
+    def layer_size(self):
+        """ The amount of edges between the starts of two consecutive columns of horizontal edges. """
+        return 3 * 2 ** (self.k - 1)
+
+    @property
+    def edge_count(self):
+        """ The amount of edges of the graph, (k + 1) * 2 ** k horizontal ones and k * 2 ** (k - 1) vertical ones. """
+        return self.k * self.layer_size + 2 ** self.k
+
+    @property
+    def start_edges(self):
+        """ The indexes of the edges of the start nodes, ordered by gate number. """
+        return np.arange(2 ** self.k)
+
+    @property
+    def end_edges(self):
+        """ The indexes of the edges of the end nodes, ordered by gate number. """
+        return self.k * self.layer_size + np.arange(2 ** self.k)
+
+    @property
+    def horizontal_edges(self):
+        """ A boolean mask of the horizontal edges, which are the left and right edges of the inner nodes. """
+        mask = np.ones(self.edge_count, dtype=bool)
+        for layer in range(self.k):
+            mask[layer * self.layer_size + 2 ** self.k:(layer + 1) * self.layer_size] = False
+        return mask
+
+    def reset_to(self, graph):
+        """ Resets the edge states to the state get_copy would return for the given graph of the same kind and shape.
+
+        Only the edge states are reset, the structure stays shared, so this costs a single pass over the states.
+        """
+        self.values[:] = UNKNOWN
+        self.values[..., self.start_edges] = graph.values[..., self.start_edges]
+        self.values[..., self.end_edges] = graph.values[..., self.end_edges]
+
+    def node_type(self, node):
+        """ Returns the NodeType of the node with the given index. """
+        return NODE_TYPES[self.node_types[node]]
+
+    def edge_endpoints(self, edge):
+        """ Returns the indexes of the [first, second] nodes of the edge with the given index. """
+        return self.edge_nodes[edge]
+
+    def inner_gate(self, layer, position):
+        """ Returns the gate number of the inner node at the given position of an inner layer. """
+        return self.gates_by_layer[layer][position]
+
+    def incident_edges(self, node):
+        """ Returns the indexes of the edges of the node with the given index, [left, vertical, right] if inner. """
+        n = 2 ** self.k
+        if node < n:
+            return [node]
+        if node >= n + self.k * n:
+            return [self.k * self.layer_size + node - n - self.k * n]
+        return self.node_edges[node - n]
+
+    def layer_edges(self, layer):
+        """ Returns the edges of the gate pairs of an inner layer, ordered as the pairs are in Graph.nodes_by_layer.
+
+        :param layer: the index of the inner layer, from 0 to k - 1.
+        :return: the arrays of the upper nodes' left and right edges, the lower nodes' left and right edges and the
+        vertical edges connecting the two.
+        """
+        n = 2 ** self.k
+        node_edges = self.node_edges[layer * n:(layer + 1) * n]
+        return node_edges[0::2, 0], node_edges[0::2, 2], node_edges[1::2, 0], node_edges[1::2, 2], node_edges[0::2, 1]
+
+    def node_label(self, node):
+        """ Returns the label that the graph.Node in the same position as the node with the given index has. """
+        n = 2 ** self.k
+        if node < n:
+            return 'start {}'.format(node)
+        if node >= n + self.k * n:
+            return 'end {}'.format(node - n - self.k * n)
+        layer, position = divmod(node - n, n)
+        return '{} {} l{}'.format('lo' if position % 2 else 'up', self.inner_gate(layer, position), layer)
+
+    def node_layer(self, node):
+        """ Returns the inner layer of the node with the given index, -1 for start nodes and k for end nodes, as
+        graph.Node.layer. """
+        n = 2 ** self.k
+        if node < n:
+            return -1
+        return min((node - n) // n, self.k)
+
+
+class ArrayGraph(GraphStructure):
+    """ An encoding graph that stores its edge states in a single NumPy array. """
+    def __init__(self, k, p, rng=random):
+        """
+        Creates an encoding graph with the given parameters.
+
+        :param k: the power of the amount of gates being encoded.
+        :param p: the probability of error for the polar code.
+        :param rng: the random number generator to generate the end node values with.
+        """
+        GraphStructure.__init__(self, k)
+        self.p = p
+        self.values = np.zeros(self.edge_count, dtype=bool)
+        self.values[self.start_edges] = to_states(get_gates(k, p))
+        self.values[self.end_edges] = to_states(get_endpoints(k, p, rng))
+
+    @property
+    def start_nodes(self):
+        return [ArrayNode(self, node) for node in range(2 ** self.k)]
+
+    @property
+    def inner_nodes(self):
+        return [ArrayNode(self, node) for node in range(2 ** self.k, 2 ** self.k * (self.k + 1))]
+
+    @property
+    def end_nodes(self):
+        return [ArrayNode(self, node) for node in range(2 ** self.k * (self.k + 1), 2 ** self.k * (self.k + 2))]
+
+    @property
+    def nodes_by_layer(self):
+        n = 2 ** self.k
+        return [[ArrayNode(self, node) for node in range(layer * n, (layer + 1) * n)] for layer in range(self.k + 2)]
+
+    @property
+    def edges(self):
+        return [ArrayEdge(self, edge) for edge in range(self.edge_count)]
+
+    def inner_layers(self):
+        """ Returns a list containing only the inner layers of the encoding graph. """
+        return self.nodes_by_layer[1:self.k + 1]
+
+    def get_copy(self):
+        """ Returns a deep copy of the current graph's original state with the same outer edge values set. """
+        graph = type(self).__new__(type(self))
+        graph.init_structure(self.k)
+        graph.p = self.p
+        graph.values = np.empty_like(self.values)
+        graph.reset_to(self)
+        return graph
+
+    def update_end_nodes(self, end_node_values):
+        """ Resets the graph's end node values. """
+        self.values[self.end_edges] = to_states(end_node_values)
+
+
+class ImplicitGraph(ArrayGraph):
+    """ An ArrayGraph that computes its structure arithmetically instead of sharing the structure arrays.
+
+    The gate pairs of inner layer l are the gates i and i + 2 ** l with bit l of i unset, so the type, the gate number
+    and the edges of every node follow from its layer and position, and the endpoints of every edge from its column
+    and offset in the layout of GraphStructure. Only the (k + 1) * 2 ** k + k * 2 ** (k - 1) edge states are stored,
+    which makes graphs with k of 20 and more fit into memory, as long as they are propagated by the vectorized methods
+    of array_propagate rather than node by node.
+    """
+    def init_structure(self, k):
+        """ Sets k, there are no structure arrays to share. """
+        self.k = k
+
+    def get_position(self, layer, gate):
+        """ Returns the position of the node with the given gate number in an inner layer of Graph.nodes_by_layer. """
+        pair = (gate >> (layer + 1) << layer) | (gate & (2 ** layer - 1))
+        return 2 * pair + (gate >> layer & 1)
+
+    def get_node(self, layer, gate):
+        """ Returns the index of the node with the given gate number in a layer of nodes_by_layer, from 0 to k + 1. """
+        n = 2 ** self.k
+        if layer in (0, self.k + 1):
+            return layer * n + gate
+        return layer * n + self.get_position(layer - 1, gate)
+
+    def node_type(self, node):
+        """ Returns the NodeType of the node with the given index. """
+        n = 2 ** self.k
+        if node < n or node >= n + self.k * n:
+            return Node.NodeType.EDGE
+        return Node.NodeType.LOWER if node % 2 else Node.NodeType.UPPER
+
+    def inner_gate(self, layer, position):
+        """ Returns the gate number of the inner node at the given position of an inner layer. """
+        pair = position // 2
+        top_gate = (pair >> layer << (layer + 1)) + (pair & (2 ** layer - 1))
+        return top_gate + position % 2 * 2 ** layer
+
+    def edge_endpoints(self, edge):
+        """ Returns the indexes of the [first, second] nodes of the edge with the given index. """
+        n = 2 ** self.k
+        column, offset = divmod(edge, self.layer_size)
+        if offset >= n:
+            # The vertical edges of a layer connect the gates of its pairs.
+            upper_node = n + column * n + 2 * (offset - n)
+            return [upper_node, upper_node + 1]
+        return [self.get_node(column, offset), self.get_node(column + 1, offset)]
+
+    def incident_edges(self, node):
+        """ Returns the indexes of the edges of the node with the given index, [left, vertical, right] if inner. """
+        n = 2 ** self.k
+        if node < n:
+            return [node]
+        if node >= n + self.k * n:
+            return [self.k * self.layer_size + node - n - self.k * n]
+        layer, position = divmod(node - n, n)
+        gate = self.inner_gate(layer, position)
+        return [layer * self.layer_size + gate, layer * self.layer_size + n + position // 2,
+                (layer + 1) * self.layer_size + gate]
+
+    def layer_edges(self, layer):
+        """ Returns the edges of the gate pairs of an inner layer, ordered as the pairs are in Graph.nodes_by_layer.
+
+        :param layer: the index of the inner layer, from 0 to k - 1.
+        :return: the arrays of the upper nodes' left and right edges, the lower nodes' left and right edges and the
+        vertical edges connecting the two.
+        """
+        n = 2 ** self.k
+        pairs = np.arange(n // 2)
+        top_gates = (pairs >> layer << (layer + 1)) + (pairs & (2 ** layer - 1))
+        left_start, right_start = layer * self.layer_size, (layer + 1) * self.layer_size
+        return (left_start + top_gates, right_start + top_gates, left_start + top_gates + 2 ** layer,
+                right_start + top_gates + 2 ** layer, left_start + n + pairs)
+
+
+class MappedGraph(ImplicitGraph):
+    """ An ImplicitGraph with its edge states in a memory-mapped file, so that graphs larger than the memory fit.
+
+    The states are stored in the layout of GraphStructure, so the horizontal edges entering an inner layer together with
+    the vertical edges of the layer are a single contiguous region of the file, and the edges of the end nodes are the
+    last region. Next to the file there is a JSON file with the same name and the suffix '.json', which describes the
+    graph and the progress of the propagation running on it, so that the state of an interrupted run can be inspected
+    after opening it with open_mapped_graph.
+
+    The outer edge states are written chunk by chunk, without lists of all of the gates, so the end node values are
+    generated by iterate_endpoint_states and differ from the ones an ArrayGraph gets from the same rng.
+    """
+    def __init__(self, path, k, p, rng=random, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Creates an encoding graph with the given parameters in a new file.
+
+        :param path: the path of the file to store the edge states in, replaced if it exists.
+        :param k: the power of the amount of gates being encoded.
+        :param p: the probability of error for the polar code.
+        :param rng: the random number generator to generate the end node values with.
+        :param chunk_size: the amount of start and end edge states to write at once.
+        """
+        self.init_structure(k)
+        self.p = p
+        self.path = path
+        self.progress = {}
+        self.values = np.memmap(path, dtype=bool, mode='w+', shape=(self.edge_count,))
+        # The information bits are the same gates as get_gates sets to '?', all of the others are frozen.
+        is_information_bit = get_best_gate_mask(k, p, int(2 ** k * (1 - p)))
+        end_start = k * self.layer_size
+        for start, end_states in iterate_endpoint_states(k, p, rng, chunk_size):
+            stop = start + len(end_states)
+            self.values[start:stop] = ~is_information_bit[start:stop]
+            self.values[end_start + start:end_start + stop] = end_states
+        self.write_progress()
+
+    def get_copy(self, path=None):
+        """ Returns a deep copy of the current graph's original state with the same outer edge values set, stored in a
+        new file at path, by default the graph's path with the suffix '.copy'. """
+        graph = MappedGraph.__new__(MappedGraph)
+        graph.init_structure(self.k)
+        graph.p = self.p
+        graph.path = self.path + '.copy' if path is None else path
+        graph.progress = {}
+        graph.values = np.memmap(graph.path, dtype=bool, mode='w+', shape=(self.edge_count,))
+        graph.reset_to(self)
+        graph.write_progress()
+        return graph
+
+    def reset_to(self, graph, chunk_size=DEFAULT_CHUNK_SIZE):
+        """ Resets the edge states as GraphStructure.reset_to does, a chunk of edges at a time. """
+        n = 2 ** self.k
+        for start in range(0, self.edge_count, chunk_size):
+            self.values[start:start + chunk_size] = UNKNOWN
+        for offset in (0, self.k * self.layer_size):
+            for start in range(offset, offset + n, chunk_size):
+                stop = min(start + chunk_size, offset + n)
+                self.values[start:stop] = graph.values[start:stop]
+
+    def remove(self):
+        """ Deletes the file of the graph and its JSON file, after which the graph can't be used anymore. """
+        del self.values
+        os.remove(self.path)
+        os.remove(self.path + '.json')
+
+    def write_progress(self, **progress):
+        """ Flushes the edge states to the file and then replaces the progress stored next to it with the given one. """
+        self.values.flush()
+        self.progress = progress
+        with open(self.path + '.json', 'w') as progress_file:
+            json.dump({'k': self.k, 'p': self.p, 'progress': progress}, progress_file)
+
+
+def open_mapped_graph(path, mode='r'):
+    """
+    Opens the file of a MappedGraph, for example to inspect the state of an interrupted propagation.
+
+    :param path: the path of the file with the edge states, with its JSON file next to it.
+    :param mode: the mode of np.memmap, 'r' for reading only and 'r+' for continuing to change the graph.
+    :return: the MappedGraph, with the progress of the propagation as it was last written in progress.
+    """
+    with open(path + '.json') as progress_file:
+        description = json.load(progress_file)
+    graph = MappedGraph.__new__(MappedGraph)
+    graph.init_structure(description['k'])
+    graph.p = description['p']
+    graph.path = path
+    graph.progress = description['progress']
+    graph.values = np.memmap(path, dtype=bool, mode=mode, shape=(graph.edge_count,))
+    return graph
+
+
+class BatchGraph(GraphStructure):
+    """ A batch of encoding graphs with the same k and p, which differ only in their end node values.
+
+    The edge states are stored as a matrix with a row of edge states for every trial.
+    """
+    def __init__(self, k, p, trials, rng=random):
+        """
+        Creates a batch of encoding graphs with the given parameters.
+
+        :param k: the power of the amount of gates being encoded.
+        :param p: the probability of error for the polar code.
+        :param trials: the amount of graphs in the batch, each one with randomly generated end node values.
+        :param rng: the random number generator to generate the end node values with.
+        """
+        GraphStructure.__init__(self, k)
+        self.p = p
+        self.values = np.zeros((trials, self.edge_count), dtype=bool)
+        self.values[:, self.start_edges] = to_states(get_gates(k, p))
+        for values in self.values:
+            values[self.end_edges] = to_states(get_endpoints(k, p, rng))
+
+    @property
+    def trials(self):
+        return len(self.values)
+
+    def get_trial(self, trial):
+        """ Returns the graph of a single trial of the batch as an ArrayGraph with a copy of its edge states. """
+        graph = ArrayGraph.__new__(ArrayGraph)
+        graph.init_structure(self.k)
+        graph.p = self.p
+        graph.values = self.values[trial].copy()
+        return graph
+
+    def get_copy(self):
+        """ Returns a deep copy of the current batch's original state with the same outer edge values set. """
+        graph = BatchGraph.__new__(BatchGraph)
+        graph.init_structure(self.k)
+        graph.p = self.p
+        graph.values = np.empty_like(self.values)
+        graph.reset_to(self)
+        return graph
+
+    def update_end_nodes(self, end_node_values):
+        """ Resets the batch's end node values, given as a list of end node values for every trial. """
+        self.values[:, self.end_edges] = [to_states(values) for values in end_node_values]
+
+
+class PackedGraph(GraphStructure):
+    """ A batch of encoding graphs with the same k and p, bit-sliced so that WORD_SIZE trials share a machine word.
+
+    The edge states are stored as a matrix with a row of uint64 words for every WORD_SIZE trials, as made by
+    pack_trials. Since the edge states are booleans, the rules become bitwise operations on whole words, advancing all
+    of the word's trials at once.
+    """
+    def __init__(self, k, p, trials, rng=random):
+        """
+        Creates a packed batch of encoding graphs with the given parameters.
+
+        :param k: the power of the amount of gates being encoded.
+        :param p: the probability of error for the polar code.
+        :param trials: the amount of graphs in the batch, each one with randomly generated end node values.
+        :param rng: the random number generator to generate the end node values with.
+        """
+        GraphStructure.__init__(self, k)
+        self.p = p
+        self.trials = trials
+        # The end node values are generated in the same order as for a BatchGraph.
+        values = np.zeros((trials, self.edge_count), dtype=bool)
+        values[:, self.start_edges] = to_states(get_gates(k, p))
+        for trial_values in values:
+            trial_values[self.end_edges] = to_states(get_endpoints(k, p, rng))
+        self.values = pack_trials(values)
+
+    @property
+    def lanes(self):
+        """ The masks of the bits of every word that hold the states of actual trials of the batch. """
+        return pack_trials(np.ones((self.trials, 1), dtype=bool))[:, 0]
+
+    def get_batch(self):
+        """ Returns the batch as a BatchGraph with a copy of its unpacked edge states. """
+        graph = BatchGraph.__new__(BatchGraph)
+        graph.init_structure(self.k)
+        graph.p = self.p
+        graph.values = unpack_trials(self.values, self.trials)
+        return graph
+
+    def get_trial(self, trial):
+        """ Returns the graph of a single trial of the batch as an ArrayGraph with a copy of its edge states. """
+        word, lane = divmod(trial, WORD_SIZE)
+        graph = ArrayGraph.__new__(ArrayGraph)
+        graph.init_structure(self.k)
+        graph.p = self.p
+        graph.values = (self.values[word] >> np.uint64(lane)) & np.uint64(1) == 1
+        return graph
+
+    def get_copy(self):
+        """ Returns a deep copy of the current batch's original state with the same outer edge values set. """
+        graph = PackedGraph.__new__(PackedGraph)
+        graph.init_structure(self.k)
+        graph.p, graph.trials = self.p, self.trials
+        graph.values = np.empty_like(self.values)
+        graph.reset_to(self)
+        return graph
+
+    def update_end_nodes(self, end_node_values):
+        """ Resets the batch's end node values, given as a list of end node values for every trial. """
+        values = unpack_trials(self.values, self.trials)
+        values[:, self.end_edges] = [to_states(trial_values) for trial_values in end_node_values]
+        self.values = pack_trials(values)
@@ -0,0 +1,237 @@
+""" Module with vectorized strategies of belief propagation for graphs stored as an ArrayGraph.
+
+The rules are checked and applied to whole layers of gate pairs at once. Different pairs of the same layer share no
+edges, so applying the rules pair by pair in a layer is the same as applying them node by node in the order of
+Graph.nodes_by_layer. This way the methods here take exactly as many steps as their counterparts in propagate.py.
+"""
+from propagate import Counter
+import numpy as np
+
+
+# The indexes of the upper and the lower gates' edges in the pair states checked by the L-rule and the R-rule.
+LEFT = (0, 2)
+RIGHT = (1, 3)
+BOTH_SIDES = (LEFT, RIGHT)
+
+
+def gather_pairs(values, edges):
+    """ Returns the states of the edges of the gate pairs of a layer, as returned by ArrayGraph.layer_edges. """
+    return [values[..., pair_edges] for pair_edges in edges]
+
+
+def scatter_pairs(values, edges, states):
+    """ Writes the states of the edges of the gate pairs of a layer back into the graph's edge states. """
+    for pair_edges, pair_states in zip(edges, states):
+        values[..., pair_edges] = pair_states
+
+
+def exactly_two(first, second, third):
+    """ Returns whether exactly two of the three given states are known. """
+    return ((first & second) | (first & third) | (second & third)) & ~(first & second & third)
+
+
+def one_or_two(first, second, third):
+    """ Returns whether one or two of the three given states are known. """
+    return (first | second | third) & ~(first & second & third)
+
+
+def upper_rule_holds(states, extra=None):
+    """ Checks whether upper_rule succeeds for the upper gates, extra marks the vertical edges that would be set. """
+    top_left, top_right, _, _, vertical = states
+    return exactly_two(top_left, top_right, vertical if extra is None else vertical | extra)
+
+
+def lower_rule_holds(states, extra=None):
+    """ Checks whether lower_rule succeeds for the lower gates, extra marks the vertical edges that would be set. """
+    _, _, bottom_left, bottom_right, vertical = states
+    return one_or_two(bottom_left, bottom_right, vertical if extra is None else vertical | extra)
+
+
+def apply_upper_rule(states, mask):
+    """ Applies upper_rule to the upper gates of the pairs selected by mask. """
+    success = mask & upper_rule_holds(states)
+    for index in (0, 1, 4):
+        states[index] |= success
+
+
+def apply_lower_rule(states, mask):
+    """ Applies lower_rule to the lower gates of the pairs selected by mask. """
+    success = mask & lower_rule_holds(states)
+    for index in (2, 3, 4):
+        states[index] |= success
+
+
+def check_rules(states, sides):
+    """ Vectorized left_rule and right_rule with apply_propagate=False for both gates of every pair.
+
+    :param states: the states of the edges of the gate pairs, as returned by gather_pairs.
+    :param sides: the rules to check, LEFT for the L-rule and RIGHT for the R-rule.
+    :return: the masks of the upper and of the lower gates for which one of the rules succeeds.
+    """
+    unknown_vertical = ~states[4]
+    upper_extra = lower_rule_holds(states) & unknown_vertical
+    lower_extra = upper_rule_holds(states) & unknown_vertical
+    upper_unknown = np.zeros_like(states[0])
+    lower_unknown = np.zeros_like(states[0])
+    for upper_side, lower_side in sides:
+        upper_unknown |= ~states[upper_side]
+        lower_unknown |= ~states[lower_side]
+    return upper_unknown & upper_rule_holds(states, upper_extra), lower_unknown & lower_rule_holds(states, lower_extra)
+
+
+def apply_rules(states, upper_mask, lower_mask, sides):
+    """ Vectorized left_rule and right_rule for the selected gates, applied in the same order as in propagate.py.
+
+    Each rule first applies the rule of the gate's partner along the vertical edge, and then the gate's own rule.
+    """
+    for upper_side, _ in sides:
+        selected = upper_mask & ~states[upper_side]
+        apply_lower_rule(states, selected)
+        apply_upper_rule(states, selected)
+    for _, lower_side in sides:
+        selected = lower_mask & ~states[lower_side]
+        apply_upper_rule(states, selected)
+        apply_lower_rule(states, selected)
+
+
+class LayerEdges:
+    """ The edges of the gate pairs of every inner layer of a graph, as returned by layer_edges, indexed by the layer.
+
+    The edges of a layer are only got when the layer is accessed, so that an ImplicitGraph never holds the edges of all
+    of its layers at once. For the graphs sharing the structure arrays they are views of these arrays.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return self.graph.k
+
+    def __getitem__(self, layer):
+        if isinstance(layer, slice):
+            return [self[index] for index in range(self.graph.k)[layer]]
+        if not 0 <= layer < self.graph.k:
+            raise IndexError('layer {} out of range'.format(layer))
+        return self.graph.layer_edges(layer)
+
+
+def get_layers(graph):
+    """ Returns the edges of the gate pairs of every inner layer of the graph as LayerEdges. """
+    return LayerEdges(graph)
+
+
+def get_successive_cancellation_schedule(graph):
+    """ Returns the order in which successive_cancellation_propagate applies the rules to the nodes of the graph.
+
+    :return: a list of (edges, is_upper, side) entries, each one meaning that the L-rule (for side LEFT) or the R-rule
+    (for side RIGHT) is applied to the upper or lower gates of the pairs with the given edges, and the amount of
+    recursive calls that the successive cancellation makes.
+    """
+    layers = get_layers(graph)[:]
+    schedule = []
+    calls = 0
+
+    def visit(layer, gates):
+        # The same recursion as in successive_cancellation_propagate, for the nodes with the given gate numbers of an
+        # inner layer or of the end nodes (when layer is k).
+        nonlocal calls
+        calls += 1
+        if layer < graph.k:
+            pairs = (gates >> (layer + 1) << layer) + (gates & (2 ** layer - 1))
+            edges = [pair_edges[pairs] for pair_edges in layers[layer]]
+            is_upper = not gates[0] & 2 ** layer
+            schedule.append((edges, is_upper, LEFT))
+        if layer > 0:
+            next_is_upper = gates & 2 ** (layer - 1) == 0
+            visit(layer - 1, gates[next_is_upper])
+            visit(layer - 1, gates[~next_is_upper])
+        if layer < graph.k:
+            schedule.append((edges, is_upper, RIGHT))
+
+    visit(graph.k, np.arange(2 ** graph.k))
+    return schedule, calls
+
+
+def apply_successive_cancellation_schedule(values, schedule):
+    """ Applies the rules to the edge states in the order given by get_successive_cancellation_schedule. """
+    for edges, is_upper, side in schedule:
+        states = gather_pairs(values, edges)
+        unselected = np.zeros_like(states[0])
+        selected = ~unselected
+        apply_rules(states, selected if is_upper else unselected, unselected if is_upper else selected, (side,))
+        scatter_pairs(values, edges, states)
+
+
+def lazy_propagate(graph):
+    """ Applies the propagation rules to all nodes in the graph (or in all graphs of a BatchGraph) until none of them
+    succeeds, a whole layer of gate pairs at once.
+
+    The rules only ever set edges to '*', so the final state is the same as for any other order of application.
+    """
+    layers = get_layers(graph)
+    was_success = True
+    while was_success:
+        was_success = False
+        for edges in layers:
+            states = gather_pairs(graph.values, edges)
+            if upper_rule_holds(states).any() or lower_rule_holds(states).any():
+                selected = np.ones_like(states[0])
+                apply_upper_rule(states, selected)
+                apply_lower_rule(states, selected)
+                scatter_pairs(graph.values, edges, states)
+                was_success = True
+
+
+def default_stopping_condition(original_graph):
+    """ The current default stopping condition. Propagation stops once the graph has been fully propagated.
+
+    Just as propagate.was_propagation_finished, only the horizontal edges are compared with the propagated graph.
+    """
+    propagated_graph = original_graph.get_copy()
+    lazy_propagate(propagated_graph)
+    horizontal_edges = original_graph.horizontal_edges
+    propagated_values = propagated_graph.values[horizontal_edges]
+
+    def should_stop(graph):
+        return np.array_equal(graph.values[horizontal_edges], propagated_values)
+    return should_stop
+
+
+def naive_propagate(graph, stopping_condition):
+    """ Applies the propagation rules using naive propagation until stopping_condition is satisfied.
+
+    The rules of all of the inner nodes are checked at once, and then applied layer by layer.
+    Returns the amount of steps (left or right) that the propagation took.
+    """
+    counter = Counter()
+    layers = get_layers(graph)
+    while not stopping_condition(graph):
+        counter.parallel_steps += 1
+        counter.steps += 2 * graph.k * 2 ** graph.k
+        # All of the rules are checked before any of them is applied.
+        masks = [check_rules(gather_pairs(graph.values, edges), BOTH_SIDES) for edges in layers]
+        for edges, (upper_mask, lower_mask) in zip(layers, masks):
+            if upper_mask.any() or lower_mask.any():
+                states = gather_pairs(graph.values, edges)
+                apply_rules(states, upper_mask, lower_mask, BOTH_SIDES)
+                scatter_pairs(graph.values, edges, states)
+    return counter
+
+
+def scheduling_conventional_propagate(graph, stopping_condition):
+    """ Applies the propagation rules using basic scheduling propagation until stopping_condition is satisfied.
+
+    The rules of the nodes of each inner layer are checked and applied at once.
+    Returns the amount of steps (left or right) that the propagation took.
+    """
+    counter = Counter()
+    layers = get_layers(graph)
+    while not stopping_condition(graph):
+        for edges in layers:
+            counter.parallel_steps += 1
+            counter.steps += 2 * 2 ** graph.k
+            states = gather_pairs(graph.values, edges)
+            upper_mask, lower_mask = check_rules(states, BOTH_SIDES)
+            if upper_mask.any() or lower_mask.any():
+                apply_rules(states, upper_mask, lower_mask, BOTH_SIDES)
+                scatter_pairs(graph.values, edges, states)
+    return counter
@@ -0,0 +1,234 @@
+""" Module for propagating all of the trials of a BatchGraph at once.
+
+Every propagation method advances all of the unfinished trials of the batch in lockstep, with the vectorized kernels of
+array_propagate applied to matrices of edge states that have a row per trial. A trial drops out of the active set as
+soon as its stopping condition is met, so each trial takes exactly the steps it would take if propagated on its own.
+Every method returns a list with a Counter for every trial of the batch.
+"""
+from array_propagate import BOTH_SIDES, LEFT, RIGHT, apply_lower_rule, apply_upper_rule, apply_rules, check_rules,\
+    gather_pairs, scatter_pairs, get_layers, lazy_propagate, get_successive_cancellation_schedule,\
+    apply_successive_cancellation_schedule
+from propagate import Counter
+import numpy as np
+
+
+def get_counters(steps, parallel_steps):
+    """ Returns a list of Counters with the given amounts of steps and parallel steps for each trial. """
+    counters = []
+    for trial_steps, trial_parallel_steps in zip(steps, parallel_steps):
+        counter = Counter()
+        counter.steps, counter.parallel_steps = int(trial_steps), int(trial_parallel_steps)
+        counters.append(counter)
+    return counters
+
+
+def default_stopping_condition(original_graph):
+    """ The current default stopping condition. Propagation of a trial stops once it has been fully propagated.
+
+    The returned function gets the edge states of some of the trials and their indexes in the batch, and returns the
+    mask of the trials that should stop.
+    """
+    propagated_graph = original_graph.get_copy()
+    lazy_propagate(propagated_graph)
+    horizontal_edges = original_graph.horizontal_edges
+    propagated_values = propagated_graph.values[:, horizontal_edges]
+
+    def should_stop(values, trials):
+        return (values[:, horizontal_edges] == propagated_values[trials]).all(axis=1)
+    return should_stop
+
+
+def propagate_while_active(graph, stopping_condition, iteration):
+    """ Runs iterations on the unfinished trials of the batch until stopping_condition is satisfied for all of them.
+
+    :param iteration: a function getting the edge states of the active trials and their indexes in the batch, which
+    performs a single iteration of a propagation method by updating the edge states in place.
+    """
+    trials = np.arange(graph.trials)
+    values = graph.values
+    while len(trials):
+        finished = stopping_condition(values, trials)
+        if finished.any():
+            graph.values[trials[finished]] = values[finished]
+            trials, values = trials[~finished], values[~finished]
+            if not len(trials):
+                break
+        iteration(values, trials)
+
+
+def naive_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using naive propagation until stopping_condition is satisfied. """
+    steps = np.zeros(graph.trials, dtype=np.int64)
+    parallel_steps = np.zeros(graph.trials, dtype=np.int64)
+    layers = get_layers(graph)
+    all_edges = [np.concatenate(pair_edges) for pair_edges in zip(*layers)]
+
+    def iteration(values, trials):
+        parallel_steps[trials] += 1
+        steps[trials] += 2 * graph.k * 2 ** graph.k
+        upper_masks, lower_masks = check_rules(gather_pairs(values, all_edges), BOTH_SIDES)
+        for edges, upper_mask, lower_mask in zip(layers, np.split(upper_masks, graph.k, axis=-1),
+                                                 np.split(lower_masks, graph.k, axis=-1)):
+            if upper_mask.any() or lower_mask.any():
+                states = gather_pairs(values, edges)
+                apply_rules(states, upper_mask, lower_mask, BOTH_SIDES)
+                scatter_pairs(values, edges, states)
+
+    propagate_while_active(graph, stopping_condition, iteration)
+    return get_counters(steps, parallel_steps)
+
+
+def get_changes(states, rule, mask):
+    """ Applies a rule like apply_upper_rule or apply_lower_rule, returns the masks of the edge states it changed. """
+    old_states = [state.copy() for state in states]
+    rule(states, mask)
+    return [state & ~old_state for state, old_state in zip(states, old_states)]
+
+
+def apply_rules_list(states, upper_mask, lower_mask):
+    """ Vectorized left_rule_list and right_rule_list for the selected gates, applied in the same order as in
+    propagate.py.
+
+    :return: the masks of the pairs the propagation has made interesting the left and right neighbors of the upper gate,
+    the left and right neighbors of the lower gate, the upper gate and the lower gate of.
+    """
+    top_left, top_right, bottom_left, bottom_right, vertical = range(5)
+    marks = [np.zeros_like(states[0]) for _ in range(6)]
+    for upper_side, _ in BOTH_SIDES:
+        selected = upper_mask & ~states[upper_side]
+        vertical_changes = get_changes(states, apply_lower_rule, selected)
+        changes = get_changes(states, apply_upper_rule, selected)
+        marks[0] |= changes[top_left]
+        marks[1] |= changes[top_right]
+        marks[2] |= vertical_changes[bottom_left]
+        marks[3] |= vertical_changes[bottom_right]
+        # Once the node itself has propagated, it is not interesting any more.
+        marks[4] |= vertical_changes[vertical] & ~(changes[top_left] | changes[top_right] | changes[vertical])
+        marks[5] |= changes[vertical]
+    for _, lower_side in BOTH_SIDES:
+        selected = lower_mask & ~states[lower_side]
+        vertical_changes = get_changes(states, apply_upper_rule, selected)
+        changes = get_changes(states, apply_lower_rule, selected)
+        marks[0] |= vertical_changes[top_left]
+        marks[1] |= vertical_changes[top_right]
+        marks[2] |= changes[bottom_left]
+        marks[3] |= changes[bottom_right]
+        marks[4] |= changes[vertical]
+        marks[5] |= vertical_changes[vertical] & ~(changes[bottom_left] | changes[bottom_right] | changes[vertical])
+    return marks
+
+
+def get_neighbors(graph):
+    """ Returns the inner node indexes of the left and right neighbors of the upper and lower gates of every layer.
+
+    The inner nodes are indexed in the order of Graph.inner_nodes, and the start and end nodes are marked with -1.
+    """
+    n = 2 ** graph.k
+    neighbors = []
+    for edges in get_layers(graph):
+        top_left, top_right, bottom_left, bottom_right, _ = edges
+        layer_neighbors = []
+        for pair_edges, endpoint in ((top_left, 0), (top_right, 1), (bottom_left, 0), (bottom_right, 1)):
+            nodes = graph.edge_nodes[pair_edges, endpoint] - n
+            layer_neighbors.append(np.where((nodes >= 0) & (nodes < graph.k * n), nodes, -1))
+        neighbors.append(layer_neighbors)
+    return neighbors
+
+
+def flooding_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using flooding propagation until stopping_condition is satisfied.
+
+    The interesting nodes of every trial are stored as a mask over the inner nodes.
+    """
+    n = 2 ** graph.k
+    steps = np.zeros(graph.trials, dtype=np.int64)
+    parallel_steps = np.zeros(graph.trials, dtype=np.int64)
+    layers = get_layers(graph)
+    all_edges = [np.concatenate(pair_edges) for pair_edges in zip(*layers)]
+    neighbors = get_neighbors(graph)
+    interesting_nodes = np.zeros((graph.trials, graph.k * n), dtype=bool)
+    interesting_nodes[:, :n] = True
+    interesting_nodes[:, -n:] = True
+
+    def iteration(values, trials):
+        interesting = interesting_nodes[trials]
+        upper_interesting, lower_interesting = interesting[:, 0::2], interesting[:, 1::2]
+        checked = upper_interesting | lower_interesting
+        parallel_steps[trials] += 1
+        # We know the rule since we know from where the counter was updated.
+        steps[trials] += (checked * (4 - upper_interesting - lower_interesting.astype(np.int64))).sum(axis=1)
+        upper_masks, lower_masks = check_rules(gather_pairs(values, all_edges), BOTH_SIDES)
+        upper_masks &= checked
+        lower_masks &= checked
+        interesting[:] = False
+        for layer, (edges, upper_mask, lower_mask) in enumerate(zip(layers, np.split(upper_masks, graph.k, axis=1),
+                                                                    np.split(lower_masks, graph.k, axis=1))):
+            if not (upper_mask.any() or lower_mask.any()):
+                continue
+            states = gather_pairs(values, edges)
+            marks = apply_rules_list(states, upper_mask, lower_mask)
+            scatter_pairs(values, edges, states)
+            for neighbor_nodes, neighbor_marks in zip(neighbors[layer], marks):
+                is_inner = neighbor_nodes >= 0
+                interesting[:, neighbor_nodes[is_inner]] |= neighbor_marks[:, is_inner]
+            interesting[:, layer * n:(layer + 1) * n:2] |= marks[4]
+            interesting[:, layer * n + 1:(layer + 1) * n:2] |= marks[5]
+        interesting_nodes[trials] = interesting
+
+    propagate_while_active(graph, stopping_condition, iteration)
+    return get_counters(steps, parallel_steps)
+
+
+def scheduling_conventional_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using basic scheduling propagation until stopping_condition is
+    satisfied. """
+    steps = np.zeros(graph.trials, dtype=np.int64)
+    parallel_steps = np.zeros(graph.trials, dtype=np.int64)
+    layers = get_layers(graph)
+
+    def iteration(values, trials):
+        parallel_steps[trials] += graph.k
+        steps[trials] += 2 * graph.k * 2 ** graph.k
+        for edges in layers:
+            states = gather_pairs(values, edges)
+            upper_mask, lower_mask = check_rules(states, BOTH_SIDES)
+            if upper_mask.any() or lower_mask.any():
+                apply_rules(states, upper_mask, lower_mask, BOTH_SIDES)
+                scatter_pairs(values, edges, states)
+
+    propagate_while_active(graph, stopping_condition, iteration)
+    return get_counters(steps, parallel_steps)
+
+
+def scheduling_round_trip_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using round-trip scheduling propagation until stopping_condition is
+    satisfied. """
+    steps = np.zeros(graph.trials, dtype=np.int64)
+    parallel_steps = np.zeros(graph.trials, dtype=np.int64)
+    layers = get_layers(graph)
+
+    def iteration(values, trials):
+        parallel_steps[trials] += 2 * graph.k
+        steps[trials] += 2 * graph.k * 2 ** graph.k
+        for ordered_layers, side in ((layers[::-1], LEFT), (layers, RIGHT)):
+            for edges in ordered_layers:
+                states = gather_pairs(values, edges)
+                upper_mask, lower_mask = check_rules(states, (side,))
+                if upper_mask.any() or lower_mask.any():
+                    apply_rules(states, upper_mask, lower_mask, (side,))
+                    scatter_pairs(values, edges, states)
+
+    propagate_while_active(graph, stopping_condition, iteration)
+    return get_counters(steps, parallel_steps)
+
+
+def successive_cancellation_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using successive cancellation propagation.
+
+    Just as in propagate.py, successive cancellation does not check the stopping condition, and all of the trials take
+    the same amount of steps.
+    """
+    schedule, calls = get_successive_cancellation_schedule(graph)
+    apply_successive_cancellation_schedule(graph.values, schedule)
+    steps = np.full(graph.trials, sum(len(edges[0]) for edges, _, _ in schedule), dtype=np.int64)
+    return get_counters(steps, np.full(graph.trials, 2 * calls, dtype=np.int64))
@@ -0,0 +1,164 @@
+""" Measures the wall-clock time and the peak memory of building and propagating graphs.
+
+Every benchmark is run for a grid of k and p on graphs generated from a fixed seed, so that the runs are comparable
+between revisions of the code. The results are written to a JSON file, which can later be used as the baseline for
+another run: the benchmarks that got slower or used more memory than the baseline by more than a threshold are
+reported as regressions. Only the standard library is used for the measurements, so the benchmarks run offline.
+
+Usage: python benchmark.py [--k 4 6 8] [--p 0.3 0.5 0.7] [--output benchmark.json] [--baseline old.json]
+"""
+from graph import Graph
+from propagate import default_stopping_condition, lazy_propagate, naive_propagate, flooding_propagate,\
+    scheduling_conventional_propagate, scheduling_round_trip_propagate, successive_cancellation_propagate
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+
+DEFAULT_K_LIST = (4, 6, 8)
+DEFAULT_P_LIST = (0.3, 0.5, 0.7)
+DEFAULT_REPEATS = 5
+DEFAULT_THRESHOLD = 0.25
+# The measured values that are compared with the baseline.
+METRICS = ('time', 'peak_memory')
+
+
+def get_graph(k, p, seed):
+    """ Returns the graph with the given parameters that the benchmarks are run on. """
+    return Graph(k, p, random.Random('benchmark {} {} {}'.format(seed, k, p)))
+
+
+def get_method_benchmark(method):
+    """ Returns a benchmark of a propagation method, which propagates a copy of the graph until it is finished. """
+    def setup(graph):
+        return graph.get_copy(), default_stopping_condition(graph)
+    return setup, method
+
+
+# The benchmarks as (name, setup, run) triples. The setup gets the graph and returns the arguments of run, and only run
+# is measured.
+BENCHMARKS = (
+    ('graph', lambda graph: (graph.k, graph.p, random.Random(0)), Graph),
+    ('get_copy', lambda graph: (graph,), Graph.get_copy),
+    ('lazy_propagate', lambda graph: (graph.get_copy(),), lazy_propagate),
+    ('stopping_condition', lambda graph: (graph, graph.get_copy()),
+     lambda graph, graph_copy: default_stopping_condition(graph)(graph_copy)),
+    ('naive_propagate',) + get_method_benchmark(naive_propagate),
+    ('flooding_propagate',) + get_method_benchmark(flooding_propagate),
+    ('scheduling_conventional_propagate',) + get_method_benchmark(scheduling_conventional_propagate),
+    ('scheduling_round_trip_propagate',) + get_method_benchmark(scheduling_round_trip_propagate),
+    ('successive_cancellation_propagate',) + get_method_benchmark(successive_cancellation_propagate),
+)
+
+
+def measure(setup, run, graph, repeats):
+    """ Returns the median time in seconds of repeats runs of a benchmark and the peak memory in bytes that it takes.
+
+    The memory is measured in a separate run, since tracing the allocations slows the run down. Only the memory
+    allocated by run itself is traced, not the memory of its arguments.
+    """
+    times = []
+    for _ in range(repeats):
+        arguments = setup(graph)
+        start = time.perf_counter()
+        run(*arguments)
+        times.append(time.perf_counter() - start)
+    arguments = setup(graph)
+    tracemalloc.start()
+    try:
+        run(*arguments)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak_memory
+
+
+def run_benchmarks(k_list=DEFAULT_K_LIST, p_list=DEFAULT_P_LIST, repeats=DEFAULT_REPEATS, names=None, seed=0):
+    """
+    Runs the benchmarks for every k and p of the grid.
+
+    :param names: the names of the benchmarks to run, all of them by default.
+    :param seed: the seed of the graphs the benchmarks are run on.
+    :return: a dictionary with the description of the machine and a list of the results of every benchmark.
+    """
+    results = []
+    for k in k_list:
+        for p in p_list:
+            graph = get_graph(k, p, seed)
+            for name, setup, run in BENCHMARKS:
+                if names is not None and name not in names:
+                    continue
+                median_time, peak_memory = measure(setup, run, graph, repeats)
+                results.append({'name': name, 'k': k, 'p': p, 'time': median_time, 'peak_memory': peak_memory})
+    return {
+        'machine': platform.platform(),
+        'python': platform.python_version(),
+        'repeats': repeats,
+        'seed': seed,
+        'results': results,
+    }
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the results of run_benchmarks with a baseline of an earlier run.
+
+    :param threshold: the relative growth of a metric over the baseline that counts as a regression.
+    :return: a list of the regressions as (name, k, p, metric, baseline value, value) tuples. The benchmarks missing
+    from the baseline are not compared.
+    """
+    baseline_results = {(result['name'], result['k'], result['p']): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        baseline_result = baseline_results.get((result['name'], result['k'], result['p']))
+        if baseline_result is None:
+            continue
+        for metric in METRICS:
+            if result[metric] > baseline_result[metric] * (1 + threshold):
+                regressions.append((result['name'], result['k'], result['p'], metric, baseline_result[metric],
+                                    result[metric]))
+    return regressions
+
+
+def print_results(results):
+    """ Outputs the results of run_benchmarks in a human-readable format. """
+    for result in results['results']:
+        print('{:<36} k={:<3} p={:<5} {:>10.4f} s {:>12} B'.format(result['name'], result['k'], result['p'],
+                                                                    result['time'], result['peak_memory']))
+
+
+def main(arguments=None):
+    """ Runs the benchmarks from the command line, returns 1 if there were regressions against the baseline. """
+    parser = argparse.ArgumentParser(description='Measures the time and memory of the propagation.')
+    parser.add_argument('--k', type=int, nargs='+', default=DEFAULT_K_LIST, help='the values of k to run')
+    parser.add_argument('--p', type=float, nargs='+', default=DEFAULT_P_LIST, help='the values of p to run')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help='the amount of timed runs')
+    parser.add_argument('--names', nargs='+', help='the benchmarks to run, all of them by default')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the graphs')
+    parser.add_argument('--output', help='the JSON file to write the results to')
+    parser.add_argument('--baseline', help='the JSON file with the results to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='the relative growth that counts as a regression')
+    arguments = parser.parse_args(arguments)
+    results = run_benchmarks(arguments.k, arguments.p, arguments.repeats, arguments.names, arguments.seed)
+    print_results(results)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            regressions = compare_results(results, json.load(baseline_file), arguments.threshold)
+        for name, k, p, metric, baseline_value, value in regressions:
+            print('Regression in {} for k={} p={}: {} grew from {} to {}'.format(name, k, p, metric, baseline_value,
+                                                                               value))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
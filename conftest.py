@@ -0,0 +1,21 @@
+""" The setup shared by all of the test modules when they are run with pytest. """
+from polar import CACHE_DIR_VARIABLE
+import os
+import tempfile
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_cache_dir():
+    """ Points the on-disk cache of the best gates at a temporary directory for the whole test run, so that the tests
+    never read or write the user's cache. The worker processes started by the tests inherit it. """
+    with tempfile.TemporaryDirectory() as cache_dir:
+        previous = os.environ.get(CACHE_DIR_VARIABLE)
+        os.environ[CACHE_DIR_VARIABLE] = cache_dir
+        try:
+            yield cache_dir
+        finally:
+            if previous is None:
+                del os.environ[CACHE_DIR_VARIABLE]
+            else:
+                os.environ[CACHE_DIR_VARIABLE] = previous
@@ -0,0 +1,189 @@
+""" Module for computing exact averages of successive cancellation propagation over all end node configurations.
+
+Layers 0 to j - 1 of the encoding graph only connect the gates within aligned groups of 2 ^ j gates, so the start nodes
+of such a group with the first j inner layers of their gates form a sub-block, the same as the whole graph for k = j.
+successive_cancellation_propagate decodes a sub-block as a whole: it only depends on the frozen start edges of the
+sub-block and on the states of the right edges of its last layer (its input) when the propagation reaches it, and the
+propagation of the sub-block only changes these right edges outside of it. A sub-block of size 2 ^ j is the upper and
+the lower sub-blocks of size 2 ^ (j - 1) joined by layer j - 1, so the outcomes of all inputs of a sub-block are
+computed from the outcomes of its halves, and are memoized for every frozen pattern.
+
+The edge states of a sub-block are stored as bit masks, with bit i for the i-th gate of the sub-block.
+
+Only successive cancellation is covered. Its step amounts are the same for all configurations anyway, so what the
+memoization gives exactly is how well it decodes. The naive, flooding and scheduling methods iterate over the whole
+graph until a global stopping condition holds, so their outcomes do not decompose over sub-blocks, and their averages
+are still computed by enumerating the configurations (experiment.perform_average_computation_all) or by sampling them.
+"""
+from array_propagate import LEFT, RIGHT, apply_rules
+from initialize import get_gates
+from propagate import Counter
+from functools import lru_cache
+from math import comb
+import numpy as np
+
+
+# The largest k with sub-block tables (of 2 ^ (2 ^ (k - 1)) inputs) small enough to be computed.
+MAX_K = 5
+
+
+def get_bits(masks, size):
+    """ Returns a boolean matrix with the given amount of lowest bits of every mask, with a column per bit. """
+    return (masks[:, np.newaxis] >> np.arange(size)) & 1 == 1
+
+
+def get_masks(bits):
+    """ Returns the masks of the rows of a boolean matrix as returned by get_bits. """
+    return (bits.astype(np.int64) << np.arange(bits.shape[1])).sum(axis=1)
+
+
+@lru_cache(maxsize=None)
+def get_popcounts(size):
+    """ Returns the amount of set bits of every mask with the given amount of bits. """
+    popcounts = np.zeros(2 ** size, dtype=np.int64)
+    for bit in range(size):
+        popcounts[2 ** bit:2 ** (bit + 1)] = popcounts[:2 ** bit] + 1
+    popcounts.flags.writeable = False
+    return popcounts
+
+
+def get_frozen_mask(k, p):
+    """ Returns the mask of the frozen start edges of a graph with the given parameters. """
+    return sum(2 ** gate for gate, value in enumerate(get_gates(k, p)) if value == '*')
+
+
+@lru_cache(maxsize=None)
+def get_sub_block_steps(j):
+    """ Returns a Counter with the amount of steps successive_cancellation_propagate takes on a sub-block of size 2 ^ j.
+
+    Every gate of the last layer gets an L-rule and an R-rule, and its upper and lower gates are visited as two separate
+    parallel steps of left and right updates each.
+    """
+    counter = Counter()
+    if j > 0:
+        half_counter = get_sub_block_steps(j - 1)
+        counter.steps = 2 * 2 ** j + 2 * half_counter.steps
+        counter.parallel_steps = 4 + 2 * half_counter.parallel_steps
+    return counter
+
+
+@lru_cache(maxsize=None)
+def get_sub_block_outcomes(j, frozen):
+    """
+    Returns the outcomes of successive_cancellation_propagate on a sub-block of size 2 ^ j for all of its inputs.
+
+    :param j: the power of the size of the sub-block, at least 1.
+    :param frozen: the mask of the frozen start edges of the sub-block.
+    :return: two read-only arrays indexed by the input mask, with the masks of the right edges of the last layer and of
+    the start edges of the sub-block after its propagation.
+    """
+    half = 2 ** (j - 1)
+    inputs = np.arange(2 ** 2 ** j, dtype=np.int64)
+    right_bits = get_bits(inputs, 2 * half)
+    # The left edges of the first layer are the start edges, the other ones are still unknown.
+    left_bits = get_bits(np.array([frozen if j == 1 else 0]), 2 * half).repeat(len(inputs), axis=0)
+    states = [left_bits[:, :half], right_bits[:, :half], left_bits[:, half:], right_bits[:, half:],
+              np.zeros((len(inputs), half), dtype=bool)]
+    selected = np.ones_like(states[0])
+    unselected = ~selected
+    sub_block_starts = []
+    for is_upper, half_frozen in ((True, frozen & (2 ** half - 1)), (False, frozen >> half)):
+        upper_mask, lower_mask = (selected, unselected) if is_upper else (unselected, selected)
+        left_index = 0 if is_upper else 2
+        apply_rules(states, upper_mask, lower_mask, (LEFT,))
+        half_inputs = get_masks(states[left_index])
+        if j > 1:
+            half_outputs, half_starts = get_sub_block_outcomes(j - 1, half_frozen)
+            states[left_index] = get_bits(half_outputs[half_inputs], half)
+            sub_block_starts.append(half_starts[half_inputs])
+        apply_rules(states, upper_mask, lower_mask, (RIGHT,))
+    outputs = get_masks(states[1]) | get_masks(states[3]) << half
+    if j > 1:
+        starts = sub_block_starts[0] | sub_block_starts[1] << half
+    else:
+        # The start edges are the left edges of the first layer, which its own rules may still change.
+        starts = get_masks(states[0]) | get_masks(states[2]) << half
+    outputs.flags.writeable = False
+    starts.flags.writeable = False
+    return outputs, starts
+
+
+def get_input_pairs(size, start, stop):
+    """ Returns the masks (both, lower) of the ternary numbers from start to stop, with digit i set to 2 meaning the
+    i-th bit is set in both masks, 1 meaning it is only set in lower and 0 meaning it is set in neither of them. """
+    numbers = np.arange(start, stop, dtype=np.int64)
+    both = np.zeros_like(numbers)
+    lower = np.zeros_like(numbers)
+    for bit in range(size):
+        digits = numbers % 3
+        numbers //= 3
+        both |= (digits == 2).astype(np.int64) << bit
+        lower |= (digits >= 1).astype(np.int64) << bit
+    return both, lower
+
+
+def get_unknown_starts(k, p, chunk_size=2 ** 20):
+    """
+    Returns the amount of end node configurations of a graph with the given parameters for every amount of start edges
+    that successive_cancellation_propagate leaves unknown on them.
+
+    Only the inputs of the two halves of the graph are enumerated, not the configurations themselves. For end node
+    states a and b of a pair of gates of the last layer, the upper half gets the input a & b, and the lower half gets
+    the input b | (t & a), where t is the output of the upper half. Given the inputs z and w of the halves, the
+    configurations giving them are counted per pair, so only the 3 ^ (2 ^ (k - 1)) pairs of inputs with z a subset of w
+    are enumerated, which is much less than the C(2 ^ k, 2 ^ (k - 1)) configurations.
+
+    :param k: the power of the amount of gates being encoded, from 2 to MAX_K.
+    :param p: the probability of error for the polar code.
+    :param chunk_size: the amount of pairs of inputs enumerated at once.
+    :return: an array with the amount of configurations for every amount of unknown start edges from 0 to 2 ^ k.
+    """
+    half = 2 ** (k - 1)
+    passed_amount = int(2 ** k * (1 - p))
+    frozen = get_frozen_mask(k, p)
+    upper_outputs, upper_starts = get_sub_block_outcomes(k - 1, frozen & (2 ** half - 1))
+    _, lower_starts = get_sub_block_outcomes(k - 1, frozen >> half)
+    popcounts = get_popcounts(half)
+    combinations = np.array([[comb(n, m) for m in range(half + 1)] for n in range(half + 1)], dtype=np.int64)
+    unknown_counts = np.zeros(2 ** k + 1, dtype=np.int64)
+    for start in range(0, 3 ** half, chunk_size):
+        both, lower = get_input_pairs(half, start, min(start + chunk_size, 3 ** half))
+        upper_known = upper_outputs[both]
+        only_lower = lower & ~both
+        # Pairs in both have a and b known, pairs only in lower have either b known, or a and t known.
+        pair_choices = popcounts[only_lower & upper_known]
+        # Pairs in neither of them have b unknown, and a known only if t is unknown.
+        free_pairs = popcounts[(2 ** half - 1) & ~lower & ~upper_known]
+        free_passed = passed_amount - 2 * popcounts[both] - popcounts[only_lower]
+        valid = (free_passed >= 0) & (free_passed <= free_pairs)
+        counts = combinations[free_pairs[valid], free_passed[valid]] << pair_choices[valid]
+        unknown = 2 * half - popcounts[upper_starts[both[valid]]] - popcounts[lower_starts[lower[valid]]]
+        unknown_counts += np.bincount(unknown, weights=counts, minlength=2 ** k + 1).astype(np.int64)
+    return unknown_counts
+
+
+def get_exact_successive_cancellation_result(k, p):
+    """
+    Returns the exact averages of successive_cancellation_propagate over all configurations of get_all_possible_configs.
+
+    :param k: the power of the amount of gates being encoded, from 1 to MAX_K.
+    :param p: the probability of error for the polar code.
+    :return: a Counter with the steps the propagation takes, which are the same for all configurations, the average
+    amount of start edges left unknown and the fraction of configurations with all of the start edges decoded.
+    """
+    if not 1 <= k <= MAX_K:
+        raise ValueError('k should be from 1 to {}, got {}'.format(MAX_K, k))
+    if k == 1:
+        # The whole graph is a single pair, so its table covers all of the configurations.
+        _, starts = get_sub_block_outcomes(1, get_frozen_mask(1, p))
+        popcounts = get_popcounts(2)
+        unknown_counts = np.bincount(2 - popcounts[starts[popcounts == int(2 * (1 - p))]], minlength=3)
+    else:
+        unknown_counts = get_unknown_starts(k, p)
+    steps = get_sub_block_steps(k)
+    counter = Counter()
+    # The end nodes are visited as well, with no rules applied to them.
+    counter.steps, counter.parallel_steps = steps.steps, steps.parallel_steps + 2
+    config_count = int(unknown_counts.sum())
+    average_unknown = int((unknown_counts * np.arange(len(unknown_counts))).sum()) / config_count
+    return counter, average_unknown, int(unknown_counts[0]) / config_count
@@ -1,10 +1,18 @@
 """ Runs the main experiment, ie various BP strategies, on generated inputs. """
+from array_graph import PackedGraph
+from exact import get_exact_successive_cancellation_result
 from graph import Graph
-from initialize import get_all_possible_configs, get_p_list
+from initialize import get_config_count, get_p_list, iterate_configs
+from store import DEFAULT_STORE_PATH, ResultStore
 from propagate import Counter, default_stopping_condition, successive_cancellation_propagate,\
     naive_propagate, flooding_propagate, scheduling_conventional_propagate, scheduling_round_trip_propagate
+import packed_propagate
 import matplotlib.pyplot as plt
 from datetime import datetime
+from multiprocessing import Pool
+from statistics import NormalDist
+import math
+import random
 
 
 class ExperimentResult:
@@ -21,8 +29,15 @@ class ExperimentResult:
         self.round_trip_scheduling_result = round_trip_scheduling_result
         self.successive_cancellation_result = successive_cancellation_result
 
+    def get_intervals(self):
+        """ Returns the confidence intervals of the results sampled by perform_adaptive_computation_random, as a
+        dictionary from the names of the results to SampledCounter.get_intervals tuples. """
+        return {name: result.get_intervals() for name, result in vars(self).items()
+                if isinstance(result, SampledCounter)}
+
     def print(self):
-        """ Outputs the result in a human-readable format. """
+        """ Outputs the result in a human-readable format, with the confidence intervals of get_intervals if there are
+        any. """
         print('''naive: {:.2f}/{:.2f}  flooding: {:.2f}/{:.2f}  conventional scheduling: {:.2f}/{:.2f}'''
               '''   round trip scheduling: {:.2f}/{:.2f}  successive cancellation {:.2f}/{:.2f}'''.format(
                   self.naive_result.steps, self.naive_result.parallel_steps,
@@ -31,60 +46,418 @@ class ExperimentResult:
                   self.round_trip_scheduling_result.steps, self.round_trip_scheduling_result.parallel_steps,
                   self.successive_cancellation_result.steps, self.successive_cancellation_result.parallel_steps,
               ))
+        for name, (steps_interval, parallel_steps_interval, repeats) in self.get_intervals().items():
+            print('{:<32} {} graphs, steps in [{:.2f}, {:.2f}], parallel steps in [{:.2f}, {:.2f}]'.format(
+                name, repeats, *steps_interval, *parallel_steps_interval))
+
+
+class RunningStatistics:
+    """ The mean and the variance of a stream of values, updated with Welford's algorithm in O(1) memory. """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.squares = 0.0  # The sum of the squared differences of the values from their mean.
+
+    def add(self, value):
+        """ Adds a value to the stream. """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.squares += delta * (value - self.mean)
+
+    def get_variance(self):
+        """ Returns the sample variance of the values, 0 for less than two of them. """
+        return self.squares / (self.count - 1) if self.count > 1 else 0.0
+
+    def get_interval(self, z):
+        """ Returns the (low, high) normal confidence interval of the mean, with z the quantile of its confidence. """
+        if self.count == 0:
+            return -math.inf, math.inf
+        half_width = z * math.sqrt(self.get_variance() / self.count)
+        return self.mean - half_width, self.mean + half_width
+
 
+class SampledCounter(Counter):
+    """ A Counter with the average step amounts of a method over sampled graphs and their confidence intervals. """
+    def __init__(self, steps_statistics, parallel_steps_statistics, z):
+        super().__init__()
+        self.steps = steps_statistics.mean
+        self.parallel_steps = parallel_steps_statistics.mean
+        self.steps_interval = steps_statistics.get_interval(z)
+        self.parallel_steps_interval = parallel_steps_statistics.get_interval(z)
+        self.repeats = steps_statistics.count
 
-def get_average_steps(method, graph_list, stopping_conditions):
-    """ Returns the average (over all graphs in a given list) step amount a BP method performs until termination. """
+    def get_intervals(self):
+        """ Returns the confidence intervals of the steps and of the parallel steps and the amount of sampled
+        graphs. """
+        return self.steps_interval, self.parallel_steps_interval, self.repeats
+
+
+# The propagation methods run by the experiments, with the names of their results in an ExperimentResult.
+METHODS = (
+    ('naive_result', naive_propagate),
+    ('flooding_result', flooding_propagate),
+    ('conventional_scheduling_result', scheduling_conventional_propagate),
+    ('round_trip_scheduling_result', scheduling_round_trip_propagate),
+    ('successive_cancellation_result', successive_cancellation_propagate),
+)
+# The same methods propagating all of the trials of a PackedGraph at once.
+BATCH_METHODS = (
+    ('naive_result', packed_propagate.naive_propagate),
+    ('flooding_result', packed_propagate.flooding_propagate),
+    ('conventional_scheduling_result', packed_propagate.scheduling_conventional_propagate),
+    ('round_trip_scheduling_result', packed_propagate.scheduling_round_trip_propagate),
+    ('successive_cancellation_result', packed_propagate.successive_cancellation_propagate),
+)
+# The version of the results stored by the sweeps. It should be increased on every change of the propagation methods
+# that changes their step amounts, so that the stored results computed before it are not used any more.
+RESULTS_VERSION = 1
+
+
+def get_average_steps(method, graph_list, stopping_conditions, graph_copies=None):
+    """ Returns the average (over all graphs in a given list) step amount a BP method performs until termination.
+
+    :param graph_copies: graphs with the same k as the ones in graph_list to reset and propagate instead of creating new
+    copies of the graphs, so that they can be reused for several methods.
+    """
     counter = Counter()
-    results = [method(graph.get_copy(), condition) for graph, condition in zip(graph_list, stopping_conditions)]
+    if graph_copies is None:
+        graph_copies = [graph.get_copy() for graph in graph_list]
+    else:
+        for graph, graph_copy in zip(graph_list, graph_copies):
+            graph_copy.reset_to(graph)
+    results = [method(graph_copy, condition) for graph_copy, condition in zip(graph_copies, stopping_conditions)]
     counter.steps = sum([result.steps for result in results]) / max(len(graph_list), 1)
     counter.parallel_steps = sum([result.parallel_steps for result in results]) / max(len(graph_list), 1)
     return counter
 
 
-def perform_average_computation_random(k, p, repeats):
+def get_average_batch_steps(method, graph, stopping_condition):
+    """ Returns the average (over all trials of a batch) step amount a batched BP method performs until termination. """
+    counter = Counter()
+    results = method(graph.get_copy(), stopping_condition)
+    counter.steps = sum([result.steps for result in results]) / max(len(results), 1)
+    counter.parallel_steps = sum([result.parallel_steps for result in results]) / max(len(results), 1)
+    return counter
+
+
+def perform_average_computation_random(k, p, repeats, rng=random):
     """ Returns an ExperimentResult containing the average step amount for running various BP methods.
 
     The propagation methods are run on repeats randomly generated graphs with k start nodes and probability of error p.
     The same graphs are used for all propagation methods. The propagation methods currently being run are
     naive_propagate, scheduling_conventional_propagate and scheduling_round_trip_propagate.
+    The graphs are generated with the random number generator rng.
     """
     graph_list = []
     condition_list = []
     for _ in range(repeats):
-        graph = Graph(k, p)
+        graph = Graph(k, p, rng)
         graph_list.append(graph)
         condition_list.append(default_stopping_condition(graph))
+    # The same copies are reset and reused for all of the methods.
+    copy_list = [graph.get_copy() for graph in graph_list]
     return ExperimentResult(
-        naive_result=get_average_steps(naive_propagate, graph_list, condition_list),
-        flooding_result=get_average_steps(flooding_propagate, graph_list, condition_list),
-        conventional_scheduling_result=get_average_steps(scheduling_conventional_propagate, graph_list, condition_list),
-        round_trip_scheduling_result=get_average_steps(scheduling_round_trip_propagate, graph_list, condition_list),
-        successive_cancellation_result=get_average_steps(successive_cancellation_propagate, graph_list, condition_list),
+        naive_result=get_average_steps(naive_propagate, graph_list, condition_list, copy_list),
+        flooding_result=get_average_steps(flooding_propagate, graph_list, condition_list, copy_list),
+        conventional_scheduling_result=get_average_steps(scheduling_conventional_propagate, graph_list, condition_list,
+                                                         copy_list),
+        round_trip_scheduling_result=get_average_steps(scheduling_round_trip_propagate, graph_list, condition_list,
+                                                       copy_list),
+        successive_cancellation_result=get_average_steps(successive_cancellation_propagate, graph_list, condition_list,
+                                                         copy_list),
     )
 
 
-def perform_average_computation_all(k, p):
+def perform_average_computation_batched(k, p, repeats, rng=random):
+    """ Returns an ExperimentResult containing the average step amount for running various BP methods.
+
+    The same as perform_average_computation_random, but all of the repeats randomly generated graphs are propagated at
+    once as a single PackedGraph, 64 of them per machine word. The graphs are generated in the same order, so the
+    results are the same as well.
+    """
+    graph = PackedGraph(k, p, repeats, rng)
+    condition = packed_propagate.default_stopping_condition(graph)
+    return ExperimentResult(
+        naive_result=get_average_batch_steps(packed_propagate.naive_propagate, graph, condition),
+        flooding_result=get_average_batch_steps(packed_propagate.flooding_propagate, graph, condition),
+        conventional_scheduling_result=get_average_batch_steps(packed_propagate.scheduling_conventional_propagate,
+                                                               graph, condition),
+        round_trip_scheduling_result=get_average_batch_steps(packed_propagate.scheduling_round_trip_propagate,
+                                                             graph, condition),
+        successive_cancellation_result=get_average_batch_steps(packed_propagate.successive_cancellation_propagate,
+                                                               graph, condition),
+    )
+
+
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MIN_REPEATS = 32
+DEFAULT_MAX_REPEATS = 1024
+# The amount of graphs sampled at once, a single word of a PackedGraph.
+DEFAULT_BATCH_SIZE = 64
+
+
+def get_sample_results(k, p, size, names, batched, rng):
+    """ Returns a dictionary with the lists of the Counters of the methods with the given names on size new graphs. """
+    if batched:
+        graph = PackedGraph(k, p, size, rng)
+        condition = packed_propagate.default_stopping_condition(graph)
+        return {name: method(graph.get_copy(), condition) for name, method in BATCH_METHODS if name in names}
+    graph_list = [Graph(k, p, rng) for _ in range(size)]
+    condition_list = [default_stopping_condition(graph) for graph in graph_list]
+    # The same copies are reset and reused for all of the methods.
+    copy_list = [graph.get_copy() for graph in graph_list]
+    results = {}
+    for name, method in METHODS:
+        if name in names:
+            for graph, graph_copy in zip(graph_list, copy_list):
+                graph_copy.reset_to(graph)
+            results[name] = [method(graph_copy, condition) for graph_copy, condition in zip(copy_list, condition_list)]
+    return results
+
+
+def is_interval_narrow(interval, mean, relative_width):
+    """ Checks whether a confidence interval is at most relative_width times its mean wide. """
+    low, high = interval
+    return high - low <= relative_width * abs(mean)
+
+
+def perform_adaptive_computation_random(k, p, relative_width, min_repeats=DEFAULT_MIN_REPEATS,
+                                        max_repeats=DEFAULT_MAX_REPEATS, confidence=DEFAULT_CONFIDENCE,
+                                        batch_size=DEFAULT_BATCH_SIZE, batched=True, rng=random):
+    """
+    Returns an ExperimentResult with the average step amounts of various BP methods, sampling every method only until
+    its averages are known precisely enough.
+
+    The graphs are generated batch_size at a time, in the same order as by perform_average_computation_random, and
+    every method still sampled is run on all of the graphs of a batch. A method stops being sampled once it has been
+    run on at least min_repeats graphs and the confidence intervals of both of its averages are narrow enough, or once
+    it has been run on max_repeats graphs. Only the running means and variances of the step amounts are kept, so the
+    memory used does not depend on the amount of graphs.
+
+    :param relative_width: the largest width of the confidence intervals relative to the averages, so that near p = 0
+    and p = 1, where the step amounts hardly vary, only min_repeats graphs are sampled.
+    :param confidence: the confidence level of the normal confidence intervals of the averages.
+    :param batched: whether to propagate each batch at once as a PackedGraph or graph by graph.
+    :return: an ExperimentResult of SampledCounters, which also have the confidence intervals the sampling achieved.
+    """
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    statistics = {name: (RunningStatistics(), RunningStatistics()) for name, _ in METHODS}
+    active_names = [name for name, _ in METHODS]
+    repeats = 0
+    while active_names and repeats < max_repeats:
+        size = min(batch_size, max_repeats - repeats)
+        repeats += size
+        for name, results in get_sample_results(k, p, size, active_names, batched, rng).items():
+            steps_statistics, parallel_steps_statistics = statistics[name]
+            for result in results:
+                steps_statistics.add(result.steps)
+                parallel_steps_statistics.add(result.parallel_steps)
+        if repeats >= min_repeats:
+            active_names = [name for name in active_names
+                            if not all(is_interval_narrow(method_statistics.get_interval(z), method_statistics.mean,
+                                                          relative_width)
+                                       for method_statistics in statistics[name])]
+    return ExperimentResult(**{name: SampledCounter(steps_statistics, parallel_steps_statistics, z)
+                               for name, (steps_statistics, parallel_steps_statistics) in statistics.items()})
+
+
+def perform_adaptive_task(task):
+    """ Runs a single task of iterate_adaptive_computation_random, given as a (k, p, relative_width, min_repeats,
+    max_repeats, confidence, batch_size, seed, batched) tuple. """
+    k, p, relative_width, min_repeats, max_repeats, confidence, batch_size, seed, batched = task
+    return perform_adaptive_computation_random(k, p, relative_width, min_repeats, max_repeats, confidence, batch_size,
+                                               batched, random.Random(seed))
+
+
+def iterate_adaptive_computation_random(k, probs, relative_width, min_repeats=DEFAULT_MIN_REPEATS,
+                                        max_repeats=DEFAULT_MAX_REPEATS, confidence=DEFAULT_CONFIDENCE,
+                                        batch_size=DEFAULT_BATCH_SIZE, workers=1, seed=0, batched=True):
+    """ Generates the ExperimentResults of perform_adaptive_computation_random for each of the given probabilities of
+    error, in order.
+
+    The probabilities are spread over workers worker processes, and every probability generates its graphs with its
+    own random number generator seeded from seed, k and p, so the results are the same for any amount of workers.
+    """
+    tasks = [(k, p, relative_width, min_repeats, max_repeats, confidence, batch_size,
+              'adaptive {} {} {}'.format(seed, k, p), batched) for p in probs]
+    if workers == 1:
+        yield from map(perform_adaptive_task, tasks)
+    else:
+        with Pool(workers) as pool:
+            yield from pool.imap(perform_adaptive_task, tasks)
+
+
+def perform_average_computation_all(k, p, start=0, stop=None):
     """ Returns an ExperimentResult containing the average step amount for running various BP methods.
 
     The propagation methods are run on all possible generated graphs with k start nodes and probability of error p.
     The propagation methods currently being run are
     naive_propagate, scheduling_conventional_propagate and scheduling_round_trip_propagate.
+    The end node configurations are streamed one at a time, so the memory used does not depend on their amount. Only
+    the configurations with indexes from start to stop in the order of get_all_possible_configs are used.
     """
-    graph_list = []
-    condition_list = []
-    for end_node_config in get_all_possible_configs(k, p):
-        graph = Graph(k, p)
+    graph = Graph(k, p)
+    graph_copy = graph.get_copy()
+    totals = {name: Counter() for name, _ in METHODS}
+    config_count = 0
+    for end_node_config in iterate_configs(k, p, start, stop):
+        config_count += 1
         graph.update_end_nodes(end_node_config)
-        graph_list.append(graph)
-        condition_list.append(default_stopping_condition(graph))
-    return ExperimentResult(
-        naive_result=get_average_steps(naive_propagate, graph_list, condition_list),
-        flooding_result=get_average_steps(flooding_propagate, graph_list, condition_list),
-        conventional_scheduling_result=get_average_steps(scheduling_conventional_propagate, graph_list, condition_list),
-        round_trip_scheduling_result=get_average_steps(scheduling_round_trip_propagate, graph_list, condition_list),
-        successive_cancellation_result=get_average_steps(successive_cancellation_propagate, graph_list, condition_list),
-    )
+        condition = default_stopping_condition(graph)
+        for name, method in METHODS:
+            # The same copy is reset and reused for all of the methods and configurations.
+            graph_copy.reset_to(graph)
+            result = method(graph_copy, condition)
+            totals[name].steps += result.steps
+            totals[name].parallel_steps += result.parallel_steps
+    for counter in totals.values():
+        counter.steps /= max(config_count, 1)
+        counter.parallel_steps /= max(config_count, 1)
+    return ExperimentResult(**totals)
+
+
+def merge_results(results, weights):
+    """ Returns an ExperimentResult with the weighted average of the step amounts of the given ExperimentResults. """
+    merged_result = ExperimentResult()
+    total_weight = max(sum(weights), 1)
+    for name in vars(merged_result):
+        counter = Counter()
+        counter.steps = sum([getattr(result, name).steps * weight for result, weight in zip(results, weights)])
+        counter.parallel_steps = sum([getattr(result, name).parallel_steps * weight
+                                      for result, weight in zip(results, weights)])
+        counter.steps /= total_weight
+        counter.parallel_steps /= total_weight
+        setattr(merged_result, name, counter)
+    return merged_result
+
+
+def perform_chunk_computation(task):
+    """ Runs a single task of perform_parallel_computation_random, given as a (k, p, repeats, seed, batched) tuple. """
+    k, p, repeats, seed, batched = task
+    perform_average_computation = perform_average_computation_batched if batched else perform_average_computation_random
+    return perform_average_computation(k, p, repeats, random.Random(seed))
+
+
+def iterate_parallel_computation_random(k, probs, repeats, workers=1, chunk_size=50, seed=0, batched=True):
+    """ Generates the ExperimentResults of perform_parallel_computation_random one probability at a time, in order.
+
+    The tasks of all of the probabilities are spread over the worker processes at once, and the result of a probability
+    is generated as soon as all of its chunks are done.
+    """
+    chunks = [min(chunk_size, repeats - start) for start in range(0, repeats, chunk_size)]
+    tasks = [(k, p, chunk, '{} {} {} {}'.format(seed, k, p, index), batched)
+             for p in probs for index, chunk in enumerate(chunks)]
+    if workers == 1:
+        chunk_results = map(perform_chunk_computation, tasks)
+        for _ in probs:
+            yield merge_results([next(chunk_results) for _ in chunks], chunks)
+    else:
+        with Pool(workers) as pool:
+            chunk_results = pool.imap(perform_chunk_computation, tasks)
+            for _ in probs:
+                yield merge_results([next(chunk_results) for _ in chunks], chunks)
+
+
+def perform_parallel_computation_random(k, probs, repeats, workers=1, chunk_size=50, seed=0, batched=True):
+    """ Returns a list of ExperimentResults with the average step amounts for running various BP methods for each of the
+    given probabilities of error.
+
+    The repeats for every probability are split into chunks of at most chunk_size graphs, and the (p, chunk) tasks are
+    spread over a pool of worker processes. Every chunk generates its graphs with its own random number generator
+    seeded from seed, k, p and the chunk's index, and the chunks are merged in order, so the results only depend on the
+    seed and the chunk size and are the same for any amount of workers.
+
+    :param workers: the amount of worker processes, with 1 running all of the tasks in the current process.
+    """
+    return list(iterate_parallel_computation_random(k, probs, repeats, workers, chunk_size, seed, batched))
+
+
+def perform_shard_computation(task):
+    """ Runs a single task of iterate_computation_all, given as a (k, p, start, stop) tuple. """
+    return perform_average_computation_all(*task)
+
+
+def iterate_computation_all(k, probs, workers=1, shard_size=1000):
+    """ Generates ExperimentResults with the average step amounts over all configurations for each of the given
+    probabilities of error, in order.
+
+    The configurations of every probability are split into shards of at most shard_size configurations, and the
+    (p, shard) tasks are spread over workers worker processes. Each shard unranks its first configuration directly,
+    so no worker enumerates the configurations of the other shards.
+    """
+    tasks = []
+    weights = []
+    for prob in probs:
+        config_count = get_config_count(k, prob)
+        shards = [(start, min(start + shard_size, config_count)) for start in range(0, config_count, shard_size)]
+        tasks += [(k, prob, start, stop) for start, stop in shards]
+        weights.append([stop - start for start, stop in shards])
+    if workers == 1:
+        shard_results = map(perform_shard_computation, tasks)
+        for prob_weights in weights:
+            yield merge_results([next(shard_results) for _ in prob_weights], prob_weights)
+    else:
+        with Pool(workers) as pool:
+            shard_results = pool.imap(perform_shard_computation, tasks)
+            for prob_weights in weights:
+                yield merge_results([next(shard_results) for _ in prob_weights], prob_weights)
+
+
+def perform_stored_computation(k, probs, repeats, seed, chunk_size, compute, store_path=DEFAULT_STORE_PATH):
+    """ Returns a list of ExperimentResults for each of the given probabilities, computing only the ones not stored yet.
+
+    The results are those of all of the methods, computed by enumerating or sampling the configurations. The exact
+    results of successive cancellation alone, which exact.py computes without enumerating the configurations, are
+    stored separately by perform_stored_exact_computation.
+
+    :param compute: a function getting a list of probabilities and generating their ExperimentResults in order.
+    :param store_path: the path of the ResultStore with the results, which are stored as soon as they are computed so
+    that an interrupted sweep can be resumed, or None to compute all of the results without storing them.
+    """
+    if store_path is None:
+        return list(compute(probs))
+    store = ResultStore(store_path)
+    try:
+        results = [load_stored_result(store, k, prob, repeats, seed, chunk_size) for prob in probs]
+        missing = [index for index, result in enumerate(results) if result is None]
+        for index, result in zip(missing, compute([probs[index] for index in missing])):
+            store.save(k, probs[index], repeats, seed, chunk_size, RESULTS_VERSION, vars(result))
+            results[index] = result
+    finally:
+        store.close()
+    return results
+
+
+def perform_stored_exact_computation(k, probs, store_path=DEFAULT_STORE_PATH):
+    """ Returns a list of the results of exact.get_exact_successive_cancellation_result for each of the given
+    probabilities, computing only the ones not stored yet.
+
+    :param store_path: the path of the ResultStore with the results, or None to compute all of them without storing
+    them.
+    """
+    if store_path is None:
+        return [get_exact_successive_cancellation_result(k, prob) for prob in probs]
+    store = ResultStore(store_path)
+    try:
+        results = []
+        for prob in probs:
+            result = store.load_exact(k, prob, RESULTS_VERSION)
+            if result is None:
+                result = get_exact_successive_cancellation_result(k, prob)
+                store.save_exact(k, prob, RESULTS_VERSION, result)
+            results.append(result)
+    finally:
+        store.close()
+    return results
+
+
+def load_stored_result(store, k, p, repeats, seed, chunk_size):
+    """ Returns the ExperimentResult stored for a point of a sweep, or None if some of its methods were not stored. """
+    counters = store.load(k, p, repeats, seed, chunk_size, RESULTS_VERSION)
+    if set(counters) != set(vars(ExperimentResult())):
+        return None
+    return ExperimentResult(**counters)
 
 
 def plot_graph(name, k, p_skip, results):
@@ -124,28 +497,100 @@ def plot_graph(name, k, p_skip, results):
     print(datetime.now())  # A rough idea of the execution time.
 
 
-def print_average_result_all(k, dbg=False):
-    """ Outputs the average step amount dependent on probabilities that generate different amounts of frozen bits. """
-    results = []
+def print_average_result_all(k, dbg=False, workers=1, shard_size=1000, store_path=DEFAULT_STORE_PATH):
+    """ Outputs the average step amount dependent on probabilities that generate different amounts of frozen bits.
+
+    The results are computed by iterate_computation_all, and only for the probabilities without results in the store.
+    """
     probs = get_p_list(k)
-    for prob in probs:
-        results.append(perform_average_computation_all(k, prob))
-        if dbg:
-            results[-1].print()
-    plot_graph('Polar decoding with block size {}'.format(2 ** k), k, 1, results)
+    results = perform_stored_computation(k, probs, 0, '', 0,
+                                         lambda missing_probs: iterate_computation_all(k, missing_probs, workers,
+                                                                                       shard_size),
+                                         store_path)
+    if dbg:
+        for result in results:
+            result.print()
+    plot_graph(get_plot_name(k, 0), k, 1, results)
+
 
+def print_average_result_random(k, repeats, p_skip=1, dbg=False, batched=True, workers=1, chunk_size=50, seed=0,
+                                store_path=DEFAULT_STORE_PATH):
+    """ Outputs the average step amount dependent on probabilities that generate different amounts of frozen bits.
 
-def print_average_result_random(k, repeats, p_skip=1, dbg=False):
-    """ Outputs the average step amount dependent on probabilities that generate different amounts of frozen bits. """
-    results = []
+    With batched set, all of the repeats of a chunk are propagated at once as a single PackedGraph. The chunks are
+    spread over workers worker processes as in perform_parallel_computation_random, and the results only depend on
+    the seed and the chunk size. Only the probabilities without results in the store are computed.
+    """
     probs = get_p_list(k)[::p_skip]
     print(probs, '\n', len(probs))
-    for prob in probs:
-        print(prob)
-        results.append(perform_average_computation_random(k, prob, repeats))
-        if dbg:
-            results[-1].print()
-    plot_graph('Polar decoding with block size {}, {} runs'.format(2 ** k, repeats), k, p_skip, results)
+    results = perform_stored_computation(k, probs, repeats, seed, chunk_size,
+                                         lambda missing_probs: iterate_parallel_computation_random(
+                                             k, missing_probs, repeats, workers, chunk_size, seed, batched),
+                                         store_path)
+    if dbg:
+        for prob, result in zip(probs, results):
+            print(prob)
+            result.print()
+    plot_graph(get_plot_name(k, repeats), k, p_skip, results)
+
+
+def print_adaptive_result_random(k, relative_width, min_repeats=DEFAULT_MIN_REPEATS, max_repeats=DEFAULT_MAX_REPEATS,
+                                 batch_size=DEFAULT_BATCH_SIZE, p_skip=1, dbg=False, batched=True, workers=1, seed=0):
+    """ Outputs the average step amount dependent on probabilities that generate different amounts of frozen bits.
+
+    The results are computed by iterate_adaptive_computation_random, with every method sampled until its confidence
+    intervals are at most relative_width times its averages wide. They depend on when the sampling stopped, so they are
+    not stored.
+    """
+    probs = get_p_list(k)[::p_skip]
+    results = list(iterate_adaptive_computation_random(k, probs, relative_width, min_repeats, max_repeats,
+                                                       batch_size=batch_size, workers=workers, seed=seed,
+                                                       batched=batched))
+    if dbg:
+        for prob, result in zip(probs, results):
+            print(prob)
+            result.print()
+    plot_graph('Polar decoding with block size {}, adaptive runs'.format(2 ** k), k, p_skip, results)
+
+
+def print_exact_result_successive_cancellation(k, store_path=DEFAULT_STORE_PATH):
+    """ Outputs the exact averages of successive cancellation over all configurations for every probability.
+
+    The averages are computed from the memoized outcomes of the sub-blocks of the graph rather than by propagating every
+    configuration, so k up to exact.MAX_K can be used even where the configurations are too many to enumerate. Only
+    the probabilities without results in the store are computed.
+    """
+    probs = get_p_list(k)
+    results = perform_stored_exact_computation(k, probs, store_path)
+    for prob, (counter, average_unknown, decoded_fraction) in zip(probs, results):
+        print('p: {:.6f}  successive cancellation {}/{}  unknown start edges: {:.4f}  fully decoded: {:.6f}'.format(
+            prob, counter.steps, counter.parallel_steps, average_unknown, decoded_fraction))
+
+
+def get_plot_name(k, repeats):
+    """ Returns the title of the plot of a sweep, with repeats set to 0 for the sweeps over all configurations. """
+    if repeats == 0:
+        return 'Polar decoding with block size {}'.format(2 ** k)
+    return 'Polar decoding with block size {}, {} runs'.format(2 ** k, repeats)
+
+
+def plot_stored_results(k, repeats=0, p_skip=1, seed=0, chunk_size=50, store_path=DEFAULT_STORE_PATH):
+    """ Plots the results of a sweep from the store without running any propagation.
+
+    The arguments are the same as for the sweep, with repeats set to 0 for print_average_result_all.
+    """
+    probs = get_p_list(k)[::p_skip]
+    if repeats == 0:
+        seed, chunk_size = '', 0
+    store = ResultStore(store_path)
+    try:
+        results = [load_stored_result(store, k, prob, repeats, seed, chunk_size) for prob in probs]
+    finally:
+        store.close()
+    missing_probs = [prob for prob, result in zip(probs, results) if result is None]
+    if missing_probs:
+        raise ValueError('No stored results for k={} and p in {}'.format(k, missing_probs))
+    plot_graph(get_plot_name(k, repeats), k, p_skip, results)
 
 
 if __name__ == '__main__':
@@ -1,20 +1,49 @@
 """ Module for creating and storing an encoding graph. """
 from initialize import get_gates, get_endpoints
-from enum import Enum
+from enum import IntEnum
+from functools import lru_cache
+import instrumentation
+import random
+
+
+# The edge states are stored as small integers telling whether the edge's value is known.
+UNKNOWN = 0
+KNOWN = 1
+STATE_BY_VALUE = {'?': UNKNOWN, '*': KNOWN}
+VALUE_BY_STATE = ('?', '*')
 
 
 class Node:
     """ The node of the encoding graph, a single gate. """
-    class NodeType(Enum):
+    class NodeType(IntEnum):
         """ The type of node. All inner nodes are either lower or upper based on their edges. """
         EDGE = 0
         LOWER = 1
         UPPER = 2
 
-    def __init__(self, label='', node_type=NodeType.EDGE):
+    __slots__ = ('type', 'layer', 'gate', 'edges', '_label')
+
+    def __init__(self, label='', node_type=NodeType.EDGE, layer=None, gate=None):
         self.type = node_type
-        self.label = label
+        self.layer = layer  # The inner layer of the node, -1 for start nodes and k for end nodes.
+        self.gate = gate  # The gate number of the node's row in the graph.
         self.edges = []  # Edges are stored in order [left, vertical, right].
+        self._label = label  # None to compute the label from the gate and the layer, which the nodes of a Graph do.
+
+    @property
+    def label(self):
+        """ The node's debugging label, computed on demand for the nodes of a Graph. """
+        if self._label is not None:
+            return self._label
+        if self.type == UPPER:
+            return 'up {} l{}'.format(self.gate, self.layer)
+        if self.type == LOWER:
+            return 'lo {} l{}'.format(self.gate, self.layer)
+        return '{} {}'.format('start' if self.layer == -1 else 'end', self.gate)
+
+    @label.setter
+    def label(self, label):
+        self._label = label
 
     def add_edge(self, edge):
         """ Adds edge to node. One of the edge's endpoints should be this node. """
@@ -26,12 +55,23 @@ class Node:
 
     def get_neighbor_types(self):
         """ Returns a sorted list of the node's edges' values. """
+        hooks = instrumentation.active
+        if hooks is not None:
+            hooks.record('get_neighbor_types', self, False)
         return sorted([edge.value for edge in self.edges])
 
+    def get_state_code(self):
+        """ Returns the node's edges' states packed into a 3-bit code, with bit i set if the i-th edge is KNOWN. """
+        hooks = instrumentation.active
+        if hooks is not None:
+            hooks.record('get_state_code', self, False)
+        edges = self.edges
+        return edges[0].state | edges[1].state << 1 | edges[2].state << 2
+
     def propagate(self):
         """ Sets all of the node's neighboring edges to '*'. """
         for edge in self.edges:
-            edge.value = '*'
+            edge.set_state(KNOWN)
 
     def left(self):
         """ Returns the node's left edge. """
@@ -46,31 +86,104 @@ class Node:
         return self.edges[2]
 
 
+# The node types as module constants, which are faster to look up than the members of Node.NodeType.
+EDGE = Node.NodeType.EDGE
+LOWER = Node.NodeType.LOWER
+UPPER = Node.NodeType.UPPER
+
+
 class Edge:
-    """ The edge in the encoding graph. Each edge is marked either '?' or '*'. """
+    """ The edge in the encoding graph. Each edge is marked either '?' or '*', stored as the state UNKNOWN or KNOWN. """
+    __slots__ = ('first', 'second', 'state', 'watcher')
+
     def __init__(self, first_node, second_node, value='?'):
         # For vertical edges the first node is the one with the smaller layer than the second one.
         # For horizontal edges the first node has NodeType UPPER and the second one has NodeType LOWER.
-        self.nodes = [first_node, second_node]
+        self.first = first_node
+        self.second = second_node
         first_node.add_edge(self)
         second_node.add_edge(self)
-        self.value = value
+        self.state = STATE_BY_VALUE[value]
+        self.watcher = None  # An object with an edge_changed method, notified by set_state of the edge's changes.
+
+    @property
+    def nodes(self):
+        """ The [first, second] endpoints of the edge. """
+        return [self.first, self.second]
+
+    @property
+    def value(self):
+        """ The edge's value, '?' or '*'. Setting it does not notify the watcher, unlike set_value. """
+        return VALUE_BY_STATE[self.state]
+
+    @value.setter
+    def value(self, value):
+        self.state = STATE_BY_VALUE[value]
+
+    def set_value(self, value):
+        """ Sets the edge's value, notifying the edge's watcher if the value changes. """
+        self.set_state(STATE_BY_VALUE[value])
+
+    def set_state(self, state):
+        """ Sets the edge's state, notifying the edge's watcher if the state changes. """
+        if state != self.state:
+            self.state = state
+            if self.watcher is not None:
+                self.watcher.edge_changed(self)
 
     def other(self, node):
         """ Returns the endpoint of the edge different from the given one. """
-        for other_node in self.nodes:
-            if other_node != node:
-                return other_node
+        return self.second if node is self.first else self.first
+
+
+@lru_cache(maxsize=None)
+def get_structure(k):
+    """
+    Computes the structure of an encoding graph once for every k, so that it is shared by all graphs with the same k.
+
+    The nodes are numbered with the start nodes first, then the inner nodes layer by layer and the end nodes last.
+
+    :param k: the power of the amount of gates being encoded.
+    :return: tuples with the gate number and the type of every node and with the [first, second] nodes of every edge,
+    in the order in which the edges are created.
+    """
+    gates = list(range(2 ** k))
+    node_types = [Node.NodeType.EDGE] * 2 ** k
+    edge_nodes = []
+    current_layer = [i for i in range(2 ** k)]
+    for layer in range(k):
+        for group_start in range(2 ** (k - layer - 1)):
+            current_start = 2 ** (layer + 1) * group_start
+            for gate_number in range(2 ** layer):
+                # Create new gate and add its edges to the graph.
+                top_gate_number = gate_number + current_start
+                bottom_gate_number = gate_number + current_start + 2 ** layer
+                new_top_gate, new_bottom_gate = len(gates), len(gates) + 1
+                gates += [top_gate_number, bottom_gate_number]
+                node_types += [Node.NodeType.UPPER, Node.NodeType.LOWER]
+                edge_nodes.append((current_layer[top_gate_number], new_top_gate))
+                edge_nodes.append((current_layer[bottom_gate_number], new_bottom_gate))
+                edge_nodes.append((new_top_gate, new_bottom_gate))
+                current_layer[top_gate_number] = new_top_gate
+                current_layer[bottom_gate_number] = new_bottom_gate
+
+    # Create the endpoints.
+    for i, gate in enumerate(current_layer):
+        edge_nodes.append((gate, len(gates)))
+        gates.append(i)
+        node_types.append(Node.NodeType.EDGE)
+    return tuple(gates), tuple(node_types), tuple(edge_nodes)
 
 
 class Graph:
     """ Base class for storing a encoding graph. """
-    def __init__(self, k, p):
+    def __init__(self, k, p, rng=random):
         """
         Creates an encoding graph with the given parameters.
 
         :param k: the power of the amount of gates being encoded.
         :param p: the probability of error for the polar code.
+        :param rng: the random number generator to generate the end node values with.
         """
         # Create the original gates.
         self.k = k
@@ -79,41 +192,21 @@ class Graph:
         # Set the original values for the edges.
         for node, value in zip(self.start_nodes, get_gates(k, p)):
             node.edges[0].value = value
-        for node, value in zip(self.end_nodes, get_endpoints(k, p)):
+        for node, value in zip(self.end_nodes, get_endpoints(k, p, rng)):
             node.edges[0].value = value
 
     def init_structure(self):
-        start_nodes = [Node('start {}'.format(i)) for i in range(2 ** self.k)]
-        edges = []
-        inner_nodes = []
-        nodes_by_layer = [start_nodes]
-        current_layer = [i for i in start_nodes]
-        for layer in range(self.k):
-            nodes_by_layer.append([])
-            for group_start in range(2 ** (self.k - layer - 1)):
-                current_start = 2 ** (layer + 1) * group_start
-                for gate_number in range(2 ** layer):
-                    # Create new gate and add its edges to the graph.
-                    top_gate_number = gate_number + current_start
-                    bottom_gate_number = gate_number + current_start + 2 ** layer
-                    new_top_gate = Node('up {} l{}'.format(top_gate_number, layer), node_type=Node.NodeType.UPPER)
-                    new_bottom_gate = Node('lo {} l{}'.format(bottom_gate_number, layer), node_type=Node.NodeType.LOWER)
-                    inner_nodes.append(new_top_gate)
-                    inner_nodes.append(new_bottom_gate)
-                    nodes_by_layer[-1].append(new_top_gate)
-                    nodes_by_layer[-1].append(new_bottom_gate)
-                    edges.append(Edge(current_layer[top_gate_number], new_top_gate))
-                    edges.append(Edge(current_layer[bottom_gate_number], new_bottom_gate))
-                    edges.append(Edge(new_top_gate, new_bottom_gate))
-                    current_layer[top_gate_number] = new_top_gate
-                    current_layer[bottom_gate_number] = new_bottom_gate
-
-        # Create the endpoints.
-        end_nodes = [Node('end {}'.format(i)) for i in range(2 ** self.k)]
-        for gate, end_gate in zip(current_layer, end_nodes):
-            edges.append(Edge(gate, end_gate))
-        nodes_by_layer.append(end_nodes)
-        return start_nodes, inner_nodes, end_nodes, nodes_by_layer, edges
+        """ Creates the nodes and edges of the graph from the structure shared by all graphs with the same k. """
+        gates, node_types, edge_nodes = get_structure(self.k)
+        n = 2 ** self.k
+        nodes = [Node(None, node_type, index // n - 1, gate)
+                 for index, (gate, node_type) in enumerate(zip(gates, node_types))]
+        edges = [Edge(nodes[first_node], nodes[second_node]) for first_node, second_node in edge_nodes]
+        # The edges of the nodes are complete, so they are stored as tuples, which take less memory than lists.
+        for node in nodes:
+            node.edges = tuple(node.edges)
+        nodes_by_layer = [nodes[layer * n:(layer + 1) * n] for layer in range(self.k + 2)]
+        return nodes_by_layer[0], nodes[n:-n], nodes_by_layer[-1], nodes_by_layer, edges
 
     def inner_layers(self):
         """ Returns a list containing only the inner layers of the encoding graph. """
@@ -121,7 +214,7 @@ class Graph:
 
     def get_copy(self):
         """ Returns a deep copy of the current graph's original state with the same outer edge values set. """
-        graph = Graph(1, 1)
+        graph = Graph.__new__(Graph)
         graph.k, graph.p = self.k, self.p
         graph.start_nodes, graph.inner_nodes, graph.end_nodes, graph.nodes_by_layer, graph.edges = self.init_structure()
         for node, node_copy in zip(self.start_nodes, graph.start_nodes):
@@ -130,7 +223,19 @@ class Graph:
             node_copy.edges[0].value = node.edges[0].value
         return graph
 
+    def reset_to(self, graph):
+        """ Resets the graph to the state get_copy would return for the given graph, which should have the same k.
+
+        Only the edge values are reset, so reusing a graph this way is much cheaper than creating a new copy.
+        """
+        for edge in self.edges:
+            edge.set_value('?')
+        for node, own_node in zip(graph.start_nodes, self.start_nodes):
+            own_node.edges[0].set_value(node.edges[0].value)
+        for node, own_node in zip(graph.end_nodes, self.end_nodes):
+            own_node.edges[0].set_value(node.edges[0].value)
+
     def update_end_nodes(self, end_node_values):
         """ Resets the graph's end node values. """
         for node, value in zip(self.end_nodes, end_node_values):
-            node.edges[0].value = value
+            node.edges[0].set_value(value)
@@ -1,8 +1,8 @@
 """ Module with basic functions for computing the initial state of the graph before belief propagation. """
 
 import random
-from polar import get_n_best_gates
-from itertools import combinations
+from polar import get_best_gates
+from math import comb
 
 
 def get_gates(k, p):
@@ -15,25 +15,26 @@ def get_gates(k, p):
     :return: a list of length n with the frozen bits and the information bits differentiated.
     """
     unfrozen_amount = int(2 ** k * (1 - p))
-    best_bits = get_n_best_gates(k, p, unfrozen_amount)
+    best_bits = get_best_gates(k, p, unfrozen_amount)
     gates = ['*'] * 2 ** k
     for bit in best_bits:
         gates[bit] = '?'
     return gates
 
 
-def get_endpoints(k, p):
+def get_endpoints(k, p, rng=random):
     """
     Randomly generate a possible output for the encoding of n = 2 ^ k bits with error probability p.
     The endpoint is set to '*' for a successfully passed bit and '?' for a lost one.
 
     :param k: the power of the amount of gates being encoded.
     :param p: the probability of error for the polar code.
+    :param rng: the random number generator to use, a random.Random or the random module itself.
     :return: a list of length n with the frozen bits and the information bits differentiated.
     """
     endpoints = ['?'] * 2 ** k
     passed_amount = int(2 ** k * (1 - p))
-    successes = random.sample([i for i in range(2 ** k)], passed_amount)
+    successes = rng.sample([i for i in range(2 ** k)], passed_amount)
     for success in successes:
         endpoints[success] = '*'
     return endpoints
@@ -48,14 +49,67 @@ def get_all_possible_configs(k, p):
     :param p: the probability of error for the polar code.
     :return: a list of all the output encodings satisfying the conditions.
     """
-    passed_amount = int(2 ** k * (1 - p))
-    configs = []
-    for combination in combinations(range(2 ** k), passed_amount):
-        endpoints = ['?'] * 2 ** k
+    return list(iterate_configs(k, p))
+
+
+def get_config_count(k, p):
+    """ Returns the amount of outputs generated by get_all_possible_configs for the given k and p. """
+    return comb(2 ** k, int(2 ** k * (1 - p)))
+
+
+def unrank_combination(n, m, index):
+    """
+    Returns the combination of m out of range(n) with the given index in the order of itertools.combinations.
+
+    :param n: the amount of elements to choose from.
+    :param m: the amount of elements in the combination.
+    :param index: the index of the combination, from 0 to comb(n, m) - 1.
+    :return: a list of the combination's elements, in increasing order.
+    """
+    combination = []
+    element = 0
+    for position in range(m):
+        # Skip the combinations starting with the current element while the index is past them.
+        while index >= comb(n - element - 1, m - position - 1):
+            index -= comb(n - element - 1, m - position - 1)
+            element += 1
+        combination.append(element)
+        element += 1
+    return combination
+
+
+def iterate_configs(k, p, start=0, stop=None):
+    """
+    Lazily generates the outputs of get_all_possible_configs with indexes from start to stop, in the same order.
+    The first output is unranked directly, so the outputs can be split into ranges generated independently. Only a
+    single output is kept in memory at a time.
+
+    :param k: the power of the amount of gates being encoded.
+    :param p: the probability of error for the polar code.
+    :param start: the index of the first output to generate.
+    :param stop: the index after the last output to generate, get_config_count(k, p) by default.
+    :return: a generator of the output encodings.
+    """
+    n = 2 ** k
+    passed_amount = int(n * (1 - p))
+    stop = get_config_count(k, p) if stop is None else min(stop, get_config_count(k, p))
+    if start >= stop:
+        return
+    combination = unrank_combination(n, passed_amount, start)
+    for _ in range(start, stop):
+        endpoints = ['?'] * n
         for passed_element in combination:
             endpoints[passed_element] = '*'
-        configs.append(endpoints)
-    return configs
+        yield endpoints
+        # Advance to the next combination in lexicographic order.
+        position = passed_amount - 1
+        while position >= 0 and combination[position] == n - passed_amount + position:
+            position -= 1
+        if position < 0:
+            return
+        combination[position] += 1
+        for next_position in range(position + 1, passed_amount):
+            combination[next_position] = combination[next_position - 1] + 1
 
 
 def get_p_list(k):
@@ -0,0 +1,93 @@
+""" Module for instrumenting the rules of the propagation, counting how often each of them is evaluated and succeeds.
+
+The rules in rules.py and Node.get_state_code report every evaluation to the RuleCounters in active. While it is
+None, which it is unless a propagation is run inside instrumented, the only cost of the instrumentation is checking it
+once per evaluation.
+"""
+from contextlib import contextmanager
+import time
+
+
+# The RuleCounters the evaluations of the rules are currently reported to, None if the instrumentation is off.
+active = None
+# The default of the filters of RuleCounters, matching every layer or mode. None is a mode of its own.
+_ANY = object()
+
+
+class RuleCounters:
+    """ Counts the evaluations and successes of every rule, per layer of the evaluated node and per mode.
+
+    The counts are keyed by (rule, layer, apply_propagate), where layer is Node.layer of the node the rule was evaluated
+    for, and apply_propagate is False for the evaluations that only check whether the rule would succeed, and None for
+    Node.get_state_code and Node.get_neighbor_types. With timing set, the total time of the evaluations is measured as
+    well, including the time of the rules evaluated by them.
+    """
+    def __init__(self, timing=False):
+        self.timing = timing
+        self.calls = {}
+        self.successes = {}
+        self.times = {}
+
+    def enter(self):
+        """ Returns the start time of an evaluation to pass to record, or None without timing. """
+        return time.perf_counter() if self.timing else None
+
+    def record(self, rule, node, success, apply_propagate=None, start=None):
+        """ Records a single evaluation of a rule for a node, started at start as returned by enter. """
+        key = (rule, node.layer, apply_propagate)
+        self.calls[key] = self.calls.get(key, 0) + 1
+        if success:
+            self.successes[key] = self.successes.get(key, 0) + 1
+        if start is not None:
+            self.times[key] = self.times.get(key, 0) + time.perf_counter() - start
+
+    @staticmethod
+    def get_total(values, rule, layer=_ANY, apply_propagate=_ANY):
+        """ Returns the sum of the values of a rule, for a single layer or mode if they are given. """
+        return sum(value for (value_rule, value_layer, value_apply_propagate), value in values.items()
+                   if value_rule == rule and (layer is _ANY or layer == value_layer)
+                   and (apply_propagate is _ANY or apply_propagate == value_apply_propagate))
+
+    def get_calls(self, rule, layer=_ANY, apply_propagate=_ANY):
+        """ Returns the amount of evaluations of a rule, for a single layer or mode if they are given. """
+        return self.get_total(self.calls, rule, layer, apply_propagate)
+
+    def get_successes(self, rule, layer=_ANY, apply_propagate=_ANY):
+        """ Returns the amount of successful evaluations of a rule, for a single layer or mode if they are given. """
+        return self.get_total(self.successes, rule, layer, apply_propagate)
+
+    def get_time(self, rule, layer=_ANY, apply_propagate=_ANY):
+        """ Returns the total time of the evaluations of a rule, for a single layer or mode if they are given. """
+        return self.get_total(self.times, rule, layer, apply_propagate)
+
+    def print(self):
+        """ Outputs the counts in a human-readable format, a line for every rule, layer and mode. """
+        for rule, layer, apply_propagate in sorted(self.calls, key=lambda key: (key[0], str(key[1]), str(key[2]))):
+            key = (rule, layer, apply_propagate)
+            mode = {None: '', True: 'apply', False: 'check'}[apply_propagate]
+            line = '{:<20} layer {:<4} {:<5} calls: {:<10} successes: {:<10}'.format(
+                rule, str(layer), mode, self.calls[key], self.successes.get(key, 0))
+            if self.timing:
+                line += ' time: {:.6f} s'.format(self.times.get(key, 0))
+            print(line)
+
+
+@contextmanager
+def instrumented(counters):
+    """ Reports the evaluations of the rules inside the with block to counters, a RuleCounters. """
+    global active
+    previous, active = active, counters
+    try:
+        yield counters
+    finally:
+        active = previous
+
+
+def run_instrumented(method, graph, stopping_condition, timing=False):
+    """ Runs a propagation method while counting its evaluations of the rules.
+
+    :return: the result of the propagation method and the RuleCounters with its evaluations.
+    """
+    with instrumented(RuleCounters(timing)) as counters:
+        result = method(graph, stopping_condition)
+    return result, counters
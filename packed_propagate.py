@@ -0,0 +1,216 @@
+""" Module for propagating the trials of a PackedGraph, WORD_SIZE trials per word at once.
+
+The kernels of array_propagate only use bitwise operations on the edge states, so they are applied here unchanged to
+the uint64 words of a PackedGraph, with every bit (lane) of a word advancing its own trial. Each trial stops as soon
+as its stopping condition is met: its lane is cleared from the word's mask of active lanes, and the rules are only
+applied to active lanes from then on. The steps are counted per lane, so every trial takes exactly the steps it would
+take if propagated on its own. Every method returns a list with a Counter for every trial of the batch.
+"""
+from array_graph import WORD_SIZE
+from array_propagate import BOTH_SIDES, LEFT, RIGHT, apply_rules, check_rules, gather_pairs, scatter_pairs, get_layers,\
+    get_successive_cancellation_schedule, apply_successive_cancellation_schedule, exactly_two, one_or_two
+from batch_propagate import apply_rules_list, get_counters, get_neighbors
+import numpy as np
+
+
+def get_lanes(words):
+    """ Returns the bits of the given words as a boolean matrix with a column per lane. """
+    lanes = np.ascontiguousarray(words.astype('<u8')).view(np.uint8).reshape(len(words), WORD_SIZE // 8)
+    return np.unpackbits(lanes, axis=1, bitorder='little').astype(bool)
+
+
+def count_lanes(words):
+    """ Returns the amount of set bits of every lane over the last axis of a matrix of words, with a column per
+    lane. """
+    lanes = np.ascontiguousarray(words.astype('<u8')).view(np.uint8).reshape(words.shape + (WORD_SIZE // 8,))
+    return np.unpackbits(lanes, axis=2, bitorder='little').sum(axis=1, dtype=np.int64)
+
+
+def lazy_propagate(graph):
+    """ Applies the propagation rules to all nodes in all of the graphs of the batch at once while there was a single
+    success. """
+    upper_edges, lower_edges = graph.node_edges[0::2], graph.node_edges[1::2]
+    while True:
+        upper_success = exactly_two(*(graph.values[:, upper_edges[:, side]] for side in range(3)))
+        lower_success = one_or_two(*(graph.values[:, lower_edges[:, side]] for side in range(3)))
+        if not (upper_success.any() or lower_success.any()):
+            return
+        # The upper and lower gates of a pair share their vertical edge.
+        graph.values[:, upper_edges[:, 1]] |= upper_success | lower_success
+        for side in (0, 2):
+            graph.values[:, upper_edges[:, side]] |= upper_success
+            graph.values[:, lower_edges[:, side]] |= lower_success
+
+
+def default_stopping_condition(original_graph):
+    """ The current default stopping condition. Propagation of a trial stops once it has been fully propagated.
+
+    The returned function gets the edge states of some of the words and their indexes in the batch, and returns the
+    masks of the lanes of every word that should stop.
+    """
+    propagated_graph = original_graph.get_copy()
+    lazy_propagate(propagated_graph)
+    horizontal_edges = original_graph.horizontal_edges
+    propagated_values = propagated_graph.values[:, horizontal_edges]
+
+    def should_stop(values, words):
+        return ~np.bitwise_or.reduce(values[:, horizontal_edges] ^ propagated_values[words], axis=1)
+    return should_stop
+
+
+def propagate_while_active(graph, stopping_condition, iteration):
+    """ Runs iterations on the unfinished trials of the batch until stopping_condition is satisfied for all of them.
+
+    :param iteration: a function getting the edge states of the words with active lanes, their indexes in the batch and
+    their masks of active lanes, which performs a single iteration of a propagation method on the active lanes by
+    updating the edge states in place.
+    """
+    words = np.arange(len(graph.values))
+    values = graph.values
+    active = graph.lanes
+    while len(words):
+        active = active & ~stopping_condition(values, words)
+        finished = active == 0
+        if finished.any():
+            graph.values[words[finished]] = values[finished]
+            words, values, active = words[~finished], values[~finished], active[~finished]
+            if not len(words):
+                break
+        iteration(values, words, active)
+
+
+def get_lane_counters(graph, steps, parallel_steps):
+    """ Returns a list of Counters for every trial from matrices of steps and parallel steps with a column per lane. """
+    return get_counters(steps.reshape(-1)[:graph.trials], parallel_steps.reshape(-1)[:graph.trials])
+
+
+def naive_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using naive propagation until stopping_condition is satisfied. """
+    steps = np.zeros((len(graph.values), WORD_SIZE), dtype=np.int64)
+    parallel_steps = np.zeros((len(graph.values), WORD_SIZE), dtype=np.int64)
+    layers = get_layers(graph)
+    all_edges = [np.concatenate(pair_edges) for pair_edges in zip(*layers)]
+
+    def iteration(values, words, active):
+        lanes = get_lanes(active)
+        parallel_steps[words] += lanes
+        steps[words] += 2 * graph.k * 2 ** graph.k * lanes
+        upper_masks, lower_masks = check_rules(gather_pairs(values, all_edges), BOTH_SIDES)
+        upper_masks &= active[:, np.newaxis]
+        lower_masks &= active[:, np.newaxis]
+        for edges, upper_mask, lower_mask in zip(layers, np.split(upper_masks, graph.k, axis=-1),
+                                                 np.split(lower_masks, graph.k, axis=-1)):
+            if upper_mask.any() or lower_mask.any():
+                states = gather_pairs(values, edges)
+                apply_rules(states, upper_mask, lower_mask, BOTH_SIDES)
+                scatter_pairs(values, edges, states)
+
+    propagate_while_active(graph, stopping_condition, iteration)
+    return get_lane_counters(graph, steps, parallel_steps)
+
+
+def flooding_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using flooding propagation until stopping_condition is satisfied.
+
+    The interesting nodes of every trial are stored as a bit mask over the inner nodes, with a word per inner node.
+    """
+    n = 2 ** graph.k
+    steps = np.zeros((len(graph.values), WORD_SIZE), dtype=np.int64)
+    parallel_steps = np.zeros((len(graph.values), WORD_SIZE), dtype=np.int64)
+    layers = get_layers(graph)
+    all_edges = [np.concatenate(pair_edges) for pair_edges in zip(*layers)]
+    neighbors = get_neighbors(graph)
+    interesting_nodes = np.zeros((len(graph.values), graph.k * n), dtype=np.uint64)
+    interesting_nodes[:, :n] = ~np.uint64(0)
+    interesting_nodes[:, -n:] = ~np.uint64(0)
+
+    def iteration(values, words, active):
+        interesting = interesting_nodes[words]
+        upper_interesting, lower_interesting = interesting[:, 0::2], interesting[:, 1::2]
+        checked = (upper_interesting | lower_interesting) & active[:, np.newaxis]
+        parallel_steps[words] += get_lanes(active)
+        # We know the rule since we know from where the counter was updated, a pair takes 3 steps if only one of its
+        # gates is interesting and 2 if both are.
+        steps[words] += 3 * count_lanes(checked & (upper_interesting ^ lower_interesting))
+        steps[words] += 2 * count_lanes(checked & upper_interesting & lower_interesting)
+        upper_masks, lower_masks = check_rules(gather_pairs(values, all_edges), BOTH_SIDES)
+        upper_masks &= checked
+        lower_masks &= checked
+        interesting[:] = 0
+        for layer, (edges, upper_mask, lower_mask) in enumerate(zip(layers, np.split(upper_masks, graph.k, axis=1),
+                                                                    np.split(lower_masks, graph.k, axis=1))):
+            if not (upper_mask.any() or lower_mask.any()):
+                continue
+            states = gather_pairs(values, edges)
+            marks = apply_rules_list(states, upper_mask, lower_mask)
+            scatter_pairs(values, edges, states)
+            for neighbor_nodes, neighbor_marks in zip(neighbors[layer], marks):
+                is_inner = neighbor_nodes >= 0
+                interesting[:, neighbor_nodes[is_inner]] |= neighbor_marks[:, is_inner]
+            interesting[:, layer * n:(layer + 1) * n:2] |= marks[4]
+            interesting[:, layer * n + 1:(layer + 1) * n:2] |= marks[5]
+        interesting_nodes[words] = interesting
+
+    propagate_while_active(graph, stopping_condition, iteration)
+    return get_lane_counters(graph, steps, parallel_steps)
+
+
+def scheduling_conventional_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using basic scheduling propagation until stopping_condition is
+    satisfied. """
+    steps = np.zeros((len(graph.values), WORD_SIZE), dtype=np.int64)
+    parallel_steps = np.zeros((len(graph.values), WORD_SIZE), dtype=np.int64)
+    layers = get_layers(graph)
+
+    def iteration(values, words, active):
+        lanes = get_lanes(active)
+        parallel_steps[words] += graph.k * lanes
+        steps[words] += 2 * graph.k * 2 ** graph.k * lanes
+        for edges in layers:
+            states = gather_pairs(values, edges)
+            upper_mask, lower_mask = check_rules(states, BOTH_SIDES)
+            upper_mask &= active[:, np.newaxis]
+            lower_mask &= active[:, np.newaxis]
+            if upper_mask.any() or lower_mask.any():
+                apply_rules(states, upper_mask, lower_mask, BOTH_SIDES)
+                scatter_pairs(values, edges, states)
+
+    propagate_while_active(graph, stopping_condition, iteration)
+    return get_lane_counters(graph, steps, parallel_steps)
+
+
+def scheduling_round_trip_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using round-trip scheduling propagation until stopping_condition is
+    satisfied. """
+    steps = np.zeros((len(graph.values), WORD_SIZE), dtype=np.int64)
+    parallel_steps = np.zeros((len(graph.values), WORD_SIZE), dtype=np.int64)
+    layers = get_layers(graph)
+
+    def iteration(values, words, active):
+        lanes = get_lanes(active)
+        parallel_steps[words] += 2 * graph.k * lanes
+        steps[words] += 2 * graph.k * 2 ** graph.k * lanes
+        for ordered_layers, side in ((layers[::-1], LEFT), (layers, RIGHT)):
+            for edges in ordered_layers:
+                states = gather_pairs(values, edges)
+                upper_mask, lower_mask = check_rules(states, (side,))
+                upper_mask &= active[:, np.newaxis]
+                lower_mask &= active[:, np.newaxis]
+                if upper_mask.any() or lower_mask.any():
+                    apply_rules(states, upper_mask, lower_mask, (side,))
+                    scatter_pairs(values, edges, states)
+
+    propagate_while_active(graph, stopping_condition, iteration)
+    return get_lane_counters(graph, steps, parallel_steps)
+
+
+def successive_cancellation_propagate(graph, stopping_condition):
+    """ Applies the propagation rules to all trials using successive cancellation propagation.
+
+    Just as in propagate.py, successive cancellation does not check the stopping condition, and all of the trials take
+    the same amount of steps.
+    """
+    schedule, calls = get_successive_cancellation_schedule(graph)
+    apply_successive_cancellation_schedule(graph.values, schedule)
+    steps = np.full(graph.trials, sum(len(edges[0]) for edges, _, _ in schedule), dtype=np.int64)
+    return get_counters(steps, np.full(graph.trials, 2 * calls, dtype=np.int64))
@@ -1,15 +1,45 @@
 """ Module with basic helper functions for polarization. """
+from functools import lru_cache
+import json
+import os
+import tempfile
+import numpy as np
+
+
+# The environment variable with the directory of the on-disk cache of the best gates, shared by all processes on the
+# machine. Setting it to an empty string turns the on-disk cache off.
+CACHE_DIR_VARIABLE = 'POLAR_EXP_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'polar-exp')
+# The version of the cached gates, part of the names of the cache files. It should be increased on every change of
+# polarize or select_best_gates that changes the gates they select, so that the gates cached before it are not used.
+CACHE_VERSION = 1
+MEMORY_CACHE_SIZE = 256
+# The amount of probabilities sampled by get_threshold to find the range of the probabilities to partition.
+THRESHOLD_SAMPLE_SIZE = 2 ** 16
 
 
 def polarize(probs):
     """ Helper function to compute polar code probabilities for channels with probabilities probs. """
-    result = []
-    for p in probs:
-        result.append(p ** 2)
-        result.append(2 * p - p ** 2)
+    return polarize_array(np.array(probs, dtype=np.float64)).tolist()
+
+
+def polarize_array(probs):
+    """ The same as polarize, but for a NumPy array of probabilities, with a single butterfly computed at once. """
+    result = np.empty(2 * len(probs), dtype=np.float64)
+    # Unlike probs * probs, float_power rounds the squares exactly as p ** 2 does.
+    squares = np.float_power(probs, 2, out=result[0::2])
+    np.subtract(2 * probs, squares, out=result[1::2])
     return result
 
 
+def get_probabilities(k, p):
+    """ Returns a NumPy array with the probabilities of all of the 2 ** k gates of a polar code. """
+    probs = np.array([p], dtype=np.float64)
+    for _ in range(k):
+        probs = polarize_array(probs)
+    return probs
+
+
 def sort_gates(k, p):
     """
     Sorts the gates of a polar code by their probabilities descending.
@@ -18,21 +48,161 @@ def sort_gates(k, p):
     :param p: the probability of error for the polar code.
     :return: a list of 2 ** k tuples (i, prob[i]) sorted by prob[i].
     """
-    probs = [p]
-    for _ in range(k):
-        probs = polarize(probs)
-    indexed_probs = [(i, probs[i]) for i in range(len(probs))]
-    indexed_probs.sort(key=lambda x: (-x[1], x[0]))
-    return indexed_probs
+    probs = get_probabilities(k, p)
+    # The gates with equal probabilities are ordered by their indexes.
+    order = np.lexsort((np.arange(len(probs)), -probs))
+    return list(zip(order.tolist(), probs[order].tolist()))
+
+
+def get_threshold(probs, n):
+    """
+    Returns the n-th highest of the probabilities, for 0 < n < len(probs), in O(len(probs)).
+
+    The probabilities of a polar code are ordered so regularly that np.partition picks poor pivots and takes up to ten
+    times as long as a full sort on them. So the range of the n-th highest probability is first estimated from a
+    fixed random sample of the probabilities, and only the probabilities strictly inside that range are partitioned,
+    since lots of probabilities can be equal to its bounds. In the unlikely case that the range misses the n-th highest
+    probability, all of the probabilities are sorted instead.
+    """
+    rank = len(probs) - n
+    if len(probs) <= 16 * THRESHOLD_SAMPLE_SIZE:
+        return np.partition(probs, rank)[rank]
+    sample = np.sort(probs[np.random.default_rng(0).integers(0, len(probs), THRESHOLD_SAMPLE_SIZE)])
+    # The rank of the threshold in the sample is within a few of its standard deviations of the estimate.
+    sample_rank = rank * THRESHOLD_SAMPLE_SIZE // len(probs)
+    margin = 8 * int(THRESHOLD_SAMPLE_SIZE ** 0.5)
+    low = sample[sample_rank - margin] if sample_rank >= margin else -np.inf
+    high = sample[sample_rank + margin] if sample_rank + margin < THRESHOLD_SAMPLE_SIZE else np.inf
+    below_amount = np.count_nonzero(probs < low)
+    low_amount = np.count_nonzero(probs == low)
+    if below_amount <= rank < below_amount + low_amount:
+        return low
+    candidates = probs[(probs > low) & (probs < high)]
+    candidate_rank = rank - below_amount - low_amount
+    if 0 <= candidate_rank < len(candidates):
+        return np.partition(candidates, candidate_rank)[candidate_rank]
+    if candidate_rank >= len(candidates) and rank < len(probs) - np.count_nonzero(probs > high):
+        return high
+    return np.sort(probs)[rank]
+
+
+def get_selection_mask(probs, n):
+    """
+    Returns a boolean NumPy array with the n highest of the probabilities set.
+
+    The probabilities above the n-th highest one, found by get_threshold, are selected, and the ones equal to it are
+    taken by their indexes, just as sort_gates orders them.
+    """
+    if n <= 0:
+        return np.zeros(len(probs), dtype=bool)
+    if n >= len(probs):
+        return np.ones(len(probs), dtype=bool)
+    threshold = get_threshold(probs, n)
+    is_selected = probs > threshold
+    tied = np.flatnonzero(probs == threshold)
+    is_selected[tied[:n - np.count_nonzero(is_selected)]] = True
+    return is_selected
+
+
+def get_best_gate_mask(k, p, n):
+    """
+    Returns a boolean NumPy array of the 2 ** k gates with the same n gates set as select_best_gates selects.
+
+    The mask takes a byte per gate instead of a Python integer per selected gate, so unlike the gates of get_best_gates
+    it fits into memory for k of 28 and more. It is not cached.
+    """
+    return get_selection_mask(get_probabilities(k, p), n)
+
+
+def select_best_gates(k, p, n, ordered=True):
+    """
+    Returns a list of the n best gates with the highest probabilities, in the same order as in sort_gates.
+
+    Only the n selected gates, chosen by get_selection_mask, are sorted.
+
+    :param ordered: whether to sort the selected gates as in sort_gates or to leave them ordered by their indexes.
+    """
+    probs = get_probabilities(k, p)
+    if n <= 0:
+        return []
+    selected = np.flatnonzero(get_selection_mask(probs, n))
+    if not ordered:
+        return selected.tolist()
+    # The selected gates are ordered by their indexes, so a stable sort keeps the gates with equal probabilities so.
+    order = np.argsort(-probs[selected], kind='stable')
+    return selected[order].tolist()
+
+
+def get_cache_path(k, p, n, ordered=True):
+    """ Returns the path of the on-disk cache file for the n best gates for k and p, or None if the cache is off. """
+    cache_dir = os.environ.get(CACHE_DIR_VARIABLE, DEFAULT_CACHE_DIR)
+    if not cache_dir:
+        return None
+    # The probability is stored in hex to keep the key exact.
+    return os.path.join(cache_dir, 'best_gates_v{}_k{}_p{}_n{}{}.json'.format(CACHE_VERSION, k, float(p).hex(), n,
+                                                                             '' if ordered else '_by_index'))
+
+
+def load_best_gates(path):
+    """ Returns the gates stored in an on-disk cache file, or None if there is no such file or it can't be read. """
+    try:
+        with open(path) as cache_file:
+            return [int(gate) for gate in json.load(cache_file)]
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def store_best_gates(path, gates):
+    """ Stores the gates in an on-disk cache file.
+
+    The gates are written to a temporary file which then replaces the cache file atomically, so concurrent processes
+    never read a partially written file. Failing to write the cache is not an error, the gates are just not cached.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as cache_file:
+                json.dump(gates, cache_file)
+            os.replace(temporary_path, path)
+        except OSError:
+            os.remove(temporary_path)
+            raise
+    except OSError:
+        pass
+
+
+@lru_cache(maxsize=MEMORY_CACHE_SIZE)
+def get_cached_best_gates(k, p, n, ordered=True):
+    """ Returns a tuple of the n best gates, looked up in the on-disk cache before being computed. """
+    path = get_cache_path(k, p, n, ordered)
+    gates = load_best_gates(path) if path is not None else None
+    if gates is None:
+        gates = select_best_gates(k, p, n, ordered)
+        if path is not None:
+            store_best_gates(path, gates)
+    return tuple(gates)
 
 
 def get_n_best_gates(k, p, n):
     """
     Returns a list of the n best gates with the highest probabilities.
+    The gates are cached in memory and on disk, so they are computed only once for every k, p and n.
     :param k: the power of the amount of gates being encoded.
     :param p: the probability of error for the polar code.
     :param: n: the amount of best gates to return.
     :return: A list of the n indexes of the gates with highest probabilities.
     """
-    sorted_gates = sort_gates(k, p)
-    return [gate[0] for gate in sorted_gates[:n]]
+    return list(get_cached_best_gates(k, p, n))
+
+
+def get_best_gates(k, p, n):
+    """
+    Returns a list of the same gates as get_n_best_gates, but ordered by their indexes.
+    This is enough for choosing the frozen bits and skips sorting the gates by their probabilities.
+    :param k: the power of the amount of gates being encoded.
+    :param p: the probability of error for the polar code.
+    :param: n: the amount of best gates to return.
+    :return: A list of the n indexes of the gates with highest probabilities, in increasing order.
+    """
+    return list(get_cached_best_gates(k, p, n, False))
@@ -1,12 +1,15 @@
 """ Module for the various strategies of belief propagation. """
-from rules import relevant_rule, left_rule, right_rule, left_rule_list, right_rule_list
-from graph import Node
+from rules import LEFT_EDGE, RIGHT_EDGE, relevant_rule, get_rule_writes, apply_side_rules
+from graph import Graph, EDGE, UNKNOWN, KNOWN
+from collections import deque
+from functools import lru_cache
 
 
 class Counter:
     def __init__(self):
         self.steps = 0
         self.parallel_steps = 0
+        self.decoded = None  # Whether all of the start edges were decoded, only checked without a stopping condition.
 
 
 def was_propagation_finished(propagated_graph, graph):
@@ -15,48 +18,226 @@ def was_propagation_finished(propagated_graph, graph):
         # Because of the way scheduling (does not) handle vertical edges, they may not be propagated even when all the
         # neighboring edges have already been set.
         for propagated_edge, edge in zip(propagated_node.edges[0::2], node.edges[0::2]):
-            if propagated_edge.value != edge.value:
+            if propagated_edge.state != edge.state:
                 return False
     return True
 
 
+def get_horizontal_edges(graph):
+    """ Returns the left and right edges of the inner nodes of the graph, the edges was_propagation_finished compares.
+    """
+    return [edge for node in graph.inner_nodes for edge in node.edges[0::2]]
+
+
+@lru_cache(maxsize=None)
+def get_oracle_graph(k):
+    """ Returns the Graph that StoppingCondition propagates the graphs with the given k in, created once for every k.
+    """
+    graph = Graph.__new__(Graph)
+    graph.k, graph.p = k, None
+    graph.start_nodes, graph.inner_nodes, graph.end_nodes, graph.nodes_by_layer, graph.edges = graph.init_structure()
+    return graph
+
+
+class StoppingCondition:
+    """ Stops the propagation once the graph is equal to the graph optimally propagated, just as
+    was_propagation_finished checks, but without comparing the whole graph on every check.
+
+    A Graph is propagated in the graph of get_oracle_graph, reset to it with Graph.reset_to, so that no Node and Edge
+    objects are created for it, and only the states of its horizontal edges are kept.
+
+    The first time the condition is checked for a Graph, it counts the horizontal edges differing from the propagated
+    graph and becomes the watcher of these edges. After that the count is updated on every change of the edges made
+    through Edge.set_state, so each check takes O(1). Graphs without watchable edges, such as an ArrayGraph, are
+    compared as a whole on every check.
+    """
+    def __init__(self, original_graph):
+        if isinstance(original_graph, Graph):
+            propagated_graph = get_oracle_graph(original_graph.k)
+            propagated_graph.reset_to(original_graph)
+        else:
+            propagated_graph = original_graph.get_copy()
+        lazy_propagate(propagated_graph)
+        self.propagated_states = [edge.state for edge in get_horizontal_edges(propagated_graph)]
+        self.graph = None
+        self.expected_values = {}
+        self.differences = 0
+
+    def __call__(self, graph):
+        if not isinstance(graph, Graph):
+            return all(edge.state == state for edge, state in zip(get_horizontal_edges(graph), self.propagated_states))
+        if graph is not self.graph:
+            self.watch(graph)
+        return self.differences == 0
+
+    def watch(self, graph):
+        """ Starts counting the differing edges of the given graph, and stops watching the previous one. """
+        for edge in self.expected_values:
+            edge.watcher = None
+        self.graph = graph
+        # Because of the way scheduling (does not) handle vertical edges, they may not be propagated even when all the
+        # neighboring edges have already been set.
+        self.expected_values = dict(zip(get_horizontal_edges(graph), self.propagated_states))
+        self.differences = 0
+        for edge, expected_value in self.expected_values.items():
+            edge.watcher = self
+            self.differences += edge.state != expected_value
+
+    def edge_changed(self, edge):
+        """ Updates the amount of differing edges after the value of a watched edge has changed. """
+        self.differences += 1 if edge.state != self.expected_values[edge] else -1
+
+
 def default_stopping_condition(original_graph):
     """ The current default stopping condition. Propagation stops once the graph has been fully propagated. """
-    propagated_graph = original_graph.get_copy()
-    lazy_propagate(propagated_graph)
+    return StoppingCondition(original_graph)
+
+
+def was_decoded(graph):
+    """ Checks whether all of the start edges of the graph are known, so all of the information bits were decoded. """
+    return all(node.edges[0].state == KNOWN for node in graph.start_nodes)
+
+
+class FixedPointCondition:
+    """ Stops the propagation once an iteration has not changed any edge, without knowing the propagated graph.
+
+    The rules only ever set edges to '*', so an iteration changed an edge if and only if the amount of known edges has
+    grown. Once an iteration changes nothing, the counter is rolled back to the end of the last iteration that changed
+    a horizontal edge and the counter's decoded flag is set. Since was_propagation_finished only compares the
+    horizontal edges, this gives the same steps as default_stopping_condition whenever the propagation reaches the
+    fully propagated graph.
+    """
+    def __init__(self, counter):
+        self.counter = counter
+        self.known_edges = None
+        self.known_horizontal_edges = None
+        self.productive_steps = (counter.steps, counter.parallel_steps)
+
+    def __call__(self, graph):
+        known_edges = len([edge for edge in graph.edges if edge.state == KNOWN])
+        # The horizontal edges are counted twice, which does not change whether their amount has grown.
+        known_horizontal_edges = len([edge for node in graph.inner_nodes for edge in node.edges[0::2]
+                                      if edge.state == KNOWN])
+        if self.known_edges is not None:
+            if known_horizontal_edges != self.known_horizontal_edges:
+                self.productive_steps = (self.counter.steps, self.counter.parallel_steps)
+            elif known_edges == self.known_edges:
+                self.counter.steps, self.counter.parallel_steps = self.productive_steps
+                self.counter.decoded = was_decoded(graph)
+                return True
+        self.known_edges, self.known_horizontal_edges = known_edges, known_horizontal_edges
+        return False
+
+
+def get_stopping_condition(stopping_condition, counter):
+    """ Returns the stopping condition to propagate with, a FixedPointCondition for counter if stopping_condition is
+    None. """
+    return FixedPointCondition(counter) if stopping_condition is None else stopping_condition
 
-    def should_stop(graph):
-        return was_propagation_finished(propagated_graph, graph)
-    return should_stop
+
+# The amount of consecutive nodes of an inner layer that DirtyBlocks marks together.
+DEFAULT_BLOCK_SIZE = 32
+
+
+class DirtyBlocks:
+    """ Tracks the blocks of consecutive nodes of every inner layer that got new information since they were last
+    checked, so that scheduling can skip the blocks, and whole layers, that did not.
+
+    The rules of a node only depend on the edges of the node and of its partner along the vertical edge, and succeed
+    only if they set one of the node's edges. So once the rules of a node did not succeed, they will not succeed until
+    one of these edges changes, and the writes of the rules that did succeed change these edges themselves. Skipping
+    the nodes of the clean blocks therefore sets exactly the same edges as checking all of the nodes.
+    """
+    def __init__(self, graph, block_size=DEFAULT_BLOCK_SIZE):
+        self.layers = graph.inner_layers()
+        self.block_size = block_size
+        self.blocks = {node: (layer_index, position // block_size)
+                       for layer_index, layer in enumerate(self.layers) for position, node in enumerate(layer)}
+        # Initially all of the blocks are dirty.
+        self.dirty = [set(range(0, (len(layer) + block_size - 1) // block_size)) for layer in self.layers]
+
+    def mark(self, node):
+        """ Marks the blocks of the node and of its partner dirty after the node's edges changed. """
+        if node in self.blocks:
+            layer, block = self.blocks[node]
+            dirty = self.dirty[layer]
+            dirty.add(block)
+            dirty.add(self.blocks[node.vertical().other(node)][1])
+
+    def take_dirty_nodes(self, layer):
+        """ Returns the nodes of the dirty blocks of an inner layer in the order of the layer and marks them clean. """
+        dirty, self.dirty[layer] = self.dirty[layer], set()
+        nodes = self.layers[layer]
+        size = self.block_size
+        return [node for block in sorted(dirty) for node in nodes[block * size:(block + 1) * size]]
+
+
+def commit_writes(pending_writes, dirty_blocks_list):
+    """ Commits the writes of a parallel step, marking the blocks of the nodes with changed edges dirty. """
+    for writes in pending_writes:
+        changed_nodes = writes.commit()
+        # The writes change the edges of their node only if they set one of the edges of its sides, and then the node
+        # on the other end of that edge is changed as well, so an empty list means that nothing changed.
+        if changed_nodes:
+            for dirty_blocks in dirty_blocks_list:
+                dirty_blocks.mark(writes.node)
+                for node in changed_nodes:
+                    dirty_blocks.mark(node)
+
+
+def charge_steps(counter, layer, nodes, steps_per_node, charge_skipped_steps):
+    """ Counts a parallel step over the given checked nodes of a layer, or over the whole layer if charge_skipped_steps
+    is set. A layer with no nodes checked is not counted unless charge_skipped_steps is set. """
+    if charge_skipped_steps:
+        counter.parallel_steps += 1
+        counter.steps += steps_per_node * len(layer)
+    elif nodes:
+        counter.parallel_steps += 1
+        counter.steps += steps_per_node * len(nodes)
 
 
 def lazy_propagate(graph):
-    """ Applies the propagation rules to all nodes in the graph while there was a single success. """
-    was_success = True
-    while was_success:
-        was_success = False
-        for node in graph.inner_nodes:
-            was_success = relevant_rule(node) or was_success
+    """ Applies the propagation rules to all nodes in the graph until none of them succeeds, fully decoding the graph.
+
+    Instead of sweeping over all of the nodes until nothing changes, the nodes to check are kept in a deduplicated
+    queue. A node is queued again only after one of its edges has changed, and every edge changes at most once, so the
+    rules are applied O(E) times in total. The rules only ever set edges to '*', so the final state is the same as for
+    any other order of application.
+    """
+    queue = deque(graph.inner_nodes)
+    queued = set(queue)
+    while queue:
+        node = queue.popleft()
+        queued.remove(node)
+        changed_edges = [edge for edge in node.edges if edge.state == UNKNOWN]
+        if relevant_rule(node):
+            for edge in changed_edges:
+                neighbor = edge.other(node)
+                if neighbor.type != EDGE and neighbor not in queued:
+                    queue.append(neighbor)
+                    queued.add(neighbor)
 
 
 def naive_propagate(graph, stopping_condition):
     """ Applies the propagation rules using naive propagation until stopping_condition is satisfied.
 
     In a single iteration, naive propagation applies the relevant rules in all vertices simultaneously in parallel.
+    If stopping_condition is None, the propagation stops at a fixed point, as checked by FixedPointCondition.
     Returns the amount of steps (left or right) that the propagation took, or None if the propagation failed.
     """
     counter = Counter()
+    stopping_condition = get_stopping_condition(stopping_condition, counter)
     while not stopping_condition(graph):
-        nodes_to_update = []
+        pending_writes = []
         counter.parallel_steps += 1
         for node in graph.inner_nodes:
-            # Add node to a list of nodes to update to mock the parallel execution of the rule checks.
+            # Buffer the writes of the node to mock the parallel execution of the rules.
             counter.steps += 2
-            if left_rule(node, apply_propagate=False) or right_rule(node, apply_propagate=False):
-                nodes_to_update.append(node)
-        for node in nodes_to_update:
-            left_rule(node)
-            right_rule(node)
+            writes = get_rule_writes(node)
+            if writes is not None:
+                pending_writes.append(writes)
+        for writes in pending_writes:
+            writes.commit()
     return counter
 
 
@@ -64,118 +245,161 @@ def flooding_propagate(graph, stopping_condition):
     """ Applies the propagation rules using flooding propagation until stopping_condition is satisfied.
 
     In a single iteration, flooding propagation applies the relevant rules in all vertices the neighbors of which had
-    been updated last iteration simultaneously in parallel.
+    been updated last iteration simultaneously in parallel. If stopping_condition is None, the propagation stops once
+    there are no interesting nodes left, with the steps counted up to the last iteration that updated a node.
     Returns the amount of steps (left or right) that the propagation took, or None if the propagation failed.
     """
     counter = Counter()
-    interesting_nodes = []
+    productive_steps = (0, 0)
+    # The interesting nodes are kept in a set, and only they and their vertical neighbors are checked, in the order of
+    # graph.inner_nodes.
+    positions = {node: position for position, node in enumerate(graph.inner_nodes)}
+    interesting_nodes = set()
     for node in graph.start_nodes:
         for edge in node.edges:
-            interesting_nodes.append(edge.other(node))
+            interesting_nodes.add(edge.other(node))
     for node in graph.end_nodes:
         for edge in node.edges:
-            interesting_nodes.append(edge.other(node))
-    while not stopping_condition(graph):
-        nodes_to_update = []
+            interesting_nodes.add(edge.other(node))
+    while interesting_nodes if stopping_condition is None else not stopping_condition(graph):
+        pending_writes = []
         counter.parallel_steps += 1
-        for node in graph.inner_nodes:
-            add_value = (node not in interesting_nodes) + 1
-            if not (node in interesting_nodes or node.vertical().other(node) in interesting_nodes):
-                continue
-            # Add node to a list of nodes to update to mock the parallel execution of the rule checks.
-            counter.steps += add_value  # We know the rule since we know from where the counter was updated.
-            if right_rule(node, apply_propagate=False) or left_rule(node, apply_propagate=False):
-                nodes_to_update.append(node)
-        interesting_nodes = []
-        for node in nodes_to_update:
-            interesting_nodes += left_rule_list(node)
-            interesting_nodes += right_rule_list(node)
+        checked_nodes = set()
+        for node in interesting_nodes:
+            if node in positions:
+                checked_nodes.add(node)
+                checked_nodes.add(node.vertical().other(node))
+        for node in sorted(checked_nodes, key=positions.get):
+            # Buffer the writes of the node to mock the parallel execution of the rules.
+            # We know the rule since we know from where the counter was updated.
+            counter.steps += (node not in interesting_nodes) + 1
+            writes = get_rule_writes(node)
+            if writes is not None:
+                pending_writes.append(writes)
+        interesting_nodes = set()
+        for writes in pending_writes:
+            interesting_nodes.update(writes.commit())
+        if pending_writes:
+            productive_steps = (counter.steps, counter.parallel_steps)
+    if stopping_condition is None:
+        counter.steps, counter.parallel_steps = productive_steps
+        counter.decoded = was_decoded(graph)
     return counter
 
 
-def scheduling_conventional_propagate(graph, stopping_condition):
+def scheduling_conventional_propagate(graph, stopping_condition, charge_skipped_steps=True,
+                                      block_size=DEFAULT_BLOCK_SIZE):
     """ Applies the propagation rules using basic scheduling propagation until stopping_condition is satisfied.
 
     In a single iteration, conventional scheduling iterates over all of the inner layers in order and applies the
-    relevant rules in all vertices in a layer simultaneously.
+    relevant rules in all vertices in a layer simultaneously. Only the nodes of the blocks that DirtyBlocks marks dirty
+    are checked, which sets the same edges as checking all of them. With charge_skipped_steps set, the skipped nodes are
+    counted as steps all the same, so the counts are those of checking every node; otherwise only the checked nodes and
+    the layers with any of them are counted.
+    If stopping_condition is None, the propagation stops at a fixed point, as checked by FixedPointCondition.
     Returns the amount of steps (left or right) that the propagation took, or None if the propagation failed.
     """
     counter = Counter()
+    stopping_condition = get_stopping_condition(stopping_condition, counter)
+    dirty_blocks = DirtyBlocks(graph, block_size)
+    dirty_blocks_list = (dirty_blocks,)
     while not stopping_condition(graph):
-        for layer in graph.inner_layers():
-            counter.parallel_steps += 1
-            nodes_to_update = []
-            for node in layer:
-                counter.steps += 2
-                if left_rule(node, apply_propagate=False) or right_rule(node, apply_propagate=False):
-                    nodes_to_update.append(node)
-            for node in nodes_to_update:
-                left_rule(node)
-                right_rule(node)
+        for layer_index, layer in enumerate(graph.inner_layers()):
+            nodes = dirty_blocks.take_dirty_nodes(layer_index)
+            charge_steps(counter, layer, nodes, 2, charge_skipped_steps)
+            pending_writes = []
+            for node in nodes:
+                writes = get_rule_writes(node)
+                if writes is not None:
+                    pending_writes.append(writes)
+            commit_writes(pending_writes, dirty_blocks_list)
     return counter
 
 
-def scheduling_round_trip_propagate(graph, stopping_condition):
+def scheduling_round_trip_propagate(graph, stopping_condition, charge_skipped_steps=True,
+                                    block_size=DEFAULT_BLOCK_SIZE):
     """ Applies the propagation rules using round-trip scheduling propagation until stopping_condition is satisfied.
 
     In a single iteration, round-trip scheduling iterates over all of the inner layers twice. On the first iteration it
     applies all of the left-rules to update the left edges' values for the vertices of the layer, and on the second
     iterations it applies all of the right-rules to update the right edges' values for the vertices of the layer.
+    The left and the right passes skip the clean blocks of their own DirtyBlocks, and count the steps just as
+    scheduling_conventional_propagate does.
+    If stopping_condition is None, the propagation stops at a fixed point, as checked by FixedPointCondition.
     Returns the amount of steps (left or right) that the propagation took, or None if the propagation failed.
     """
     counter = Counter()
+    stopping_condition = get_stopping_condition(stopping_condition, counter)
+    layers = graph.inner_layers()
+    passes = [(list(enumerate(layers))[::-1], (LEFT_EDGE,), DirtyBlocks(graph, block_size)),
+              (list(enumerate(layers)), (RIGHT_EDGE,), DirtyBlocks(graph, block_size))]
+    dirty_blocks_list = [dirty_blocks for _, _, dirty_blocks in passes]
     while not stopping_condition(graph):
-        for layer in graph.inner_layers()[::-1]:
-            counter.parallel_steps += 1
-            nodes_to_update = []
-            for node in layer:
-                counter.steps += 1
-                if left_rule(node, apply_propagate=False):
-                    nodes_to_update.append(node)
-            for node in nodes_to_update:
-                left_rule(node)
-        for layer in graph.inner_layers():
-            counter.parallel_steps += 1
-            nodes_to_update = []
-            for node in layer:
-                counter.steps += 1
-                if right_rule(node, apply_propagate=False):
-                    nodes_to_update.append(node)
-            for node in nodes_to_update:
-                right_rule(node)
+        for ordered_layers, sides, dirty_blocks in passes:
+            for layer_index, layer in ordered_layers:
+                nodes = dirty_blocks.take_dirty_nodes(layer_index)
+                charge_steps(counter, layer, nodes, 1, charge_skipped_steps)
+                pending_writes = []
+                for node in nodes:
+                    writes = get_rule_writes(node, sides)
+                    if writes is not None:
+                        pending_writes.append(writes)
+                commit_writes(pending_writes, dirty_blocks_list)
     return counter
 
 
+@lru_cache(maxsize=None)
+def get_successive_cancellation_order(k):
+    """
+    Returns the order in which successive_cancellation_propagate applies the rules to the nodes of the graphs with the
+    given k.
+
+    The recursion of the successive cancellation is unrolled with an explicit stack. The recursive call for an inner
+    layer gets the nodes of an aligned block of gates, the upper or the lower nodes of 2 ^ layer different pairs, which
+    are every other node of a contiguous range of the layer. It applies the L-rules of the nodes as a single parallel
+    step before the calls for the two halves of the block in the previous layer and the R-rules after them. The calls
+    for the same layer are not merged, since the lower half of a block is only decoded after the upper half.
+
+    :return: a tuple of (layer, nodes, side) entries, each one meaning that the L-rule (for side LEFT_EDGE) or the
+    R-rule (for side RIGHT_EDGE) is applied to the nodes of the inner layer selected by the slice nodes, and the amounts
+    of steps and parallel steps the propagation takes.
+    """
+    order = []
+    # The call for the end nodes only passes the upper and the lower halves of the gates on to the last inner layer.
+    steps, parallel_steps = 0, 2
+    stack = [(k - 1, 1, None), (k - 1, 0, None)] if k > 0 else []
+    while stack:
+        # The nodes of the R-rules are those of the L-rules of the same call, the nodes of the L-rules are None.
+        layer, block, nodes = stack.pop()
+        steps += 2 ** layer
+        parallel_steps += 1
+        if nodes is not None:
+            order.append((layer, nodes, RIGHT_EDGE))
+            continue
+        start = (block >> 1) * 2 ** (layer + 1) + (block & 1)
+        nodes = slice(start, start + 2 ** (layer + 1), 2)
+        order.append((layer, nodes, LEFT_EDGE))
+        # The calls are pushed in the reverse order of the recursion: the upper half, the lower half, the R-rules.
+        stack.append((layer, block, nodes))
+        if layer > 0:
+            stack.append((layer - 1, 2 * block + 1, None))
+            stack.append((layer - 1, 2 * block, None))
+    return tuple(order), steps, parallel_steps
+
+
 def successive_cancellation_propagate(graph, stopping_condition):
     """ Applies the propagation rules using successive cancellation propagation until stopping_condition is satisfied.
 
-    Successive cancellation has no iterations per se. It recursively decodes the whole graph in O(n log n) steps.
+    Successive cancellation has no iterations per se. It recursively decodes the whole graph in O(n log n) steps, and
+    only checks whether the graph was decoded if stopping_condition is None. The rules are applied in the order of
+    get_successive_cancellation_order, which is computed once for every k.
     Returns the amount of steps (left or right) that the propagation took, or None if the propagation failed.
     """
     counter = Counter()
-
-    def apply_successive_cancellation(node_list):
-        if not node_list:
-            return
-        upper_nodes = []
-        lower_nodes = []
-        counter.parallel_steps += 1  # Left updates can be parallel here
-        for node in node_list:
-            if node.type != Node.NodeType.EDGE:
-                counter.steps += 1
-                left_rule(node)
-            next_node = node.left().other(node)
-            if next_node.type == Node.NodeType.UPPER:
-                upper_nodes.append(next_node)
-            elif next_node.type == Node.NodeType.LOWER:
-                lower_nodes.append(next_node)
-        apply_successive_cancellation(upper_nodes)
-        apply_successive_cancellation(lower_nodes)
-        counter.parallel_steps += 1  # Right updates can be parallel here
-        for node in node_list:
-            if node.type != Node.NodeType.EDGE:
-                counter.steps += 1
-                right_rule(node)
-
-    apply_successive_cancellation(graph.end_nodes)
+    order, counter.steps, counter.parallel_steps = get_successive_cancellation_order(graph.k)
+    layers = graph.inner_layers()
+    for layer, nodes, side in order:
+        apply_side_rules(layers[layer][nodes], side)
+    if stopping_condition is None:
+        counter.decoded = was_decoded(graph)
     return counter
@@ -1,37 +1,91 @@
 """ Module for the rules by which the encoding graph propagates. """
-from graph import Node
+from graph import Node, EDGE, LOWER, UPPER, UNKNOWN, KNOWN
+import instrumentation
+
+
+# The indexes of the edges set by the L-rule and the R-rule in Node.edges.
+LEFT_EDGE = 0
+RIGHT_EDGE = 2
+
+
+def get_rule_table(node_type, extra_propagation, apply_propagate):
+    """
+    Computes the outcomes of the rule of a node type for all of the state codes of a node.
+
+    The upper rule succeeds if two of the values are known and the lower rule succeeds if one or two of them are, with
+    one less known value needed after an extra propagation, which has set the vertical edge without it being counted.
+
+    :return: a tuple indexed by the state code with (resulting state code, success) pairs. The resulting state code
+    has all of the edges set on success if apply_propagate is True, and is the same as the original one otherwise.
+    """
+    if node_type == UPPER:
+        known_amounts = (1,) if extra_propagation else (2,)
+    elif node_type == LOWER:
+        known_amounts = (0, 1) if extra_propagation else (1, 2)
+    else:
+        known_amounts = ()
+    table = []
+    for code in range(8):
+        success = bin(code).count('1') in known_amounts
+        table.append((7 if success and apply_propagate else code, success))
+    return tuple(table)
+
+
+# The tables of get_rule_table for every node type and variant, keyed by (node type, extra propagation, apply).
+RULE_TABLES = {(node_type, extra_propagation, apply_propagate): get_rule_table(node_type, extra_propagation,
+                                                                               apply_propagate)
+               for node_type in Node.NodeType
+               for extra_propagation in (False, True)
+               for apply_propagate in (False, True)}
+
+
+def apply_rule_table(node, table):
+    """ Looks the node's state code up in a table of get_rule_table and sets the resulting edge states. Returns True on
+    success. """
+    code = node.get_state_code()
+    result, success = table[code]
+    if result != code:
+        for index, edge in enumerate(node.edges):
+            if (result ^ code) >> index & 1:
+                edge.set_state(result >> index & 1)
+    return success
 
 
 def upper_rule(node, apply_propagate=True, _was_extra_propagation=False):
     """ Applies the rule for upper nodes, returns True on success: two existing values set the third. """
-    if node.type == Node.NodeType.UPPER:
-        success_no_extra = node.get_neighbor_types() == ['*', '*', '?']
-        success_extra = node.get_neighbor_types() == ['*', '?', '?']
-        if ((not _was_extra_propagation) and success_no_extra) or (_was_extra_propagation and success_extra):
-            if apply_propagate:
-                node.propagate()
-            return True
-    return False
+    hooks = instrumentation.active
+    start = hooks.enter() if hooks is not None else None
+    success = False
+    if node.type == UPPER:
+        success = apply_rule_table(node, RULE_TABLES[node.type, bool(_was_extra_propagation), bool(apply_propagate)])
+    if hooks is not None:
+        hooks.record('upper_rule', node, success, apply_propagate, start)
+    return success
 
 
 def lower_rule(node, apply_propagate=True, _was_extra_propagation=False):
     """ Applies the rule for lower nodes, returns True on success: one existing value sets all. """
-    if node.type == Node.NodeType.LOWER:
-        success_no_extra = node.get_neighbor_types() == ['*', '?', '?'] or node.get_neighbor_types() == ['*', '*', '?']
-        success_extra = node.get_neighbor_types() == ['?', '?', '?'] or node.get_neighbor_types() == ['*', '?', '?']
-        if ((not _was_extra_propagation) and success_no_extra) or (_was_extra_propagation and success_extra):
-            if apply_propagate:
-                node.propagate()
-            return True
-    return False
+    hooks = instrumentation.active
+    start = hooks.enter() if hooks is not None else None
+    success = False
+    if node.type == LOWER:
+        success = apply_rule_table(node, RULE_TABLES[node.type, bool(_was_extra_propagation), bool(apply_propagate)])
+    if hooks is not None:
+        hooks.record('lower_rule', node, success, apply_propagate, start)
+    return success
 
 
 def relevant_rule(node, apply_propagate=True, _was_extra_propagation=False):
     """ Applies the relevant rule for a node, depending on its type. Returns True on success. """
-    if node.type == Node.NodeType.EDGE:
-        return False
-    rule = lower_rule if node.type == Node.NodeType.LOWER else upper_rule if node.type == Node.NodeType.UPPER else None
-    return rule(node, apply_propagate=apply_propagate, _was_extra_propagation=_was_extra_propagation)
+    hooks = instrumentation.active
+    start = hooks.enter() if hooks is not None else None
+    success = False
+    if node.type != EDGE:
+        rule = lower_rule if node.type == LOWER else upper_rule
+        success = rule(node, apply_propagate=apply_propagate, _was_extra_propagation=_was_extra_propagation)
+    if hooks is not None:
+        hooks.record('relevant_rule', node, success, apply_propagate, start)
+    return success
 
 
 def vertical_rule(node, apply_propagate=True):
@@ -41,30 +95,148 @@ def vertical_rule(node, apply_propagate=True):
     vertical edges. This is currently possible via counting only left- and right- rule applications for non-scheduling
     propagation as well.
     """
-    vertical_value = node.vertical().value
-    return relevant_rule(node.vertical().other(node), apply_propagate=apply_propagate) and vertical_value == '?'
+    hooks = instrumentation.active
+    start = hooks.enter() if hooks is not None else None
+    vertical_state = node.vertical().state
+    success = relevant_rule(node.vertical().other(node), apply_propagate=apply_propagate) and vertical_state == UNKNOWN
+    if hooks is not None:
+        hooks.record('vertical_rule', node, success, apply_propagate, start)
+    return success
 
 
 def left_rule(node, apply_propagate=True):
     """ The article's L-rule.  Applies the rule for a node to propagate its left edge. Returns True on success. """
-    if node.type == Node.NodeType.EDGE:
-        return False
-    if node.left().value == '?':
+    hooks = instrumentation.active
+    start = hooks.enter() if hooks is not None else None
+    success = False
+    if node.type != EDGE and node.left().state == UNKNOWN:
         was_propagation = vertical_rule(node, apply_propagate=apply_propagate) and (not apply_propagate)
-        return relevant_rule(node, apply_propagate=apply_propagate, _was_extra_propagation=was_propagation)
-    return False
+        success = relevant_rule(node, apply_propagate=apply_propagate, _was_extra_propagation=was_propagation)
+    if hooks is not None:
+        hooks.record('left_rule', node, success, apply_propagate, start)
+    return success
 
 
 def right_rule(node, apply_propagate=True):
     """ The article's R-rule. Applies the rule for a node to propagate its right edge. Returns True on success. """
-    if node.type == Node.NodeType.EDGE:
-        return False
-    if node.right().value == '?':
+    hooks = instrumentation.active
+    start = hooks.enter() if hooks is not None else None
+    success = False
+    if node.type != EDGE and node.right().state == UNKNOWN:
         was_propagation = vertical_rule(node, apply_propagate=apply_propagate) and (not apply_propagate)
-        return relevant_rule(node, apply_propagate=apply_propagate, _was_extra_propagation=was_propagation)
+        success = relevant_rule(node, apply_propagate=apply_propagate, _was_extra_propagation=was_propagation)
+    if hooks is not None:
+        hooks.record('right_rule', node, success, apply_propagate, start)
+    return success
+
+
+# The tables of the rules that left_rule and right_rule apply to a node and its partner, by the node type.
+APPLY_RULE_TABLES = {node_type: RULE_TABLES[node_type, False, True] for node_type in Node.NodeType}
+
+
+def apply_side_rules(nodes, side):
+    """
+    Applies the L-rule (for side LEFT_EDGE) or the R-rule (for side RIGHT_EDGE) to the nodes one by one, the same as
+    left_rule and right_rule with apply_propagate=True do.
+
+    Applied rules never count an extra propagation, so the rules of a node and of its partner are looked up in
+    APPLY_RULE_TABLES directly instead of through vertical_rule and relevant_rule. With the instrumentation on,
+    left_rule and right_rule are called instead, so that all of their evaluations are still recorded.
+    """
+    if instrumentation.active is not None:
+        rule = left_rule if side == LEFT_EDGE else right_rule
+        for node in nodes:
+            rule(node)
+        return
+    for node in nodes:
+        edges = node.edges
+        if node.type != EDGE and edges[side].state == UNKNOWN:
+            partner = edges[1].other(node)
+            apply_rule_table(partner, APPLY_RULE_TABLES[partner.type])
+            apply_rule_table(node, APPLY_RULE_TABLES[node.type])
+
+
+class PendingWrites:
+    """ The edges that the L-rule or the R-rule of a node would set, evaluated once by get_rule_writes.
+
+    The writes of all of the nodes of a parallel step are committed after all of them have been evaluated, which sets
+    exactly the same edges as applying left_rule and right_rule to the nodes one by one in the same order. The rules
+    only ever set edges to '*', so the rule of a node that succeeded at evaluation still succeeds after the writes
+    committed before its own, unless they have already set the edges of its sides, and then left_rule and right_rule
+    would skip it just as commit does. Only the rule of its partner along the vertical edge, if it did not succeed at
+    evaluation, has to be evaluated again, since the earlier writes may have made it succeed.
+    """
+    def __init__(self, node, sides, partner_succeeded, edges):
+        self.node = node
+        self.sides = sides
+        self.partner_succeeded = partner_succeeded
+        self.edges = edges  # The edges the rules set if the writes are committed before any other ones.
+
+    def commit(self):
+        """ Sets the edges, returns a list of nodes that the propagation has changed enough that they may be
+        interesting, the same as left_rule_list and right_rule_list return. """
+        hooks = instrumentation.active
+        start = hooks.enter() if hooks is not None else None
+        node = self.node
+        node_list = []
+        if has_unknown_side(node, self.sides):
+            partner = node.vertical().other(node)
+            if self.partner_succeeded:
+                partner_list = set_unknown_edges(partner)
+            else:
+                partner_list = relevant_rule_list(partner)
+            # The node itself propagates, so it is not interesting any more.
+            node_list = [other_node for other_node in partner_list if other_node != node] + set_unknown_edges(node)
+        if hooks is not None:
+            hooks.record('get_rule_writes', node, bool(node_list), True, start)
+        return node_list
+
+
+def has_unknown_side(node, sides):
+    """ Returns True if any of the node's edges with the given indexes is unknown, so that its rule may set it. """
+    for side in sides:
+        if node.edges[side].state == UNKNOWN:
+            return True
     return False
 
 
+def set_unknown_edges(node):
+    """ Sets all of the node's unknown edges to '*', returns the list of the nodes on the other ends of them. """
+    node_list = []
+    for edge in node.edges:
+        if edge.state == UNKNOWN:
+            edge.set_state(KNOWN)
+            node_list.append(edge.other(node))
+    return node_list
+
+
+def get_rule_writes(node, sides=(LEFT_EDGE, RIGHT_EDGE)):
+    """
+    Evaluates the L-rule and the R-rule of a node, or only the rules of the given sides, without applying them.
+
+    The result is the same as of left_rule and right_rule with apply_propagate=False, but the rule of the node and of
+    its partner along the vertical edge are evaluated only once for both sides.
+
+    :param sides: the indexes of the edges of the rules to evaluate, LEFT_EDGE for the L-rule and RIGHT_EDGE for the
+    R-rule.
+    :return: the PendingWrites of the rules, or None if none of them succeeds.
+    """
+    hooks = instrumentation.active
+    start = hooks.enter() if hooks is not None else None
+    writes = None
+    if node.type != EDGE and has_unknown_side(node, sides):
+        partner = node.vertical().other(node)
+        partner_succeeded = relevant_rule(partner, apply_propagate=False)
+        was_propagation = partner_succeeded and node.vertical().state == UNKNOWN
+        if relevant_rule(node, apply_propagate=False, _was_extra_propagation=was_propagation):
+            edges = [edge for edge in partner.edges if edge.state == UNKNOWN] if partner_succeeded else []
+            edges += [edge for edge in node.edges if edge.state == UNKNOWN and edge not in edges]
+            writes = PendingWrites(node, sides, partner_succeeded, edges)
+    if hooks is not None:
+        hooks.record('get_rule_writes', node, writes is not None, False, start)
+    return writes
+
+
 def any_rule(node, apply_propagate=True):
     """ Applies either L-rule or R-rule. Returns True on success. """
     return left_rule(node, apply_propagate) or right_rule(node, apply_propagate)
@@ -73,11 +245,11 @@ def any_rule(node, apply_propagate=True):
 def relevant_rule_list(node):
     """ Applies the relevant rule for a node, depending on its type. Returns a list of nodes that the propagation has
     changed enough that they may be interesting with the rules to apply to them. """
-    edge_states = [edge.value for edge in node.edges]
+    edge_states = [edge.state for edge in node.edges]
     relevant_rule(node, apply_propagate=True, _was_extra_propagation=False)
     node_list = []
     for edge, old_state in zip(node.edges, edge_states):
-        if edge.value != old_state:
+        if edge.state != old_state:
             node_list.append(edge.other(node))
     return node_list
 
@@ -93,7 +265,7 @@ def left_rule_list(node):
     """ The article's L-rule.  Applies the rule for a node to propagate its left edge. Returns a list of nodes that the
     propagation has changed enough that they may be interesting.
     """
-    if node.type == Node.NodeType.EDGE or node.left().value != '?':
+    if node.type == EDGE or node.left().state != UNKNOWN:
         return []
     else:
         v_list = vertical_rule_list(node)
@@ -113,7 +285,7 @@ def right_rule_list(node):
     """ The article's R-rule.  Applies the rule for a node to propagate its right edge. Returns a list of nodes that the
     propagation has changed enough that they may be interesting.
     """
-    if node.type == Node.NodeType.EDGE or node.right().value != '?':
+    if node.type == EDGE or node.right().state != UNKNOWN:
         return []
     else:
         v_list = vertical_rule_list(node)
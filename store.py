@@ -0,0 +1,76 @@
+""" Module for storing the results of experiments on disk, so that sweeps can be resumed and plotted again. """
+from propagate import Counter
+import os
+import sqlite3
+
+
+DEFAULT_STORE_PATH = os.path.join('results', 'results.sqlite3')
+
+
+class ResultStore:
+    """ An SQLite database with the average step amounts of the propagation methods for every point of the sweeps.
+
+    The results are keyed by (k, p, method, repeats, seed, chunk_size, version), where version is the version of the
+    code that computed them. Exhaustive sweeps over all configurations are stored with repeats set to 0, an empty seed
+    and chunk_size set to 0, since their results do not depend on them. All of the methods of a point are written in a
+    single transaction, so a sweep interrupted at any moment leaves only whole points in the store.
+
+    The exact results of successive cancellation computed by exact.py are kept in a table of their own, keyed by
+    (k, p, version), since they also have the decoding outcomes of the propagation.
+    """
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS results (
+                k INTEGER, p REAL, method TEXT, repeats INTEGER, seed TEXT, chunk_size INTEGER, version INTEGER,
+                steps REAL, parallel_steps REAL,
+                PRIMARY KEY (k, p, method, repeats, seed, chunk_size, version))''')
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS exact_results (
+                k INTEGER, p REAL, version INTEGER,
+                steps REAL, parallel_steps REAL, average_unknown REAL, decoded_fraction REAL,
+                PRIMARY KEY (k, p, version))''')
+
+    def load(self, k, p, repeats, seed, chunk_size, version):
+        """ Returns a dictionary with a Counter for every stored method of the point, empty if it was not computed. """
+        rows = self.connection.execute('''SELECT method, steps, parallel_steps FROM results
+            WHERE k = ? AND p = ? AND repeats = ? AND seed = ? AND chunk_size = ? AND version = ?''',
+                                       (k, p, repeats, str(seed), chunk_size, version))
+        counters = {}
+        for method, steps, parallel_steps in rows:
+            counters[method] = Counter()
+            counters[method].steps, counters[method].parallel_steps = steps, parallel_steps
+        return counters
+
+    def save(self, k, p, repeats, seed, chunk_size, version, counters):
+        """ Stores the Counters of a point, given as a dictionary from the methods' names, replacing the old ones. """
+        with self.connection:
+            self.connection.executemany('''INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', [
+                (k, p, method, repeats, str(seed), chunk_size, version, counter.steps, counter.parallel_steps)
+                for method, counter in counters.items()
+            ])
+
+    def load_exact(self, k, p, version):
+        """ Returns the stored result of exact.get_exact_successive_cancellation_result, or None if it was not
+        computed. """
+        row = self.connection.execute('''SELECT steps, parallel_steps, average_unknown, decoded_fraction
+            FROM exact_results WHERE k = ? AND p = ? AND version = ?''', (k, p, version)).fetchone()
+        if row is None:
+            return None
+        counter = Counter()
+        counter.steps, counter.parallel_steps = row[0], row[1]
+        return counter, row[2], row[3]
+
+    def save_exact(self, k, p, version, result):
+        """ Stores a result of exact.get_exact_successive_cancellation_result, replacing the old one. """
+        counter, average_unknown, decoded_fraction = result
+        with self.connection:
+            self.connection.execute('''INSERT OR REPLACE INTO exact_results VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                                    (k, p, version, counter.steps, counter.parallel_steps, average_unknown,
+                                     decoded_fraction))
+
+    def close(self):
+        """ Closes the database. """
+        self.connection.close()
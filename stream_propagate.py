@@ -0,0 +1,201 @@
+""" Module with out-of-core strategies of belief propagation, streaming the layers of a graph through a bounded window.
+
+Conventional and round-trip scheduling visit the inner layers strictly in order, and the rules of a layer only touch
+its own column of edges (the horizontal edges entering it and its vertical edges) and the horizontal edges of the next
+column. The methods here process the gate pairs of a layer in windows of at most window_size pairs: the states of a
+window are read from views of the graph's edge states, which for a MappedGraph only pages in the part of the file they
+cover, updated in memory with the kernels of array_propagate and written back. Different pairs of the same layer share
+no edges, so this takes exactly the same steps as array_propagate, but only a window is ever held in memory.
+
+The methods work with any graph in the layout of GraphStructure with a single row of edge states, and a MappedGraph
+gets its progress written after every layer, so that an interrupted run can be inspected.
+"""
+from array_graph import MappedGraph
+from array_propagate import BOTH_SIDES, LEFT, RIGHT, apply_lower_rule, apply_upper_rule, apply_rules, check_rules,\
+    lower_rule_holds, upper_rule_holds
+from propagate import Counter
+import numpy as np
+import weakref
+
+
+DEFAULT_WINDOW_SIZE = 2 ** 20
+
+
+def get_windows(k, window_size):
+    """ Returns the (start, size) ranges of the gate pairs of an inner layer, with the size the largest power of two of
+    at most window_size pairs. """
+    if window_size < 1:
+        raise ValueError('window_size must be at least 1, got {}'.format(window_size))
+    size = min(2 ** (k - 1), 2 ** (window_size.bit_length() - 1))
+    return [(start, size) for start in range(0, 2 ** (k - 1), size)]
+
+
+def get_window_views(values, k, layer, start, size):
+    """
+    Returns views of the edge states of a window of gate pairs of an inner layer, without copying them.
+
+    :param start: the index of the first pair of the window, a multiple of size.
+    :param size: the amount of pairs of the window, a power of two.
+    :return: the views of the upper nodes' left and right edges, the lower nodes' left and right edges and the vertical
+    edges, ordered as ArrayGraph.layer_edges orders them.
+    """
+    n = 2 ** k
+    half = 2 ** layer
+    layer_size = 3 * 2 ** (k - 1)
+    left_column = values[layer * layer_size:layer * layer_size + n]
+    right_column = values[(layer + 1) * layer_size:(layer + 1) * layer_size + n]
+    vertical = values[layer * layer_size + n + start:layer * layer_size + n + start + size]
+    if size >= half:
+        # The window holds whole blocks of 2 * half gates, the upper gates of the pairs being the first half of a block.
+        blocks = [column[2 * start:2 * (start + size)].reshape(-1, 2, half) for column in (left_column, right_column)]
+        return blocks[0][:, 0], blocks[1][:, 0], blocks[0][:, 1], blocks[1][:, 1], vertical.reshape(-1, half)
+    top_gate = start // half * 2 * half + start % half
+    upper_gates = slice(top_gate, top_gate + size)
+    lower_gates = slice(top_gate + half, top_gate + half + size)
+    return (left_column[upper_gates], right_column[upper_gates], left_column[lower_gates], right_column[lower_gates],
+            vertical)
+
+
+def get_window_states(views):
+    """ Returns in-memory copies of the edge states of the views of get_window_views. """
+    return [np.array(view) for view in views]
+
+
+def put_window_states(views, states):
+    """ Writes the states of a window back to its views, returns the amounts of horizontal and vertical edges set. """
+    horizontal_changes = sum(np.count_nonzero(state != view) for view, state in zip(views[:4], states[:4]))
+    vertical_changes = np.count_nonzero(states[4] != views[4])
+    for view, state in zip(views, states):
+        view[...] = state
+    return horizontal_changes, vertical_changes
+
+
+def stream_layer(graph, layer, sides, window_size=DEFAULT_WINDOW_SIZE):
+    """ Checks and applies the L-rules and R-rules of the given sides to the gate pairs of a layer window by window,
+    returns the amounts of horizontal and vertical edges set. """
+    horizontal_changes = vertical_changes = 0
+    for start, size in get_windows(graph.k, window_size):
+        views = get_window_views(graph.values, graph.k, layer, start, size)
+        states = get_window_states(views)
+        upper_mask, lower_mask = check_rules(states, sides)
+        if upper_mask.any() or lower_mask.any():
+            apply_rules(states, upper_mask, lower_mask, sides)
+            window_horizontal_changes, window_vertical_changes = put_window_states(views, states)
+            horizontal_changes += window_horizontal_changes
+            vertical_changes += window_vertical_changes
+    return horizontal_changes, vertical_changes
+
+
+def lazy_propagate(graph, window_size=DEFAULT_WINDOW_SIZE):
+    """ Applies the propagation rules to all nodes in the graph until none of them succeeds, a window at a time. """
+    was_success = True
+    while was_success:
+        was_success = False
+        for layer in range(graph.k):
+            for start, size in get_windows(graph.k, window_size):
+                views = get_window_views(graph.values, graph.k, layer, start, size)
+                states = get_window_states(views)
+                if upper_rule_holds(states).any() or lower_rule_holds(states).any():
+                    selected = np.ones_like(states[0])
+                    apply_upper_rule(states, selected)
+                    apply_lower_rule(states, selected)
+                    put_window_states(views, states)
+                    was_success = True
+        if isinstance(graph, MappedGraph):
+            graph.write_progress(method='lazy_propagate')
+
+
+def default_stopping_condition(original_graph, path=None, window_size=DEFAULT_WINDOW_SIZE):
+    """
+    The current default stopping condition. Propagation stops once the graph has been fully propagated.
+
+    Just as array_propagate.default_stopping_condition, only the horizontal edges are compared with the propagated
+    graph, here a window of edges at a time.
+
+    The propagated copy of a MappedGraph is stored in a file of its own. By default it is the original path with the
+    suffix '.copy', which is deleted together with its JSON file once the stopping condition is garbage collected or
+    the interpreter exits; a file at a given path is kept.
+
+    :param path: the path of the file of the propagated copy of a MappedGraph, by default next to the original one.
+    """
+    if isinstance(original_graph, MappedGraph):
+        propagated_graph = original_graph.get_copy(path)
+    else:
+        propagated_graph = original_graph.get_copy()
+    lazy_propagate(propagated_graph, window_size)
+    n = 2 ** original_graph.k
+
+    def should_stop(graph):
+        for column in range(graph.k + 1):
+            column_start = column * graph.layer_size
+            for start in range(column_start, column_start + n, window_size):
+                stop = min(start + window_size, column_start + n)
+                if not np.array_equal(graph.values[start:stop], propagated_graph.values[start:stop]):
+                    return False
+        return True
+    if isinstance(original_graph, MappedGraph) and path is None:
+        weakref.finalize(should_stop, propagated_graph.remove)
+    return should_stop
+
+
+def was_decoded(graph, window_size=DEFAULT_WINDOW_SIZE):
+    """ Checks whether all of the start edges of the graph are known, a window of at most window_size edges at a time.
+    """
+    n = 2 ** graph.k
+    return all(graph.values[start:min(start + window_size, n)].all() for start in range(0, n, window_size))
+
+
+def propagate_layers(graph, stopping_condition, layer_sides, window_size):
+    """
+    Streams iterations over the layers of the graph until stopping_condition is satisfied.
+
+    If stopping_condition is None, the propagation stops once an iteration has not set any edge, with the steps counted
+    up to the last iteration that set a horizontal edge, just as with propagate.FixedPointCondition.
+
+    :param layer_sides: the (layer, sides) pairs of a single iteration, in the order of the iteration.
+    :return: the Counter of the propagation, with every layer visit counted as a parallel step and 2 ** k steps per
+    side of a layer visit.
+    """
+    counter = Counter()
+    productive_steps = (0, 0)
+    iteration = 0
+    while stopping_condition is None or not stopping_condition(graph):
+        horizontal_changes = vertical_changes = 0
+        for layer, sides in layer_sides:
+            counter.parallel_steps += 1
+            counter.steps += len(sides) * 2 ** graph.k
+            layer_horizontal_changes, layer_vertical_changes = stream_layer(graph, layer, sides, window_size)
+            horizontal_changes += layer_horizontal_changes
+            vertical_changes += layer_vertical_changes
+            if isinstance(graph, MappedGraph):
+                graph.write_progress(iteration=iteration, layer=layer, steps=counter.steps,
+                                     parallel_steps=counter.parallel_steps)
+        iteration += 1
+        if stopping_condition is None:
+            if horizontal_changes:
+                productive_steps = (counter.steps, counter.parallel_steps)
+            elif not vertical_changes:
+                counter.steps, counter.parallel_steps = productive_steps
+                counter.decoded = was_decoded(graph, window_size)
+                break
+    return counter
+
+
+def scheduling_conventional_propagate(graph, stopping_condition, window_size=DEFAULT_WINDOW_SIZE):
+    """ Applies the propagation rules using basic scheduling propagation until stopping_condition is satisfied.
+
+    The rules of the nodes of each inner layer are checked and applied window by window.
+    Returns the amount of steps (left or right) that the propagation took.
+    """
+    return propagate_layers(graph, stopping_condition, [(layer, BOTH_SIDES) for layer in range(graph.k)],
+                            window_size)
+
+
+def scheduling_round_trip_propagate(graph, stopping_condition, window_size=DEFAULT_WINDOW_SIZE):
+    """ Applies the propagation rules using round-trip scheduling propagation until stopping_condition is satisfied.
+
+    The L-rules are streamed over the inner layers in reverse order, and then the R-rules in order.
+    Returns the amount of steps (left or right) that the propagation took.
+    """
+    layer_sides = [(layer, (LEFT,)) for layer in range(graph.k)[::-1]] + [(layer, (RIGHT,)) for layer in range(graph.k)]
+    return propagate_layers(graph, stopping_condition, layer_sides, window_size)
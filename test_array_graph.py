@@ -0,0 +1,160 @@
+import random
+import unittest
+from array_graph import ArrayGraph, ImplicitGraph
+import array_propagate
+from graph import Graph, Node
+from propagate import default_stopping_condition, lazy_propagate, was_propagation_finished,\
+    flooding_propagate, naive_propagate, successive_cancellation_propagate,\
+    scheduling_conventional_propagate, scheduling_round_trip_propagate
+
+
+def get_graph_pair(k, p):
+    """ Returns a Graph and an ArrayGraph with the same outer edge values. """
+    graph = Graph(k, p)
+    array_graph = ArrayGraph(k, p)
+    array_graph.update_end_nodes([node.left().value for node in graph.end_nodes])
+    return graph, array_graph
+
+
+class TestArrayGraph(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.graph, self.array_graph = get_graph_pair(3, 0.5)
+
+    def test_graphHasCorrectAmountOfEdges(self):
+        self.assertEqual(len(self.graph.edges), len(self.array_graph.edges))
+        self.assertEqual(len(self.array_graph.values), len(self.array_graph.edges))
+
+    def test_graphHasCorrectStartEdgesSet(self):
+        start_values = [node.left().value for node in self.array_graph.start_nodes]
+        self.assertEqual(['*', '*', '*', '?', '*', '?', '?', '?'], start_values)
+
+    def test_graphHasCorrectEndEdgesSet(self):
+        end_values = [node.left().value for node in self.array_graph.end_nodes]
+        self.assertEqual([node.left().value for node in self.graph.end_nodes], end_values)
+
+    def test_graphHasCorrectNodeLabelsTypesAndLayers(self):
+        for layer, array_layer in zip(self.graph.nodes_by_layer, self.array_graph.nodes_by_layer):
+            self.assertEqual([node.label for node in layer], [node.label for node in array_layer])
+            self.assertEqual([node.type for node in layer], [node.type for node in array_layer])
+            self.assertEqual([node.layer for node in layer], [node.layer for node in array_layer])
+
+    def test_graphHasCorrectStructure(self):
+        for node, array_node in zip(self.graph.inner_nodes, self.array_graph.inner_nodes):
+            self.assertEqual(3, array_node.degree())
+            self.assertEqual([edge.other(node).label for edge in node.edges],
+                             [edge.other(array_node).label for edge in array_node.edges])
+
+    def test_graphHasCorrectInnerEdgesSet(self):
+        for node in self.array_graph.inner_nodes:
+            self.assertEqual(Node.NodeType.UPPER if node.index % 2 == 0 else Node.NodeType.LOWER, node.type)
+            self.assertEqual('?', node.vertical().value)
+
+    def test_horizontalEdgesAreLeftAndRightEdges(self):
+        horizontal_edges = set()
+        for node in self.array_graph.inner_nodes:
+            horizontal_edges.update([node.left().index, node.right().index])
+        self.assertEqual(sorted(horizontal_edges), list(self.array_graph.horizontal_edges.nonzero()[0]))
+
+    def test_copyHasOnlyOuterEdgesSet(self):
+        lazy_propagate(self.array_graph)
+        graph_copy = self.array_graph.get_copy()
+        self.assertEqual([node.left().value for node in self.array_graph.end_nodes],
+                         [node.left().value for node in graph_copy.end_nodes])
+        for node in graph_copy.inner_nodes:
+            self.assertEqual('?', node.vertical().value)
+
+    def test_copySharesStructure(self):
+        graph_copy = self.array_graph.get_copy()
+        self.assertIs(self.array_graph.node_edges, graph_copy.node_edges)
+        self.assertIs(self.array_graph.edge_nodes, graph_copy.edge_nodes)
+        self.assertFalse(graph_copy.node_edges.flags.writeable)
+        self.assertIsNot(self.array_graph.values, graph_copy.values)
+
+    def test_resetToRestoresCopyState(self):
+        graph_copy = self.array_graph.get_copy()
+        lazy_propagate(graph_copy)
+        graph_copy.reset_to(self.array_graph)
+        self.assertTrue((self.array_graph.get_copy().values == graph_copy.values).all())
+
+    def test_propagationFinishesCorrectly(self):
+        graph, array_graph = get_graph_pair(6, 0.6)
+        lazy_propagate(graph)
+        lazy_propagate(array_graph)
+        self.assertTrue(was_propagation_finished(graph, array_graph))
+
+
+class TestArrayGraphPropagation(unittest.TestCase):
+    def assertSameSteps(self, method, k, p):
+        random.seed(k)
+        for _ in range(3):
+            graph, array_graph = get_graph_pair(k, p)
+            expected = method(graph, default_stopping_condition(graph))
+            actual = method(array_graph, default_stopping_condition(array_graph))
+            self.assertEqual((expected.steps, expected.parallel_steps), (actual.steps, actual.parallel_steps))
+
+    def test_naiveStepsAreSame(self):
+        self.assertSameSteps(naive_propagate, 4, 0.5)
+
+    def test_floodingStepsAreSame(self):
+        self.assertSameSteps(flooding_propagate, 4, 0.5)
+
+    def test_conventionalSchedulingStepsAreSame(self):
+        self.assertSameSteps(scheduling_conventional_propagate, 4, 0.5)
+
+    def test_roundTripSchedulingStepsAreSame(self):
+        self.assertSameSteps(scheduling_round_trip_propagate, 4, 0.5)
+
+    def test_successiveCancellationStepsAreSame(self):
+        self.assertSameSteps(successive_cancellation_propagate, 4, 0.5)
+
+
+class TestImplicitGraph(unittest.TestCase):
+    def test_structureIsSameAsArrayGraph(self):
+        for k in range(1, 6):
+            array_graph = ArrayGraph(k, 0.5, random.Random(k))
+            implicit_graph = ImplicitGraph(k, 0.5, random.Random(k))
+            self.assertTrue((array_graph.values == implicit_graph.values).all())
+            for node in range(2 ** k * (k + 2)):
+                self.assertEqual(array_graph.node_type(node), implicit_graph.node_type(node))
+                self.assertEqual(array_graph.node_label(node), implicit_graph.node_label(node))
+                self.assertEqual(list(array_graph.incident_edges(node)), implicit_graph.incident_edges(node))
+            for edge in range(array_graph.edge_count):
+                self.assertEqual(list(array_graph.edge_endpoints(edge)), implicit_graph.edge_endpoints(edge))
+            for layer in range(k):
+                for edges, implicit_edges in zip(array_graph.layer_edges(layer), implicit_graph.layer_edges(layer)):
+                    self.assertEqual(list(edges), list(implicit_edges))
+
+    def test_graphStoresOnlyEdgeStates(self):
+        graph = ImplicitGraph(12, 0.5)
+        self.assertEqual(13 * 2 ** 12 + 12 * 2 ** 11, len(graph.values))
+        graph_copy = graph.get_copy()
+        self.assertIsInstance(graph_copy, ImplicitGraph)
+        for implicit_graph in (graph, graph_copy):
+            for attribute in ('node_types', 'node_edges', 'edge_nodes', 'gates_by_layer'):
+                self.assertFalse(hasattr(implicit_graph, attribute))
+
+    def test_stepsAreSame(self):
+        random.seed(2)
+        for method in (naive_propagate, flooding_propagate, scheduling_conventional_propagate,
+                       scheduling_round_trip_propagate, successive_cancellation_propagate):
+            graph = Graph(4, 0.5)
+            implicit_graph = ImplicitGraph(4, 0.5)
+            implicit_graph.update_end_nodes([node.left().value for node in graph.end_nodes])
+            expected = method(graph, default_stopping_condition(graph))
+            actual = method(implicit_graph, default_stopping_condition(implicit_graph))
+            self.assertEqual((expected.steps, expected.parallel_steps), (actual.steps, actual.parallel_steps))
+            self.assertTrue(was_propagation_finished(graph, implicit_graph))
+
+    def test_vectorizedStepsAreSame(self):
+        for method in (array_propagate.naive_propagate, array_propagate.scheduling_conventional_propagate):
+            array_graph = ArrayGraph(7, 0.5, random.Random(7))
+            implicit_graph = ImplicitGraph(7, 0.5, random.Random(7))
+            expected = method(array_graph, array_propagate.default_stopping_condition(array_graph))
+            actual = method(implicit_graph, array_propagate.default_stopping_condition(implicit_graph))
+            self.assertEqual((expected.steps, expected.parallel_steps), (actual.steps, actual.parallel_steps))
+            self.assertTrue((array_graph.values == implicit_graph.values).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import random
+import unittest
+import array_propagate
+from array_graph import ArrayGraph
+from graph import Graph
+from propagate import lazy_propagate, was_propagation_finished, default_stopping_condition,\
+    naive_propagate, scheduling_conventional_propagate
+
+
+def get_graph_pair(k, p):
+    """ Returns a Graph and an ArrayGraph with the same outer edge values. """
+    graph = Graph(k, p)
+    array_graph = ArrayGraph(k, p)
+    array_graph.update_end_nodes([node.left().value for node in graph.end_nodes])
+    return graph, array_graph
+
+
+class TestLazyPropagate(unittest.TestCase):
+    def test_propagationSetsAllEdges(self):
+        graph = ArrayGraph(3, 0.1)
+        array_propagate.lazy_propagate(graph)
+        self.assertTrue(graph.values.all())
+
+    def test_propagationFinishesCorrectly(self):
+        random.seed(7)
+        for p in (0.3, 0.5, 0.7):
+            graph, array_graph = get_graph_pair(7, p)
+            lazy_propagate(graph)
+            array_propagate.lazy_propagate(array_graph)
+            for node, array_node in zip(graph.inner_nodes, array_graph.inner_nodes):
+                self.assertEqual([edge.value for edge in node.edges], [edge.value for edge in array_node.edges])
+
+
+class TestStoppingCondition(unittest.TestCase):
+    def test_stopsOnlyOncePropagated(self):
+        graph = ArrayGraph(5, 0.5)
+        should_stop = array_propagate.default_stopping_condition(graph)
+        self.assertFalse(should_stop(graph))
+        array_propagate.lazy_propagate(graph)
+        self.assertTrue(should_stop(graph))
+
+
+class TestVectorizedPropagate(unittest.TestCase):
+    def assertSameAsPropagate(self, method, array_method):
+        random.seed(1)
+        for k in range(2, 7):
+            for p in (0.2, 0.4, 0.5, 0.6, 0.8):
+                graph, array_graph = get_graph_pair(k, p)
+                expected = method(graph, default_stopping_condition(graph))
+                actual = array_method(array_graph, array_propagate.default_stopping_condition(array_graph))
+                self.assertEqual((expected.steps, expected.parallel_steps), (actual.steps, actual.parallel_steps))
+                self.assertTrue(was_propagation_finished(graph, array_graph))
+
+    def test_naiveStepsAreSame(self):
+        self.assertSameAsPropagate(naive_propagate, array_propagate.naive_propagate)
+
+    def test_conventionalSchedulingStepsAreSame(self):
+        self.assertSameAsPropagate(scheduling_conventional_propagate,
+                                   array_propagate.scheduling_conventional_propagate)
+
+    def test_naivePropagationSetsAllEdges(self):
+        graph = ArrayGraph(3, 0.1)
+        array_propagate.naive_propagate(graph, array_propagate.default_stopping_condition(graph))
+        self.assertTrue(graph.values[graph.horizontal_edges].all())
+
+
+if __name__ == '__main__':
+    unittest.main()
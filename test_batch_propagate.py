@@ -0,0 +1,77 @@
+import random
+import unittest
+import batch_propagate
+from array_graph import BatchGraph
+from graph import Graph
+from propagate import default_stopping_condition, was_propagation_finished,\
+    flooding_propagate, naive_propagate, successive_cancellation_propagate,\
+    scheduling_conventional_propagate, scheduling_round_trip_propagate
+
+
+def get_graphs(k, p, trials, seed):
+    """ Returns a BatchGraph and a list of Graphs with the same outer edge values for each trial. """
+    random.seed(seed)
+    batch = BatchGraph(k, p, trials)
+    random.seed(seed)
+    return batch, [Graph(k, p) for _ in range(trials)]
+
+
+def batch_graph_trials(batch):
+    """ Returns the graphs of all of the trials of a BatchGraph. """
+    return [batch.get_trial(trial) for trial in range(batch.trials)]
+
+
+class TestBatchGraph(unittest.TestCase):
+    def test_trialsHaveSameEndpointsAsGraphs(self):
+        batch, graphs = get_graphs(4, 0.5, 5, seed=3)
+        self.assertEqual(5, batch.trials)
+        for trial, graph in enumerate(batch_graph_trials(batch)):
+            self.assertEqual([node.left().value for node in graphs[trial].start_nodes],
+                             [node.left().value for node in graph.start_nodes])
+            self.assertEqual([node.left().value for node in graphs[trial].end_nodes],
+                             [node.left().value for node in graph.end_nodes])
+
+    def test_copyHasOnlyOuterEdgesSet(self):
+        batch, _ = get_graphs(3, 0.5, 4, seed=1)
+        batch.values[:] = 1
+        graph_copy = batch.get_copy()
+        self.assertTrue(graph_copy.values[:, batch.start_edges].all())
+        self.assertTrue(graph_copy.values[:, batch.end_edges].all())
+        self.assertEqual(4 * 2 * 8, graph_copy.values.sum())
+
+
+class TestBatchPropagate(unittest.TestCase):
+    def assertSameAsPropagate(self, method, batch_method):
+        for k in range(2, 6):
+            for p in (0.2, 0.5, 0.7):
+                batch, graphs = get_graphs(k, p, 6, seed=k)
+                counters = batch_method(batch, batch_propagate.default_stopping_condition(batch))
+                self.assertEqual(len(graphs), len(counters))
+                for trial, (graph, counter) in enumerate(zip(graphs, counters)):
+                    expected = method(graph, default_stopping_condition(graph))
+                    self.assertEqual((expected.steps, expected.parallel_steps), (counter.steps, counter.parallel_steps))
+                    self.assertTrue(was_propagation_finished(graph, batch.get_trial(trial)))
+
+    def test_naiveStepsAreSame(self):
+        self.assertSameAsPropagate(naive_propagate, batch_propagate.naive_propagate)
+
+    def test_floodingStepsAreSame(self):
+        self.assertSameAsPropagate(flooding_propagate, batch_propagate.flooding_propagate)
+
+    def test_conventionalSchedulingStepsAreSame(self):
+        self.assertSameAsPropagate(scheduling_conventional_propagate, batch_propagate.scheduling_conventional_propagate)
+
+    def test_roundTripSchedulingStepsAreSame(self):
+        self.assertSameAsPropagate(scheduling_round_trip_propagate, batch_propagate.scheduling_round_trip_propagate)
+
+    def test_successiveCancellationStepsAreSame(self):
+        self.assertSameAsPropagate(successive_cancellation_propagate,
+                                   batch_propagate.successive_cancellation_propagate)
+
+    def test_emptyBatch(self):
+        batch = BatchGraph(3, 0.5, 0)
+        self.assertEqual([], batch_propagate.naive_propagate(batch, batch_propagate.default_stopping_condition(batch)))
+
+
+if __name__ == '__main__':
+    unittest.main()
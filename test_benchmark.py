@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import unittest
+from benchmark import BENCHMARKS, compare_results, main, run_benchmarks
+
+
+def get_results(time, peak_memory):
+    return {'results': [{'name': 'naive_propagate', 'k': 3, 'p': 0.5, 'time': time, 'peak_memory': peak_memory}]}
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    def test_allBenchmarksAreMeasured(self):
+        results = run_benchmarks([2, 3], [0.5], repeats=1)
+        self.assertEqual([(name, k) for k in (2, 3) for name, _, _ in BENCHMARKS],
+                         [(result['name'], result['k']) for result in results['results']])
+        for result in results['results']:
+            self.assertGreater(result['time'], 0)
+            self.assertGreaterEqual(result['peak_memory'], 0)
+
+    def test_benchmarksCanBeSelected(self):
+        results = run_benchmarks([3], [0.3, 0.7], repeats=1, names=['get_copy'])
+        self.assertEqual([('get_copy', 0.3), ('get_copy', 0.7)],
+                         [(result['name'], result['p']) for result in results['results']])
+
+
+class TestCompareResults(unittest.TestCase):
+    def test_onlyGrowthOverThresholdIsRegression(self):
+        self.assertEqual([], compare_results(get_results(1.2, 100), get_results(1, 100), threshold=0.25))
+        self.assertEqual([('naive_propagate', 3, 0.5, 'time', 1, 1.3)],
+                         compare_results(get_results(1.3, 100), get_results(1, 100), threshold=0.25))
+        self.assertEqual([('naive_propagate', 3, 0.5, 'peak_memory', 100, 200)],
+                         compare_results(get_results(0.5, 200), get_results(1, 100), threshold=0.25))
+
+    def test_missingBaselineIsNotCompared(self):
+        self.assertEqual([], compare_results(get_results(2, 200), {'results': []}))
+
+    def test_mainReportsRegressions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+            self.assertEqual(0, main(['--k', '2', '--p', '0.5', '--repeats', '1', '--names', 'get_copy',
+                                      '--output', output]))
+            with open(output) as output_file:
+                results = json.load(output_file)
+            for result in results['results']:
+                result['time'] /= 100
+            with open(output, 'w') as output_file:
+                json.dump(results, output_file)
+            self.assertEqual(1, main(['--k', '2', '--p', '0.5', '--repeats', '1', '--names', 'get_copy',
+                                      '--baseline', output]))
+
+
+if __name__ == '__main__':
+    unittest.main()
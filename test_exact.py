@@ -0,0 +1,63 @@
+import unittest
+from exact import get_exact_successive_cancellation_result, get_sub_block_outcomes, get_sub_block_steps
+from graph import Graph
+from initialize import get_p_list, iterate_configs
+from propagate import successive_cancellation_propagate
+
+
+def get_enumerated_result(k, p):
+    """ Returns the results of get_exact_successive_cancellation_result computed by propagating every configuration. """
+    graph = Graph(k, p)
+    unknown_total, decoded_count, config_count = 0, 0, 0
+    for end_node_config in iterate_configs(k, p):
+        graph.update_end_nodes(end_node_config)
+        graph_copy = graph.get_copy()
+        counter = successive_cancellation_propagate(graph_copy, None)
+        unknown = len([node for node in graph_copy.start_nodes if node.edges[0].value == '?'])
+        unknown_total += unknown
+        decoded_count += unknown == 0
+        config_count += 1
+    return counter, unknown_total / config_count, decoded_count / config_count
+
+
+class TestSubBlockOutcomes(unittest.TestCase):
+    def test_stepsAreSameAsPropagate(self):
+        for k in range(1, 6):
+            graph = Graph(k, 0.5)
+            counter = successive_cancellation_propagate(graph, None)
+            self.assertEqual(counter.steps, get_sub_block_steps(k).steps)
+            self.assertEqual(counter.parallel_steps, get_sub_block_steps(k).parallel_steps + 2)
+
+    def test_outcomesAreMonotone(self):
+        outputs, starts = get_sub_block_outcomes(3, 0b00010111)
+        for inputs in range(2 ** 8):
+            self.assertEqual(inputs, inputs & outputs[inputs])
+            self.assertEqual(0b00010111, 0b00010111 & starts[inputs])
+        self.assertEqual(2 ** 8 - 1, outputs[2 ** 8 - 1])
+        self.assertEqual(2 ** 8 - 1, starts[2 ** 8 - 1])
+
+
+class TestExactResult(unittest.TestCase):
+    def test_resultIsSameAsEnumeration(self):
+        for k in (1, 2, 3):
+            for p in get_p_list(k):
+                expected_counter, expected_unknown, expected_decoded = get_enumerated_result(k, p)
+                counter, unknown, decoded = get_exact_successive_cancellation_result(k, p)
+                self.assertEqual((expected_counter.steps, expected_counter.parallel_steps),
+                                 (counter.steps, counter.parallel_steps))
+                self.assertAlmostEqual(expected_unknown, unknown)
+                self.assertAlmostEqual(expected_decoded, decoded)
+
+    def test_resultIsSameAsEnumerationForLargerGraph(self):
+        _, expected_unknown, expected_decoded = get_enumerated_result(4, 0.6)
+        _, unknown, decoded = get_exact_successive_cancellation_result(4, 0.6)
+        self.assertAlmostEqual(expected_unknown, unknown)
+        self.assertAlmostEqual(expected_decoded, decoded)
+
+    def test_tooLargeGraphsAreRejected(self):
+        with self.assertRaises(ValueError):
+            get_exact_successive_cancellation_result(6, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
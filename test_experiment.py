@@ -0,0 +1,167 @@
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import unittest
+from experiment import ExperimentResult, RunningStatistics, merge_results, perform_parallel_computation_random,\
+    perform_average_computation_all, perform_average_computation_random, perform_adaptive_computation_random,\
+    iterate_adaptive_computation_random, perform_stored_computation, perform_stored_exact_computation
+from propagate import Counter
+
+
+def get_result(steps, parallel_steps):
+    """ Returns an ExperimentResult with the same step amounts for all of the methods. """
+    result = ExperimentResult()
+    for name in vars(result):
+        counter = Counter()
+        counter.steps, counter.parallel_steps = steps, parallel_steps
+        setattr(result, name, counter)
+    return result
+
+
+def get_values(result):
+    return [(getattr(result, name).steps, getattr(result, name).parallel_steps) for name in vars(result)]
+
+
+class TestMergeResults(unittest.TestCase):
+    def test_resultsAreWeighted(self):
+        merged = merge_results([get_result(10, 2), get_result(4, 5)], [1, 2])
+        self.assertEqual([(6, 4)] * 5, get_values(merged))
+
+
+class TestParallelComputation(unittest.TestCase):
+    def test_resultsDoNotDependOnWorkers(self):
+        probs = [0.3, 0.6]
+        serial = perform_parallel_computation_random(4, probs, 25, workers=1, chunk_size=10, seed=1)
+        parallel = perform_parallel_computation_random(4, probs, 25, workers=3, chunk_size=10, seed=1)
+        self.assertEqual([get_values(result) for result in serial], [get_values(result) for result in parallel])
+
+    def test_batchedIsSameAsSequential(self):
+        batched = perform_parallel_computation_random(4, [0.5], 12, chunk_size=5, seed=2)
+        sequential = perform_parallel_computation_random(4, [0.5], 12, chunk_size=5, seed=2, batched=False)
+        self.assertEqual(get_values(batched[0]), get_values(sequential[0]))
+
+
+class TestExhaustiveComputation(unittest.TestCase):
+    def test_shardsMergeToFullResult(self):
+        full = perform_average_computation_all(3, 0.5)
+        shards = [perform_average_computation_all(3, 0.5, start, start + 30) for start in (0, 30, 60)]
+        merged = merge_results(shards, [30, 30, 10])
+        for (steps, parallel_steps), (merged_steps, merged_parallel_steps) in zip(get_values(full), get_values(merged)):
+            self.assertAlmostEqual(steps, merged_steps)
+            self.assertAlmostEqual(parallel_steps, merged_parallel_steps)
+
+
+class TestStoredComputation(unittest.TestCase):
+    def test_onlyMissingResultsAreComputed(self):
+        computed_probs = []
+
+        def compute(probs):
+            for prob in probs:
+                computed_probs.append(prob)
+                yield get_result(prob * 10, prob)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.sqlite3')
+            first = perform_stored_computation(3, [0.2, 0.4], 10, 0, 5, compute, path)
+            second = perform_stored_computation(3, [0.2, 0.4, 0.6], 10, 0, 5, compute, path)
+            other_seed = perform_stored_computation(3, [0.2], 10, 1, 5, compute, path)
+        self.assertEqual([0.2, 0.4, 0.6, 0.2], computed_probs)
+        self.assertEqual([get_values(result) for result in first], [get_values(result) for result in second[:2]])
+        self.assertEqual([(6, 0.6)] * 5, get_values(second[2]))
+        self.assertEqual(get_values(first[0]), get_values(other_seed[0]))
+
+    def test_resultsAreStoredAsSoonAsComputed(self):
+        def compute(probs):
+            yield get_result(1, 1)
+            raise KeyboardInterrupt
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.sqlite3')
+            with self.assertRaises(KeyboardInterrupt):
+                perform_stored_computation(3, [0.2, 0.4], 10, 0, 5, compute, path)
+            resumed = perform_stored_computation(3, [0.2, 0.4], 10, 0, 5, lambda probs: [get_result(2, 2)], path)
+        self.assertEqual([[(1, 1)] * 5, [(2, 2)] * 5], [get_values(result) for result in resumed])
+
+    def test_exactResultsAreStored(self):
+        expected = perform_stored_exact_computation(3, [0.2, 0.4], None)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.sqlite3')
+            computed = perform_stored_exact_computation(3, [0.2, 0.4], path)
+            loaded = perform_stored_exact_computation(3, [0.4, 0.2], path)
+        for results in (computed, loaded[::-1]):
+            self.assertEqual([(counter.steps, counter.parallel_steps, unknown, decoded)
+                              for counter, unknown, decoded in expected],
+                             [(counter.steps, counter.parallel_steps, unknown, decoded)
+                              for counter, unknown, decoded in results])
+
+
+class TestRunningStatistics(unittest.TestCase):
+    def test_statisticsAreSameAsStored(self):
+        values = [random.Random(3).random() * 100 for _ in range(50)]
+        running_statistics = RunningStatistics()
+        for value in values:
+            running_statistics.add(value)
+        self.assertAlmostEqual(statistics.mean(values), running_statistics.mean)
+        self.assertAlmostEqual(statistics.variance(values), running_statistics.get_variance())
+        low, high = running_statistics.get_interval(2)
+        self.assertAlmostEqual(4 * statistics.stdev(values) / 50 ** 0.5, high - low)
+
+
+class TestAdaptiveComputation(unittest.TestCase):
+    def test_resultsAreSameAsWithFixedRepeats(self):
+        result = perform_adaptive_computation_random(4, 0.5, 0, min_repeats=8, max_repeats=20, batch_size=8,
+                                                     batched=False, rng=random.Random(5))
+        expected = perform_average_computation_random(4, 0.5, 20, random.Random(5))
+        for (steps, parallel_steps), (expected_steps, expected_parallel_steps) in zip(get_values(result),
+                                                                                      get_values(expected)):
+            self.assertAlmostEqual(expected_steps, steps)
+            self.assertAlmostEqual(expected_parallel_steps, parallel_steps)
+
+    def test_samplingStopsOnceIntervalsAreNarrow(self):
+        result = perform_adaptive_computation_random(4, 0.5, 0.5, min_repeats=8, max_repeats=512, batch_size=8,
+                                                     rng=random.Random(6))
+        intervals = result.get_intervals()
+        # Successive cancellation takes the same steps on all graphs.
+        self.assertEqual(((128, 128), (62, 62), 8), intervals['successive_cancellation_result'])
+        for name, (steps_interval, parallel_steps_interval, repeats) in intervals.items():
+            counter = getattr(result, name)
+            self.assertLessEqual(repeats, 512)
+            for (low, high), mean in ((steps_interval, counter.steps), (parallel_steps_interval,
+                                                                        counter.parallel_steps)):
+                self.assertLessEqual(low, mean)
+                self.assertLessEqual(mean, high)
+                self.assertTrue(repeats == 512 or high - low <= 0.5 * mean)
+
+    def test_resultsDoNotDependOnWorkers(self):
+        probs = [0.3, 0.6]
+        serial = list(iterate_adaptive_computation_random(4, probs, 0.2, 8, 64, seed=1))
+        parallel = list(iterate_adaptive_computation_random(4, probs, 0.2, 8, 64, workers=2, seed=1))
+        self.assertEqual([result.get_intervals() for result in serial],
+                         [result.get_intervals() for result in parallel])
+
+    def test_batchSizeIsPassedOn(self):
+        # The intervals are narrow enough after the first batch, so every method is sampled batch_size times.
+        for batch_size in (3, 16):
+            result, = iterate_adaptive_computation_random(4, [0.5], 10, 1, 64, batch_size=batch_size, seed=2)
+            self.assertEqual({batch_size}, {repeats for _, _, repeats in result.get_intervals().values()})
+
+    def test_intervalsArePrinted(self):
+        result = perform_adaptive_computation_random(3, 0.5, 0.5, min_repeats=8, max_repeats=8, batch_size=8,
+                                                     rng=random.Random(7))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result.print()
+        lines = output.getvalue().splitlines()
+        self.assertEqual(6, len(lines))
+        self.assertIn('successive_cancellation_result   8 graphs, steps in [48.00, 48.00]', lines[5])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            get_result(1, 1).print()
+        self.assertEqual(1, len(output.getvalue().splitlines()))
+
+
+if __name__ == '__main__':
+    unittest.main()
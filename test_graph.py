@@ -1,5 +1,5 @@
 import unittest
-from graph import Graph, Node
+from graph import Graph, Node, KNOWN, UNKNOWN, get_structure
 
 
 def propagate(last_layer, current_layer):
@@ -124,6 +124,46 @@ class TestGraph(unittest.TestCase):
             self.assertEqual(len(expected_layer), len(actual_layer))
             self.assertEqual(set(expected_layer), set(actual_layer))
 
+    def test_graphHasCorrectNodeLayers(self):
+        for layer, nodes in enumerate(self.graph.nodes_by_layer):
+            for node in nodes:
+                self.assertEqual(layer - 1, node.layer)
+        for node in self.graph.inner_nodes:
+            self.assertTrue(node.label.endswith('l{}'.format(node.layer)))
+
+    def test_graphHasCorrectNodeLabels(self):
+        self.assertEqual(['start {}'.format(i) for i in range(8)], [node.label for node in self.graph.start_nodes])
+        self.assertEqual(['end {}'.format(i) for i in range(8)], [node.label for node in self.graph.end_nodes])
+        self.assertEqual(['up 0 l0', 'lo 1 l0', 'up 2 l0', 'lo 3 l0'],
+                         [node.label for node in self.graph.inner_nodes[:4]])
+        self.assertEqual(['up 0 l2', 'lo 4 l2'], [node.label for node in self.graph.inner_nodes[16:18]])
+        node = Node('gate')
+        self.assertEqual('gate', node.label)
+        node.label = 'other gate'
+        self.assertEqual('other gate', node.label)
+
+    def test_edgeValuesAreStoredAsStates(self):
+        edge = self.graph.edges[0]
+        edge.value = '*'
+        self.assertEqual(KNOWN, edge.state)
+        edge.set_state(UNKNOWN)
+        self.assertEqual('?', edge.value)
+        for edge in self.graph.edges:
+            first_node, second_node = edge.nodes
+            self.assertIs(second_node, edge.other(first_node))
+            self.assertIs(first_node, edge.other(second_node))
+        self.assertFalse(hasattr(edge, '__dict__'))
+        self.assertFalse(hasattr(self.graph.inner_nodes[0], '__dict__'))
+
+    def test_stateCodeMatchesEdgeValues(self):
+        self.graph.update_end_nodes(['*', '?', '*', '*', '?', '?', '*', '?'])
+        graph = self.graph.get_copy()
+        for node in graph.inner_nodes[::3]:
+            node.propagate()
+        for node in graph.inner_nodes:
+            expected = sum(2 ** index for index, edge in enumerate(node.edges) if edge.value == '*')
+            self.assertEqual(expected, node.get_state_code())
+
     def test_graphHasCorrectEdgeOrders_verticalEdges(self):
         for layer in self.graph.inner_layers():
             for node in layer:
@@ -188,6 +228,20 @@ class TestGraph(unittest.TestCase):
                 for edge, edge_copy in zip(node.edges, node_copy.edges):
                     self.assertEqual(edge.value, edge_copy.value)
 
+    def test_graphResetToRestoresCopyState(self):
+        graph_copy = self.graph.get_copy()
+        for edge in graph_copy.edges:
+            edge.value = '*'
+        graph_copy.reset_to(self.graph)
+        for edge, edge_copy in zip(self.graph.edges, graph_copy.edges):
+            self.assertEqual(edge.value, edge_copy.value)
+
+    def test_graphsShareStructure(self):
+        graph_copy = self.graph.get_copy()
+        self.assertIs(get_structure(3), get_structure(3))
+        for node, node_copy in zip(self.graph.inner_nodes, graph_copy.inner_nodes):
+            self.assertEqual(node.label, node_copy.label)
+
 
 if __name__ == '__main__':
     unittest.main()
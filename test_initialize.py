@@ -1,5 +1,8 @@
+import random
 import unittest
-from initialize import get_endpoints, get_gates, get_all_possible_configs, get_p_list
+from initialize import get_endpoints, get_gates, get_all_possible_configs, get_p_list, get_config_count,\
+    iterate_configs, unrank_combination
+from itertools import combinations
 
 
 class TestGetGates(unittest.TestCase):
@@ -29,6 +32,9 @@ class TestGetEndpoints(unittest.TestCase):
     def test_amountIsCorrect_power3_prob5(self):
         self.assertEqual(['*', '*', '*', '*', '?', '?', '?', '?'], sorted(get_endpoints(3, 0.5)))
 
+    def test_sameSeedGivesSameEndpoints(self):
+        self.assertEqual(get_endpoints(5, 0.5, random.Random(3)), get_endpoints(5, 0.5, random.Random(3)))
+
 
 class TestGetAllPossibleConfigs(unittest.TestCase):
     def test_configListIsCorrect_power2_prob1(self):
@@ -46,6 +52,29 @@ class TestGetAllPossibleConfigs(unittest.TestCase):
                           ['?', '?', '*', '*']], sorted(get_all_possible_configs(2, 0.5)))
 
 
+class TestIterateConfigs(unittest.TestCase):
+    def test_unrankingIsSameAsCombinations(self):
+        for n in range(7):
+            for m in range(n + 1):
+                for index, combination in enumerate(combinations(range(n), m)):
+                    self.assertEqual(list(combination), unrank_combination(n, m, index))
+
+    def test_configCountIsCorrect(self):
+        for p in get_p_list(3):
+            self.assertEqual(len(get_all_possible_configs(3, p)), get_config_count(3, p))
+        self.assertEqual(12870, get_config_count(4, 0.5))
+
+    def test_rangesAreSameAsFullList(self):
+        configs = get_all_possible_configs(3, 0.5)
+        for start in range(0, len(configs) + 1, 7):
+            self.assertEqual(configs[start:start + 10], list(iterate_configs(3, 0.5, start, start + 10)))
+
+    def test_configsAreGeneratedLazily(self):
+        configs = iterate_configs(5, 0.5)
+        self.assertEqual(['*'] * 16 + ['?'] * 16, next(configs))
+        self.assertEqual(['*'] * 15 + ['?', '*'] + ['?'] * 15, next(configs))
+
+
 class TestGetPList(unittest.TestCase):
     def test_getPList_returnsAllPValues(self):
         for k in range(2, 15):
@@ -0,0 +1,88 @@
+import unittest
+import instrumentation
+from array_graph import ArrayGraph
+from graph import Graph
+from instrumentation import RuleCounters, instrumented, run_instrumented
+from propagate import default_stopping_condition, naive_propagate, scheduling_conventional_propagate,\
+    scheduling_round_trip_propagate
+from rules import left_rule, upper_rule
+
+
+class TestRuleCounters(unittest.TestCase):
+    def test_rulesAreCountedOnlyWhenInstrumented(self):
+        graph = Graph(3, 0.5)
+        counters = RuleCounters()
+        left_rule(graph.inner_nodes[0])
+        with instrumented(counters):
+            left_rule(graph.inner_nodes[0], apply_propagate=False)
+        left_rule(graph.inner_nodes[0])
+        self.assertIsNone(instrumentation.active)
+        self.assertEqual(1, counters.get_calls('left_rule'))
+        self.assertEqual(0, counters.get_calls('left_rule', apply_propagate=True))
+
+    def test_successesAreCounted(self):
+        graph = Graph(2, 0.5)
+        node = graph.inner_nodes[0]
+        for edge, value in zip(node.edges, ['?', '*', '*']):
+            edge.value = value
+        with instrumented(RuleCounters()) as counters:
+            self.assertTrue(upper_rule(node, apply_propagate=False))
+            self.assertFalse(upper_rule(graph.inner_nodes[1]))
+        self.assertEqual(2, counters.get_calls('upper_rule'))
+        self.assertEqual(1, counters.get_successes('upper_rule'))
+        self.assertEqual(1, counters.get_successes('upper_rule', apply_propagate=False))
+        self.assertEqual(0, counters.get_successes('upper_rule', apply_propagate=True))
+
+    def test_countsAreFilteredByEveryMode(self):
+        graph = Graph(2, 0.5)
+        counters = RuleCounters()
+        node = graph.inner_nodes[0]
+        for apply_propagate, amount in ((None, 1), (False, 2), (True, 3)):
+            for _ in range(amount):
+                counters.record('upper_rule', node, True, apply_propagate)
+        self.assertEqual(6, counters.get_calls('upper_rule'))
+        for apply_propagate, amount in ((None, 1), (False, 2), (True, 3)):
+            self.assertEqual(amount, counters.get_calls('upper_rule', apply_propagate=apply_propagate))
+            self.assertEqual(amount, counters.get_successes('upper_rule', node.layer, apply_propagate))
+        self.assertEqual(0, counters.get_calls('upper_rule', layer=node.layer + 1))
+
+    def test_countsAreSplitByLayer(self):
+        graph = Graph(4, 0.5)
+        _, counters = run_instrumented(naive_propagate, graph, default_stopping_condition(graph))
+        calls = counters.get_calls('get_rule_writes')
+        self.assertGreater(calls, 0)
+        self.assertEqual(calls, sum(counters.get_calls('get_rule_writes', layer=layer) for layer in range(4)))
+        # The naive propagation evaluates every node's rules once per iteration.
+        self.assertGreaterEqual(counters.get_calls('get_rule_writes', apply_propagate=False), 16 * 4)
+        self.assertEqual(counters.get_successes('get_rule_writes', apply_propagate=False),
+                         counters.get_calls('get_rule_writes', apply_propagate=True))
+        # Every evaluation of the upper and the lower rules reads the node's state code once.
+        self.assertEqual(counters.get_calls('get_state_code'),
+                         counters.get_calls('upper_rule') + counters.get_calls('lower_rule'))
+
+    def test_resultIsSameAsUninstrumented(self):
+        graph = Graph(5, 0.5)
+        expected = scheduling_round_trip_propagate(graph.get_copy(), default_stopping_condition(graph))
+        result, counters = run_instrumented(scheduling_round_trip_propagate, graph.get_copy(),
+                                            default_stopping_condition(graph), timing=True)
+        self.assertEqual((expected.steps, expected.parallel_steps), (result.steps, result.parallel_steps))
+        self.assertGreater(counters.get_time('get_rule_writes'), 0)
+        self.assertGreaterEqual(counters.get_time('get_rule_writes', apply_propagate=False),
+                                counters.get_time('relevant_rule', apply_propagate=False))
+
+    def test_arrayGraphsAreInstrumented(self):
+        graph = Graph(4, 0.5)
+        array_graph = ArrayGraph(4, 0.5)
+        array_graph.update_end_nodes([node.left().value for node in graph.end_nodes])
+        expected, expected_counters = run_instrumented(scheduling_conventional_propagate, graph,
+                                                       default_stopping_condition(graph))
+        result, counters = run_instrumented(scheduling_conventional_propagate, array_graph,
+                                            default_stopping_condition(array_graph))
+        self.assertEqual((expected.steps, expected.parallel_steps), (result.steps, result.parallel_steps))
+        for layer in range(4):
+            self.assertEqual(expected_counters.get_calls('get_rule_writes', layer=layer),
+                             counters.get_calls('get_rule_writes', layer=layer))
+
+
+if __name__ == '__main__':
+    unittest.main()
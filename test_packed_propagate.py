@@ -0,0 +1,89 @@
+import random
+import unittest
+import batch_propagate
+import packed_propagate
+from array_graph import BatchGraph, PackedGraph, pack_trials, unpack_trials
+import numpy as np
+
+
+def get_graphs(k, p, trials, seed):
+    """ Returns a PackedGraph and a BatchGraph with the same outer edge values for each trial. """
+    random.seed(seed)
+    packed = PackedGraph(k, p, trials)
+    random.seed(seed)
+    return packed, BatchGraph(k, p, trials)
+
+
+class TestPackedGraph(unittest.TestCase):
+    def test_packingIsReversible(self):
+        values = np.random.RandomState(0).rand(130, 20) < 0.5
+        words = pack_trials(values)
+        self.assertEqual((3, 20), words.shape)
+        self.assertTrue((values == unpack_trials(words, 130)).all())
+
+    def test_trialsAreSameAsInBatch(self):
+        packed, batch = get_graphs(4, 0.5, 70, seed=2)
+        self.assertEqual(2, len(packed.values))
+        self.assertTrue((batch.values == packed.get_batch().values).all())
+        for trial in (0, 63, 64, 69):
+            self.assertTrue((batch.values[trial] == packed.get_trial(trial).values).all())
+
+    def test_lanesMarkOnlyTrials(self):
+        packed, _ = get_graphs(3, 0.5, 66, seed=1)
+        self.assertEqual([2 ** 64 - 1, 3], [int(lanes) for lanes in packed.lanes])
+
+    def test_copyHasOnlyOuterEdgesSet(self):
+        packed, batch = get_graphs(3, 0.5, 4, seed=1)
+        packed.values[:] = ~np.uint64(0)
+        batch.values[:] = True
+        self.assertTrue((batch.get_copy().values == packed.get_copy().get_batch().values).all())
+
+
+class TestLazyPropagate(unittest.TestCase):
+    def test_propagationIsSameAsBatch(self):
+        for p in (0.3, 0.5, 0.7):
+            packed, batch = get_graphs(6, p, 100, seed=5)
+            batch_propagate.lazy_propagate(batch)
+            packed_propagate.lazy_propagate(packed)
+            self.assertTrue((batch.values == packed.get_batch().values).all())
+
+
+class TestPackedPropagate(unittest.TestCase):
+    def assertSameAsBatch(self, batch_method, packed_method):
+        for k in range(2, 6):
+            for p in (0.2, 0.5, 0.7):
+                packed, batch = get_graphs(k, p, 70, seed=k)
+                expected = batch_method(batch, batch_propagate.default_stopping_condition(batch))
+                actual = packed_method(packed, packed_propagate.default_stopping_condition(packed))
+                self.assertEqual([(counter.steps, counter.parallel_steps) for counter in expected],
+                                 [(counter.steps, counter.parallel_steps) for counter in actual])
+                horizontal_edges = batch.horizontal_edges
+                self.assertTrue((batch.values[:, horizontal_edges] ==
+                                 packed.get_batch().values[:, horizontal_edges]).all())
+
+    def test_naiveStepsAreSame(self):
+        self.assertSameAsBatch(batch_propagate.naive_propagate, packed_propagate.naive_propagate)
+
+    def test_floodingStepsAreSame(self):
+        self.assertSameAsBatch(batch_propagate.flooding_propagate, packed_propagate.flooding_propagate)
+
+    def test_conventionalSchedulingStepsAreSame(self):
+        self.assertSameAsBatch(batch_propagate.scheduling_conventional_propagate,
+                               packed_propagate.scheduling_conventional_propagate)
+
+    def test_roundTripSchedulingStepsAreSame(self):
+        self.assertSameAsBatch(batch_propagate.scheduling_round_trip_propagate,
+                               packed_propagate.scheduling_round_trip_propagate)
+
+    def test_successiveCancellationStepsAreSame(self):
+        self.assertSameAsBatch(batch_propagate.successive_cancellation_propagate,
+                               packed_propagate.successive_cancellation_propagate)
+
+    def test_emptyBatch(self):
+        packed = PackedGraph(3, 0.5, 0)
+        self.assertEqual([], packed_propagate.naive_propagate(packed,
+                                                              packed_propagate.default_stopping_condition(packed)))
+
+
+if __name__ == '__main__':
+    unittest.main()
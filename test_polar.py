@@ -1,5 +1,10 @@
+import os
+import tempfile
 import unittest
-from polar import polarize, sort_gates, get_n_best_gates
+from unittest import mock
+import numpy as np
+from polar import CACHE_DIR_VARIABLE, CACHE_VERSION, polarize, sort_gates, get_n_best_gates, get_cached_best_gates,\
+    get_cache_path, get_best_gates, select_best_gates, get_best_gate_mask, get_probabilities, get_threshold
 
 
 class TestPolarize(unittest.TestCase):
@@ -46,6 +51,83 @@ class TestNBestGates(unittest.TestCase):
     def test_severalGates_prob5(self):
         self.assertEqual([7, 6, 5, 3, 4, 2, 1], get_n_best_gates(3, 0.5, 7))
 
+    def test_tiedGatesAreTakenByIndex(self):
+        # The probabilities of all of the gates except the last one underflow to zero.
+        self.assertEqual([7, 0, 1, 2], select_best_gates(3, 1e-200, 4))
+        self.assertEqual([0, 1, 2, 7], select_best_gates(3, 1e-200, 4, ordered=False))
+
+    def test_selectionIsSameAsSort(self):
+        for k in range(1, 9):
+            for p in (1e-200, 0.1, 0.3, 0.5, 0.77, 1 - 1e-12):
+                sorted_gates = [gate[0] for gate in sort_gates(k, p)]
+                for n in range(0, 2 ** k + 1, max(1, 2 ** k // 16)):
+                    self.assertEqual(sorted_gates[:n], select_best_gates(k, p, n))
+                    self.assertEqual(sorted(sorted_gates[:n]), select_best_gates(k, p, n, ordered=False))
+
+    def test_bestGatesAreOrderedByIndex(self):
+        self.assertEqual([7, 11, 13, 14, 15], get_best_gates(4, 0.3, 5))
+
+    def test_sampledThresholdIsSameAsSort(self):
+        # With 2 ** 21 gates the threshold is found from a sample of the probabilities.
+        for p in (1e-200, 0.1, 0.5, 0.77, 1 - 1e-12):
+            probs = get_probabilities(21, p)
+            sorted_probs = np.sort(probs)
+            for n in (1, 1000, 2 ** 19, 2 ** 20, 2 ** 21 - 1):
+                self.assertEqual(sorted_probs[2 ** 21 - n], get_threshold(probs, n))
+
+    def test_maskHasSameGatesAsSelection(self):
+        for k in (1, 4, 7):
+            for p in (1e-200, 0.3, 0.5):
+                for n in (0, 1, 2 ** k // 3, 2 ** k):
+                    self.assertEqual(select_best_gates(k, p, n, ordered=False),
+                                     [gate for gate, is_best in enumerate(get_best_gate_mask(k, p, n)) if is_best])
+
+
+class TestBestGatesCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.environment = mock.patch.dict(os.environ, {CACHE_DIR_VARIABLE: self.cache_dir.name})
+        self.environment.start()
+        get_cached_best_gates.cache_clear()
+
+    def tearDown(self):
+        get_cached_best_gates.cache_clear()
+        self.environment.stop()
+        self.cache_dir.cleanup()
+
+    def test_gatesAreStoredOnDisk(self):
+        self.assertEqual([15, 14, 13, 11, 7], get_n_best_gates(4, 0.3, 5))
+        self.assertTrue(os.path.exists(get_cache_path(4, 0.3, 5)))
+        self.assertEqual(['best_gates_v{}_k4_p{}_n5.json'.format(CACHE_VERSION, (0.3).hex())],
+                         os.listdir(self.cache_dir.name))
+
+    def test_gatesAreLoadedFromDisk(self):
+        get_n_best_gates(3, 0.5, 3)
+        with open(get_cache_path(3, 0.5, 3), 'w') as cache_file:
+            cache_file.write('[0, 1, 2]')
+        self.assertEqual([7, 6, 5], get_n_best_gates(3, 0.5, 3))
+        get_cached_best_gates.cache_clear()
+        self.assertEqual([0, 1, 2], get_n_best_gates(3, 0.5, 3))
+
+    def test_corruptedCacheIsRecomputed(self):
+        os.makedirs(os.path.dirname(get_cache_path(3, 0.5, 7)), exist_ok=True)
+        with open(get_cache_path(3, 0.5, 7), 'w') as cache_file:
+            cache_file.write('[7, 6,')
+        self.assertEqual([7, 6, 5, 3, 4, 2, 1], get_n_best_gates(3, 0.5, 7))
+        get_cached_best_gates.cache_clear()
+        self.assertEqual([7, 6, 5, 3, 4, 2, 1], get_n_best_gates(3, 0.5, 7))
+
+    def test_diskCacheCanBeTurnedOff(self):
+        with mock.patch.dict(os.environ, {CACHE_DIR_VARIABLE: ''}):
+            self.assertIsNone(get_cache_path(4, 0.3, 5))
+            self.assertEqual([15, 14, 13, 11, 7], get_n_best_gates(4, 0.3, 5))
+        self.assertEqual([], os.listdir(self.cache_dir.name))
+
+    def test_returnedGatesCanBeModified(self):
+        gates = get_n_best_gates(4, 0.3, 5)
+        gates.append(0)
+        self.assertEqual([15, 14, 13, 11, 7], get_n_best_gates(4, 0.3, 5))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
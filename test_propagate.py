@@ -1,8 +1,10 @@
+import random
 import unittest
 from graph import Graph
-from propagate import lazy_propagate, was_propagation_finished, default_stopping_condition,\
-    flooding_propagate, naive_propagate, successive_cancellation_propagate,\
-    scheduling_conventional_propagate, scheduling_round_trip_propagate
+from rules import LEFT_EDGE, RIGHT_EDGE, relevant_rule, get_rule_writes
+from propagate import Counter, lazy_propagate, was_propagation_finished, default_stopping_condition, was_decoded,\
+    DirtyBlocks, get_successive_cancellation_order, get_oracle_graph, flooding_propagate, naive_propagate,\
+    successive_cancellation_propagate, scheduling_conventional_propagate, scheduling_round_trip_propagate
 
 
 class TestLazyPropagate(unittest.TestCase):
@@ -22,6 +24,79 @@ class TestLazyPropagate(unittest.TestCase):
         lazy_propagate(second_graph)
         self.assertTrue(was_propagation_finished(graph, second_graph))
 
+    def test_propagationReachesFixedPoint(self):
+        for p in (0.3, 0.5, 0.7):
+            graph = Graph(6, p)
+            lazy_propagate(graph)
+            for node in graph.inner_nodes:
+                self.assertFalse(relevant_rule(node, apply_propagate=False))
+
+
+class TestStoppingCondition(unittest.TestCase):
+    def test_stopsOnlyOncePropagated(self):
+        graph = Graph(5, 0.5)
+        should_stop = default_stopping_condition(graph)
+        self.assertFalse(should_stop(graph))
+        lazy_propagate(graph)
+        self.assertTrue(should_stop(graph))
+        self.assertEqual(0, should_stop.differences)
+
+    def test_countsDifferingHorizontalEdges(self):
+        def count_differing_edges(propagated_graph, graph):
+            differing_edges = set()
+            for propagated_node, node in zip(propagated_graph.inner_nodes, graph.inner_nodes):
+                for propagated_edge, edge in zip(propagated_node.edges[0::2], node.edges[0::2]):
+                    if propagated_edge.value != edge.value:
+                        differing_edges.add(edge)
+            return len(differing_edges)
+
+        graph = Graph(4, 0.5)
+        should_stop = default_stopping_condition(graph)
+        propagated_graph = graph.get_copy()
+        lazy_propagate(propagated_graph)
+        should_stop(graph)
+        self.assertEqual(count_differing_edges(propagated_graph, graph), should_stop.differences)
+        for node in graph.inner_nodes[::5]:
+            node.propagate()
+            self.assertEqual(count_differing_edges(propagated_graph, graph), should_stop.differences)
+
+    def test_resetGraphIsCountedAgain(self):
+        graph = Graph(5, 0.5)
+        should_stop = default_stopping_condition(graph)
+        graph_copy = graph.get_copy()
+        self.assertFalse(should_stop(graph_copy))
+        differences = should_stop.differences
+        naive_propagate(graph_copy, should_stop)
+        self.assertTrue(should_stop(graph_copy))
+        graph_copy.reset_to(graph)
+        self.assertFalse(should_stop(graph_copy))
+        self.assertEqual(differences, should_stop.differences)
+
+    def test_switchingGraphsStopsWatchingPrevious(self):
+        graph = Graph(4, 0.5)
+        should_stop = default_stopping_condition(graph)
+        first_graph, second_graph = graph.get_copy(), graph.get_copy()
+        should_stop(first_graph)
+        self.assertFalse(should_stop(second_graph))
+        lazy_propagate(first_graph)
+        self.assertFalse(should_stop(second_graph))
+        self.assertTrue(all(edge.watcher is None for edge in first_graph.edges))
+
+    def test_oracleGraphIsSharedButNotItsStates(self):
+        first_graph, second_graph = Graph(4, 0.5, random.Random(1)), Graph(4, 0.5, random.Random(2))
+        first_should_stop = default_stopping_condition(first_graph)
+        oracle_edges = list(get_oracle_graph(4).edges)
+        second_should_stop = default_stopping_condition(second_graph)
+        self.assertEqual(oracle_edges, get_oracle_graph(4).edges)
+        self.assertTrue(set(oracle_edges).isdisjoint(first_graph.edges + second_graph.edges))
+        for graph, should_stop in ((first_graph, first_should_stop), (second_graph, second_should_stop)):
+            expected_graph = graph.get_copy()
+            lazy_propagate(expected_graph)
+            self.assertEqual([edge.state for node in expected_graph.inner_nodes for edge in node.edges[0::2]],
+                             should_stop.propagated_states)
+            lazy_propagate(graph)
+            self.assertTrue(should_stop(graph))
+
 
 class TestNaivePropagate(unittest.TestCase):
     def test_propagationSetsAllEdges(self):
@@ -39,6 +114,27 @@ class TestNaivePropagate(unittest.TestCase):
         self.assertTrue(was_propagation_finished(graph, second_graph))
 
 
+def list_frontier_flooding_propagate(graph, stopping_condition):
+    """ flooding_propagate with the interesting nodes kept in a list and all of the inner nodes scanned on every
+    iteration, as it was done before the frontier was a set. """
+    counter = Counter()
+    interesting_nodes = [edge.other(node) for node in graph.start_nodes + graph.end_nodes for edge in node.edges]
+    while not stopping_condition(graph):
+        pending_writes = []
+        counter.parallel_steps += 1
+        for node in graph.inner_nodes:
+            if not (node in interesting_nodes or node.vertical().other(node) in interesting_nodes):
+                continue
+            counter.steps += (node not in interesting_nodes) + 1
+            writes = get_rule_writes(node)
+            if writes is not None:
+                pending_writes.append(writes)
+        interesting_nodes = []
+        for writes in pending_writes:
+            interesting_nodes += writes.commit()
+    return counter
+
+
 class TestFloodingPropagate(unittest.TestCase):
     def test_propagationSetsAllEdges(self):
         graph = Graph(3, 0.1)
@@ -54,6 +150,20 @@ class TestFloodingPropagate(unittest.TestCase):
         flooding_propagate(second_graph, default_stopping_condition(second_graph))
         self.assertTrue(was_propagation_finished(graph, second_graph))
 
+    def test_frontierIsSameAsListFrontier(self):
+        for k in (3, 5, 6):
+            for p in (0.2, 0.5, 0.8):
+                for seed in range(3):
+                    graph = Graph(k, p, random.Random(seed))
+                    expected_graph = graph.get_copy()
+                    expected = list_frontier_flooding_propagate(expected_graph, default_stopping_condition(graph))
+                    graph_copy = graph.get_copy()
+                    counter = flooding_propagate(graph_copy, default_stopping_condition(graph))
+                    self.assertEqual((expected.steps, expected.parallel_steps),
+                                     (counter.steps, counter.parallel_steps))
+                    self.assertEqual([edge.value for edge in expected_graph.edges],
+                                     [edge.value for edge in graph_copy.edges])
+
 
 class TestSimpleSchedulingPropagate(unittest.TestCase):
     def test_propagationSetsAllEdges(self):
@@ -102,6 +212,91 @@ class TestSuccessiveCancellationPropagate(unittest.TestCase):
         successive_cancellation_propagate(second_graph, default_stopping_condition(second_graph))
         self.assertTrue(was_propagation_finished(graph, second_graph))
 
+    def test_orderVisitsEveryNodeOncePerSide(self):
+        graph = Graph(4, 0.5)
+        order, steps, parallel_steps = get_successive_cancellation_order(4)
+        self.assertEqual((2 * 4 * 16, 4 * 16 - 2), (steps, parallel_steps))
+        for side in (LEFT_EDGE, RIGHT_EDGE):
+            visited = [node for layer, nodes, entry_side in order if entry_side == side
+                       for node in graph.inner_layers()[layer][nodes]]
+            self.assertCountEqual(graph.inner_nodes, visited)
+        for layer, nodes, _ in order:
+            node_list = graph.inner_layers()[layer][nodes]
+            self.assertEqual(1, len({node.type for node in node_list}))
+            gates = sorted(node.gate for node in node_list)
+            self.assertEqual(list(range(gates[0], gates[0] + 2 ** layer)), gates)
+
+
+class TestDirtyBlocks(unittest.TestCase):
+    def test_blocksAreCleanOnceTaken(self):
+        graph = Graph(4, 0.5)
+        dirty_blocks = DirtyBlocks(graph, 4)
+        self.assertEqual(graph.inner_layers()[1], dirty_blocks.take_dirty_nodes(1))
+        self.assertEqual([], dirty_blocks.take_dirty_nodes(1))
+        node = graph.inner_layers()[1][0]
+        partner = node.vertical().other(node)
+        dirty_blocks.mark(node)
+        nodes = dirty_blocks.take_dirty_nodes(1)
+        self.assertIn(node, nodes)
+        self.assertIn(partner, nodes)
+        self.assertEqual(8 if partner in graph.inner_layers()[1][4:8] else 4, len(nodes))
+        dirty_blocks.take_dirty_nodes(0)
+        dirty_blocks.mark(graph.start_nodes[0])
+        self.assertEqual([], dirty_blocks.take_dirty_nodes(0))
+
+    def test_skippingDoesNotChangePropagation(self):
+        for method in (scheduling_conventional_propagate, scheduling_round_trip_propagate):
+            for p in (0.2, 0.5, 0.8):
+                graph = Graph(5, p)
+                expected_graph = graph.get_copy()
+                expected = method(expected_graph, default_stopping_condition(graph), block_size=2 ** 5)
+                for block_size in (1, 3, 32):
+                    graph_copy = graph.get_copy()
+                    counter = method(graph_copy, default_stopping_condition(graph), block_size=block_size)
+                    self.assertEqual((expected.steps, expected.parallel_steps),
+                                     (counter.steps, counter.parallel_steps))
+                    self.assertEqual([edge.value for edge in expected_graph.edges],
+                                     [edge.value for edge in graph_copy.edges])
+
+    def test_skippedStepsAreNotCharged(self):
+        for method in (scheduling_conventional_propagate, scheduling_round_trip_propagate):
+            graph = Graph(5, 0.5, random.Random(0))
+            charged = method(graph.get_copy(), default_stopping_condition(graph))
+            counter = method(graph.get_copy(), default_stopping_condition(graph), charge_skipped_steps=False,
+                             block_size=2)
+            self.assertLess(counter.steps, charged.steps)
+            self.assertLessEqual(counter.parallel_steps, charged.parallel_steps)
+
+
+class TestFixedPointPropagate(unittest.TestCase):
+    def test_stepsAreSameAsWithStoppingCondition(self):
+        for method in (naive_propagate, flooding_propagate, scheduling_conventional_propagate,
+                       scheduling_round_trip_propagate):
+            for p in (0.2, 0.5, 0.8):
+                graph = Graph(4, p)
+                expected = method(graph.get_copy(), default_stopping_condition(graph))
+                graph_copy = graph.get_copy()
+                counter = method(graph_copy, None)
+                self.assertEqual((expected.steps, expected.parallel_steps), (counter.steps, counter.parallel_steps))
+                self.assertIsNone(expected.decoded)
+                self.assertEqual(was_decoded(graph_copy), counter.decoded)
+                lazy_propagate(graph)
+                self.assertTrue(was_propagation_finished(graph, graph_copy))
+
+    def test_decodingSuccessIsReported(self):
+        graph = Graph(3, 0.1)
+        self.assertTrue(naive_propagate(graph.get_copy(), None).decoded)
+        graph.update_end_nodes(['?'] * 8)
+        counter = naive_propagate(graph.get_copy(), None)
+        self.assertFalse(counter.decoded)
+        self.assertEqual((0, 0), (counter.steps, counter.parallel_steps))
+
+    def test_successiveCancellationReportsDecoding(self):
+        graph = Graph(3, 0.1)
+        self.assertTrue(successive_cancellation_propagate(graph.get_copy(), None).decoded)
+        graph.update_end_nodes(['?'] * 8)
+        self.assertFalse(successive_cancellation_propagate(graph.get_copy(), None).decoded)
+
 
 if __name__ == '__main__':
     unittest.main()
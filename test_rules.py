@@ -1,6 +1,8 @@
 import unittest
 from graph import Node, Edge
-from rules import upper_rule, lower_rule, vertical_rule, left_rule, right_rule
+from rules import LEFT_EDGE, RIGHT_EDGE, RULE_TABLES, upper_rule, lower_rule, vertical_rule, left_rule, right_rule,\
+    get_rule_writes, apply_side_rules
+import itertools
 
 
 class TestUpperRule(unittest.TestCase):
@@ -57,6 +59,26 @@ class TestUpperRule(unittest.TestCase):
             self.assertEqual(value, edge.value)
 
 
+class TestRuleTables(unittest.TestCase):
+    def test_tablesMatchNeighborTypes(self):
+        # The rules as they were stated over the sorted edge values.
+        succeeding_types = {
+            (Node.NodeType.UPPER, False): [['*', '*', '?']],
+            (Node.NodeType.UPPER, True): [['*', '?', '?']],
+            (Node.NodeType.LOWER, False): [['*', '?', '?'], ['*', '*', '?']],
+            (Node.NodeType.LOWER, True): [['?', '?', '?'], ['*', '?', '?']],
+        }
+        for (node_type, extra_propagation), types in succeeding_types.items():
+            for code in range(8):
+                neighbor_types = sorted('*' if code >> index & 1 else '?' for index in range(3))
+                success = neighbor_types in types
+                self.assertEqual((code, success), RULE_TABLES[node_type, extra_propagation, False][code])
+                self.assertEqual((7 if success else code, success),
+                                 RULE_TABLES[node_type, extra_propagation, True][code])
+        for code in range(8):
+            self.assertEqual((code, False), RULE_TABLES[Node.NodeType.EDGE, False, True][code])
+
+
 class TestLowerRule(unittest.TestCase):
     def setUp(self):
         self.nodes = [Node(), Node(), Node(), Node()]
@@ -286,5 +308,71 @@ class TestRightRule(unittest.TestCase):
             self.assertEqual(value, edge.value)
 
 
+class TestRuleWrites(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [Node(), Node(), Node(), Node(), Node(), Node()]
+        self.nodes[0].type = Node.NodeType.UPPER
+        self.nodes[2].type = Node.NodeType.LOWER
+        self.edges = [Edge(self.nodes[1], self.nodes[0]),
+                      Edge(self.nodes[4], self.nodes[2]),
+                      Edge(self.nodes[0], self.nodes[2]),
+                      Edge(self.nodes[0], self.nodes[3]),
+                      Edge(self.nodes[2], self.nodes[5])]
+        self.rules = {(LEFT_EDGE,): (left_rule,), (RIGHT_EDGE,): (right_rule,),
+                      (LEFT_EDGE, RIGHT_EDGE): (left_rule, right_rule)}
+
+    def set_values(self, values):
+        for edge, value in zip(self.edges, values):
+            edge.value = value
+
+    def test_writesAreSameAsRules(self):
+        for values in itertools.product('*?', repeat=5):
+            for node in (self.nodes[0], self.nodes[2]):
+                for sides, rules in self.rules.items():
+                    self.set_values(values)
+                    expected_success = any([rule(node, apply_propagate=False) for rule in rules])
+                    if expected_success:
+                        for rule in rules:
+                            rule(node)
+                    expected_values = [edge.value for edge in self.edges]
+                    self.set_values(values)
+                    writes = get_rule_writes(node, sides)
+                    self.assertEqual(expected_success, writes is not None)
+                    self.assertEqual(list(values), [edge.value for edge in self.edges])
+                    if writes is not None:
+                        self.assertEqual({edge for edge, value in zip(self.edges, expected_values)
+                                          if value != edge.value}, set(writes.edges))
+                        writes.commit()
+                    self.assertEqual(expected_values, [edge.value for edge in self.edges])
+
+    def test_sideRulesAreSameAsRules(self):
+        for values in itertools.product('*?', repeat=5):
+            for node in (self.nodes[0], self.nodes[2]):
+                for side, rule in ((LEFT_EDGE, left_rule), (RIGHT_EDGE, right_rule)):
+                    self.set_values(values)
+                    rule(node)
+                    expected_values = [edge.value for edge in self.edges]
+                    self.set_values(values)
+                    apply_side_rules([node], side)
+                    self.assertEqual(expected_values, [edge.value for edge in self.edges])
+
+    def test_writesAreSkippedOnceSidesAreSet(self):
+        self.set_values(['?', '?', '?', '*', '*'])
+        writes = get_rule_writes(self.nodes[0])
+        self.assertEqual({self.edges[0], self.edges[1], self.edges[2]}, set(writes.edges))
+        self.edges[0].value = '*'
+        self.assertEqual([], writes.commit())
+        self.assertEqual(['*', '?', '?', '*', '*'], [edge.value for edge in self.edges])
+
+    def test_partnerIsEvaluatedAgainOnCommit(self):
+        self.set_values(['?', '?', '?', '?', '*'])
+        writes = get_rule_writes(self.nodes[2], (LEFT_EDGE,))
+        self.assertEqual({self.edges[1], self.edges[2]}, set(writes.edges))
+        self.edges[0].value = '*'
+        self.edges[3].value = '*'
+        self.assertEqual([self.nodes[4]], writes.commit())
+        self.assertEqual(['*'] * 5, [edge.value for edge in self.edges])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from propagate import Counter
+from store import ResultStore
+
+
+def get_counter(steps, parallel_steps):
+    counter = Counter()
+    counter.steps, counter.parallel_steps = steps, parallel_steps
+    return counter
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'results', 'results.sqlite3')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_storedResultsAreLoaded(self):
+        store = ResultStore(self.path)
+        store.save(3, 0.499999, 10, 0, 5, 1,
+                   {'naive_result': get_counter(12.5, 3), 'flooding_result': get_counter(7, 2)})
+        counters = store.load(3, 0.499999, 10, 0, 5, 1)
+        self.assertEqual({'naive_result', 'flooding_result'}, set(counters))
+        self.assertEqual((12.5, 3), (counters['naive_result'].steps, counters['naive_result'].parallel_steps))
+        store.close()
+
+    def test_resultsPersistBetweenStores(self):
+        store = ResultStore(self.path)
+        store.save(3, 0.5, 10, 'seed', 5, 1, {'naive_result': get_counter(1, 1)})
+        store.close()
+        store = ResultStore(self.path)
+        self.assertEqual(['naive_result'], list(store.load(3, 0.5, 10, 'seed', 5, 1)))
+        store.close()
+
+    def test_resultsAreKeyedByAllParameters(self):
+        store = ResultStore(self.path)
+        store.save(3, 0.5, 10, 0, 5, 1, {'naive_result': get_counter(1, 1)})
+        for key in ((4, 0.5, 10, 0, 5, 1), (3, 0.6, 10, 0, 5, 1), (3, 0.5, 11, 0, 5, 1), (3, 0.5, 10, 1, 5, 1),
+                    (3, 0.5, 10, 0, 6, 1), (3, 0.5, 10, 0, 5, 2)):
+            self.assertEqual({}, store.load(*key))
+        store.close()
+
+    def test_savingReplacesResults(self):
+        store = ResultStore(self.path)
+        store.save(3, 0.5, 10, 0, 5, 1, {'naive_result': get_counter(1, 1)})
+        store.save(3, 0.5, 10, 0, 5, 1, {'naive_result': get_counter(2, 3)})
+        counter = store.load(3, 0.5, 10, 0, 5, 1)['naive_result']
+        self.assertEqual((2, 3), (counter.steps, counter.parallel_steps))
+        store.close()
+
+    def test_exactResultsAreStoredSeparately(self):
+        store = ResultStore(self.path)
+        self.assertIsNone(store.load_exact(3, 0.5, 1))
+        store.save_exact(3, 0.5, 1, (get_counter(24, 14), 0.75, 0.125))
+        store.save(3, 0.5, 10, 0, 5, 1, {'naive_result': get_counter(1, 1)})
+        counter, average_unknown, decoded_fraction = store.load_exact(3, 0.5, 1)
+        self.assertEqual((24, 14, 0.75, 0.125),
+                         (counter.steps, counter.parallel_steps, average_unknown, decoded_fraction))
+        self.assertIsNone(store.load_exact(3, 0.5, 2))
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import os
+import random
+import tempfile
+import unittest
+import array_propagate
+import stream_propagate
+from array_graph import ArrayGraph, ImplicitGraph, MappedGraph, open_mapped_graph
+from graph import Graph
+from propagate import default_stopping_condition, scheduling_round_trip_propagate
+
+
+def get_graphs(k, p, path):
+    """ Returns a Graph, an ArrayGraph, an ImplicitGraph and a MappedGraph stored at path with the same outer edge
+    values. """
+    graph = Graph(k, p)
+    end_values = [node.left().value for node in graph.end_nodes]
+    array_graphs = [ArrayGraph(k, p), ImplicitGraph(k, p), MappedGraph(path, k, p)]
+    for array_graph in array_graphs:
+        array_graph.update_end_nodes(end_values)
+    return [graph] + array_graphs
+
+
+class TestWindows(unittest.TestCase):
+    def test_windowsCoverAllPairs(self):
+        for window_size in (1, 3, 4, 100):
+            windows = stream_propagate.get_windows(4, window_size)
+            self.assertEqual(list(range(8)), [start + pair for start, size in windows for pair in range(size)])
+            self.assertTrue(all(size <= window_size for _, size in windows))
+
+    def test_windowSizeMustBePositive(self):
+        for window_size in (0, -1):
+            with self.assertRaises(ValueError):
+                stream_propagate.get_windows(4, window_size)
+
+    def test_windowViewsMatchLayerEdges(self):
+        graph = ImplicitGraph(4, 0.5)
+        graph.values[:] = [random.random() < 0.5 for _ in range(graph.edge_count)]
+        for layer in range(graph.k):
+            states = array_propagate.gather_pairs(graph.values, graph.layer_edges(layer))
+            for window_size in (1, 2, 4, 8):
+                for start, size in stream_propagate.get_windows(graph.k, window_size):
+                    views = stream_propagate.get_window_views(graph.values, graph.k, layer, start, size)
+                    for state, view in zip(states, views):
+                        self.assertEqual(list(state[start:start + size]), list(view.reshape(-1)))
+
+
+class TestStreamPropagate(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'graph')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lazyPropagationMatchesArrayPropagation(self):
+        for p in (0.3, 0.5, 0.7):
+            _, array_graph, implicit_graph, mapped_graph = get_graphs(5, p, self.path)
+            array_propagate.lazy_propagate(array_graph)
+            for window_size in (1, 4):
+                for graph in (implicit_graph.get_copy(), mapped_graph.get_copy()):
+                    stream_propagate.lazy_propagate(graph, window_size)
+                    self.assertEqual(list(array_graph.values), list(graph.values))
+
+    def test_conventionalPropagationMatchesArrayPropagation(self):
+        for p in (0.3, 0.5, 0.7):
+            _, array_graph, implicit_graph, mapped_graph = get_graphs(5, p, self.path)
+            array_counter = array_propagate.scheduling_conventional_propagate(
+                array_graph, array_propagate.default_stopping_condition(array_graph))
+            for window_size in (1, 2, 4):
+                for graph in (implicit_graph.get_copy(), mapped_graph.get_copy()):
+                    counter = stream_propagate.scheduling_conventional_propagate(
+                        graph, stream_propagate.default_stopping_condition(graph, window_size=window_size),
+                        window_size)
+                    self.assertEqual((array_counter.steps, array_counter.parallel_steps),
+                                     (counter.steps, counter.parallel_steps))
+                    self.assertEqual(list(array_graph.values), list(graph.values))
+
+    def test_roundTripPropagationMatchesPropagation(self):
+        for p in (0.3, 0.5, 0.7):
+            graph, _, implicit_graph, mapped_graph = get_graphs(5, p, self.path)
+            expected_counter = scheduling_round_trip_propagate(graph.get_copy(), default_stopping_condition(graph))
+            for window_size in (1, 4):
+                for stream_graph in (implicit_graph.get_copy(), mapped_graph.get_copy()):
+                    counter = stream_propagate.scheduling_round_trip_propagate(
+                        stream_graph, stream_propagate.default_stopping_condition(stream_graph), window_size)
+                    self.assertEqual((expected_counter.steps, expected_counter.parallel_steps),
+                                     (counter.steps, counter.parallel_steps))
+
+    def test_fixedPointMatchesStoppingCondition(self):
+        for p in (0.3, 0.5, 0.7):
+            _, _, implicit_graph, _ = get_graphs(5, p, self.path)
+            for method in (stream_propagate.scheduling_conventional_propagate,
+                           stream_propagate.scheduling_round_trip_propagate):
+                expected_graph = implicit_graph.get_copy()
+                expected_counter = method(expected_graph, stream_propagate.default_stopping_condition(expected_graph),
+                                          2)
+                graph = implicit_graph.get_copy()
+                counter = method(graph, None, 2)
+                self.assertEqual((expected_counter.steps, expected_counter.parallel_steps),
+                                 (counter.steps, counter.parallel_steps))
+                self.assertEqual(bool(expected_graph.values[:2 ** 5].all()), counter.decoded)
+
+    def test_fixedPointOfMappedGraphIsSameAsImplicitGraph(self):
+        outcomes = set()
+        for p in (0.1, 0.3, 0.5, 0.7):
+            _, _, implicit_graph, mapped_graph = get_graphs(5, p, self.path)
+            for window_size in (1, 4, 2 ** 10):
+                graph = implicit_graph.get_copy()
+                mapped_graph_copy = mapped_graph.get_copy()
+                expected_counter = stream_propagate.scheduling_conventional_propagate(graph, None, window_size)
+                counter = stream_propagate.scheduling_conventional_propagate(mapped_graph_copy, None, window_size)
+                self.assertEqual((expected_counter.steps, expected_counter.parallel_steps, expected_counter.decoded),
+                                 (counter.steps, counter.parallel_steps, counter.decoded))
+                self.assertEqual(bool(graph.values[:2 ** 5].all()),
+                                 stream_propagate.was_decoded(mapped_graph_copy, window_size))
+                outcomes.add(counter.decoded)
+        self.assertEqual({False, True}, outcomes)
+
+    def test_progressIsStoredWithTheGraph(self):
+        _, _, _, mapped_graph = get_graphs(4, 0.5, self.path)
+        counter = stream_propagate.scheduling_conventional_propagate(mapped_graph, None, 2)
+        opened_graph = open_mapped_graph(self.path)
+        self.assertEqual((4, 0.5), (opened_graph.k, opened_graph.p))
+        # The progress is written for every layer visited, including the iterations the counter was rolled back from.
+        self.assertEqual(4 * (opened_graph.progress['iteration'] + 1), opened_graph.progress['parallel_steps'])
+        self.assertLessEqual(counter.parallel_steps, opened_graph.progress['parallel_steps'])
+        self.assertEqual(3, opened_graph.progress['layer'])
+        self.assertEqual(list(mapped_graph.values), list(opened_graph.values))
+
+    def test_outerStatesAreWrittenInChunks(self):
+        for p in (0.3, 0.5, 1.0):
+            array_graph = ArrayGraph(6, p)
+            for chunk_size in (5, 64, 2 ** 20):
+                graph = MappedGraph(self.path, 6, p, random.Random(chunk_size), chunk_size)
+                self.assertEqual(list(array_graph.values[array_graph.start_edges]),
+                                 list(graph.values[graph.start_edges]))
+                self.assertEqual(int(2 ** 6 * (1 - p)), graph.values[graph.end_edges].sum())
+                self.assertEqual(list(graph.values[graph.end_edges]),
+                                 list(MappedGraph(self.path + '2', 6, p, random.Random(chunk_size),
+                                                  chunk_size).values[graph.end_edges]))
+                self.assertFalse(graph.values[graph.start_edges.size:graph.k * graph.layer_size].any())
+
+    def test_propagatedCopyIsRemoved(self):
+        _, _, _, mapped_graph = get_graphs(4, 0.5, self.path)
+        stopping_condition = stream_propagate.default_stopping_condition(mapped_graph)
+        self.assertTrue(os.path.exists(self.path + '.copy'))
+        stream_propagate.scheduling_conventional_propagate(mapped_graph, stopping_condition, 2)
+        del stopping_condition
+        self.assertEqual(['graph', 'graph.json'], sorted(os.listdir(self.directory.name)))